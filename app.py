@@ -3,23 +3,51 @@ import logging
 import pickle
 import platform
 import subprocess
-import threading
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 # Set up logging
 logging.basicConfig(level=logging.WARNING)
 
+# the start of this script run, for the import time and time to first paint in the Diagnostics tab
+_script_started = time.perf_counter()
 
-import altair as alt
 import pandas as pd
-import requests
 import streamlit as st
-from databot.PyDatabot import DatabotConfig
 
-from utils.sensor_constants import DATABOT_DATA_FILE
+if TYPE_CHECKING:
+    from databot.PyDatabot import DatabotConfig
+    import pyarrow as pa
+
+from utils.alert_rules import AlertEngine, load_alert_rules, read_recent_alerts
+from utils.collector_pool import CollectorPool, DeviceSpec, DEVICE_ID_COLUMN
+from utils.columnar_recording import remove_segments
+from utils.compressed_recording import compressed_path
+from utils.data_hub import DataHub, HubSubscription, read_recording_time_range
+from utils.downsample import DownsampleCache, downsample_frame, DEFAULT_CHART_POINTS
+from utils.instrumentation import HotPathMetrics, current_rss_bytes, DATABOT_METRICS_FILE
+from utils.rolling_stats import SignalEngine, DEFAULT_ROLLING_WINDOW
+from utils.sample_store import SampleStore
+from utils.segment_rotation import RotationPolicy, remove_rotated_recording
+from utils.sensor_charts import sensor_chart_data, build_psd_chart, build_spectrogram_chart
+from utils.sensor_constants import DATABOT_ALERTS_FILE, DATABOT_DATA_FILE, DATABOT_DEVICES_DIR, DATABOT_RING_FILE, DATABOT_ROTATED_DIR, \
+    DATABOT_SEGMENTS_DIR, DEFAULT_SAMPLE_STORE_CAPACITY
+from utils.spectral import StreamingSpectrum, IMU_SENSORS, DEFAULT_FFT_SIZE, DEFAULT_FFT_OVERLAP, \
+    DEFAULT_AVERAGE_FRAMES
 from utils.sidebar_utils import setup_input_selection_sidebar, get_display_fields_from_sensor_table, \
     get_save_fields_from_sensor_table
+from utils.time_buckets import TimeBucketAggregator
+from utils.time_index import time_index_path
+from utils.webserver_collector import WebserverPollingCollector
+
+# only the first script run of the server process pays for the imports, later runs find them loaded
+_import_seconds = time.perf_counter() - _script_started
+
+# how often the live data is redrawn while reading data
+DASHBOARD_REFRESH_SECONDS = 1.0
+# the table shows the newest rows of the window, the charts all of it
+DATAFRAME_ROWS = 1000
 
 st.set_page_config(
     page_title="DroneBlocks Databot Dashboard",
@@ -35,6 +63,11 @@ def get_sensor_values_to_display():
     return json_records
 
 
+def get_display_data_columns() -> list:
+    data_columns = st.session_state.updated_sensor_df.query("display == True")['data_columns'].to_list()
+    return [item for sublist in data_columns for item in sublist]
+
+
 def get_run_mode(): # return stop/start/pause
     return st.session_state.get('run_mode', default='stop')
 
@@ -55,7 +88,7 @@ def stop_collecting_data_on_click():
     """
     Stop collecting data on click.
 
-    This method is responsible for stopping the collection of data. It terminates the pydatabot_process, if it exists in the st.session_state, and deletes it from the session state. It also
+    This method is responsible for stopping the collection of data. It terminates the pydatabot_process and stops the webserver collector thread, if they exist in the st.session_state, and deletes them from the session state. It also
     * sets the read_data_flag, data_refresh, and run_mode in the session state to their respective default values.
 
     Parameters:
@@ -77,22 +110,38 @@ def stop_collecting_data_on_click():
         finally:
             del st.session_state['pydatabot_process']
 
+    if 'webserver_collector' in st.session_state:
+        st.session_state.webserver_collector.stop()
+        del st.session_state['webserver_collector']
+
     st.session_state['read_data_flag'] = False
     st.session_state['data_refresh'] = False
     st.session_state.run_mode = 'stop'
 
 
-def _get_data_from_webserver_save_to_file(datafile_path: str, refresh_rate: int):
+def _get_data_from_webserver_save_to_file(datafile_path: str, refresh_rate: int, recording_format: str = 'jsonl',
+                                          durability: str = 'flush', rotation: RotationPolicy | None = None,
+                                          shared_ring_path: str | None = None,
+                                          archive: bool = True, compression: str = 'none',
+                                          alert_engine: AlertEngine | None = None) -> WebserverPollingCollector:
     """
 
-    This method `_get_data_from_webserver_save_to_file` is responsible for continuously fetching data from a web server and saving it to a file.
+    This method `_get_data_from_webserver_save_to_file` starts a background thread that continuously fetches data from a web server and saves it to a file.
 
     Parameters:
     - `datafile_path` (str): The path to the file where the data will be saved.
     - `refresh_rate` (int): The refresh rate in milliseconds, indicating how often to fetch new data from the web server.
+    - `recording_format` (str): 'jsonl' to append JSON lines to `datafile_path`, or 'arrow'/'parquet' to write
+      columnar segments into the `datafile_path` directory.
+    - `durability` (str): The fsync policy of the batched JSON lines writer, 'none', 'flush' or 'fsync'.
+    - `rotation` (RotationPolicy | None): Rotate 'jsonl' data into numbered segments in the `datafile_path` directory.
+    - `shared_ring_path` (str | None): Also publish every sample into this shared memory ring for the dashboard.
+    - `archive` (bool): Save the samples to `datafile_path`, turn off to only publish them into the ring.
+    - `compression` (str): 'none', 'gzip' or 'zstd', for a 'jsonl' file that is not rotated.
+    - `alert_engine` (AlertEngine | None): Alert rules checked on every sample, and when to stop by itself.
 
     Returns:
-    - This method does not have a return value.
+    - The running WebserverPollingCollector.  Call `stop()` on it to end the thread.
 
     Here is an example usage:
 
@@ -100,40 +149,98 @@ def _get_data_from_webserver_save_to_file(datafile_path: str, refresh_rate: int)
     datafile_path = "/path/to/datafile.txt"
     refresh_rate = 5000
 
-    _get_data_from_webserver_save_to_file(datafile_path, refresh_rate)
+    collector = _get_data_from_webserver_save_to_file(datafile_path, refresh_rate)
+    ...
+    collector.stop()
     ```
 
-    The method starts a web server thread that runs indefinitely. Within the thread, it repeatedly performs the following steps:
-    1. Sleeps for the specified `refresh_rate` in milliseconds.
-    2. Makes a GET request to the web server at `http://localhost:8321`.
-    3. Retrieves the response as JSON data.
-    4. Appends the JSON data to the file specified by `data_path_file`, followed by a newline character.
+    The collector reuses one keep-alive HTTP session to `http://localhost:8321` and keeps the data file open,
+    writing samples in batches.
+    Ticks are scheduled against a monotonic deadline so the configured refresh rate is met regardless of
+    request latency, and late or dropped ticks are counted on the collector.
 
     If a `requests.ConnectionError` occurs, it means that the web server has gone away, so the thread can exit gracefully.
 
-    If any other exception occurs during the execution of the method, it will be logged and the thread will sleep for 1 second before continuing.
-
-    Once the web server thread is exited, a debug log indicating the exit will be generated.
-
     """
-    logging.debug(f"start web server thread: {datafile_path}, {refresh_rate}")
-    while True:
-        try:
-            time.sleep(refresh_rate / 1000)
-            data_record = requests.get(url="http://localhost:8321").json()
-            with datafile_path.open("a", encoding="utf-8") as f:
-                f.write(json.dumps(data_record))
-                f.write("\n")
-
-        except requests.ConnectionError as conn_error:
-            # webserver must have gone away so we can exit this thread
-            break
-
-        except Exception as exc:
-            logging.debug(exc)
-            time.sleep(1)
-
-    logging.debug("**** EXIT webserver thread")
+    collector = WebserverPollingCollector(datafile_path, refresh_rate, recording_format, durability=durability,
+                                          rotation=rotation, shared_ring_path=shared_ring_path, archive=archive,
+                                          compression=compression, alert_engine=alert_engine)
+    collector.start()
+    return collector
+
+
+def get_rotation_policy() -> RotationPolicy:
+    return RotationPolicy(max_bytes=int(st.session_state.get('rotate_mb', default=0) * 1024 * 1024),
+                          max_seconds=st.session_state.get('rotate_minutes', default=0) * 60,
+                          keep_segments=st.session_state.get('keep_segments', default=0),
+                          compress=st.session_state.get('compress_segments', default=False))
+
+
+def rotation_args(rotation: RotationPolicy) -> list:
+    if not rotation.enabled:
+        return []
+    args = ["--rotate-bytes", str(rotation.max_bytes), "--rotate-seconds", str(rotation.max_seconds),
+            "--keep-segments", str(rotation.keep_segments)]
+    if rotation.compress:
+        args.append("--compress-segments")
+    return args
+
+
+def shared_ring_args() -> list:
+    if not st.session_state.get('shared_ring', default=False):
+        return []
+    return ["--shared-ring"] + ([] if st.session_state.get('ring_archive', default=True) else ["--no-archive"])
+
+
+def simulation_args() -> list:
+    if not st.session_state.get('simulate_databot', default=False):
+        return []
+    return ["--simulate", "--simulate-rate", str(st.session_state.get('simulate_rate', default=10))]
+
+
+def alert_args() -> list:
+    # the collector checks the rules and counts the samples itself, without the dashboard
+    args = []
+    if st.session_state.get('number_of_samples_to_collect', default=0):
+        args += ["--stop-after", str(st.session_state['number_of_samples_to_collect'])]
+    if st.session_state.get('alert_rules_path', default=''):
+        args += ["--rules", st.session_state['alert_rules_path']]
+    return args
+
+
+def get_device_specs() -> list:
+    # the rows of the Databots table in the Collection Config tab
+    devices_df = st.session_state.get('updated_devices_df', default=None)
+    if devices_df is None:
+        return []
+    default_sensors = [record['sensor_name'] for record in get_save_fields_from_sensor_table()]
+    simulate = st.session_state.get('simulate_databot', default=False)
+    devices = []
+    for record in devices_df.to_dict('records'):
+        device_id = str(record.get('device_id') or '').strip()
+        if not device_id:
+            continue
+        sensors = [sensor.strip() for sensor in str(record.get('sensors') or '').split(",") if sensor.strip()]
+        refresh = record.get('refresh_ms')
+        devices.append(DeviceSpec(device_id=device_id, address=str(record.get('address') or '').strip() or None,
+                                  sensors=sensors or default_sensors or None,
+                                  refresh=st.session_state['databot_data_refresh_rate'] if pd.isna(refresh) else int(refresh),
+                                  # every simulated databot gets its own noise
+                                  extra_args=["--simulate-seed", str(len(devices))] if simulate else []))
+    return devices
+
+
+def start_collector_pool(devices: list) -> CollectorPool:
+    """
+    Start one collector per databot, each saving JSON lines to its own file in DATABOT_DEVICES_DIR,
+    which the dashboard reads back as one merged timeline.
+    """
+    st.session_state['datafile_path'] = DATABOT_DEVICES_DIR
+    durability = st.session_state.get('write_durability', default='flush')
+    pool = CollectorPool(devices, DATABOT_DEVICES_DIR,
+                         collector_args=["--durability", durability, *alert_args(), *simulation_args()],
+                         shell=st.session_state.is_windows)
+    return pool.start()
 
 
 def collect_data_on_click():
@@ -156,74 +263,366 @@ def collect_data_on_click():
     Next, it starts a subprocess that runs the 'pydatabot_run_webserver.py' script using the 'python' command. The subprocess is started in the current directory and with the shell flag
     * depending on the operating system.
 
-    A separate thread is started to continuously get data from the web server and save it to the data file. The thread runs the _get_data_from_webserver_save_to_file() function with the
-    * arguments DATABOT_DATA_FILE and the value of 'databot_data_refresh_rate' from the session state. The thread is started as a daemon thread to ensure it exits when the main thread exits
-    *.
+    The subprocess saves the data file itself, so no collector thread is started for it.  Only one writer may append to the data file and its
+    * time index.
 
     Finally, it sets the 'read_data_flag' key in the session state to True and sets the 'run_mode' key to 'start'.
 
     """
     if 'pydatabot_process' not in st.session_state:
-        if 'run_mode_flag' in st.session_state and st.session_state['run_mode_flag'] == 'Launch Databot script':
-            st.session_state['datafile_path'] = DATABOT_DATA_FILE
-            # remove datafile
-            if Path(DATABOT_DATA_FILE).exists():
-                Path(DATABOT_DATA_FILE).unlink()
-            databot_config: DatabotConfig = create_databot_config()
+        if st.session_state.get('run_mode_flag') == 'Launch Databot script':
+            rules_path = st.session_state.get('alert_rules_path', default='')
+            try:
+                # checked here, so a bad rules file is an error in the dashboard rather than a collector that exits
+                if rules_path:
+                    load_alert_rules(rules_path)
+            except (OSError, ValueError, TypeError) as exc:
+                st.error(f"Could not load the alert rules: {exc}")
+                return
+            DATABOT_ALERTS_FILE.unlink(missing_ok=True)
+        devices = get_device_specs()
+        if st.session_state.get('run_mode_flag') == 'Launch Databot script' and len(devices) > 1:
+            # the pool has the terminate() of a single collector process
+            st.session_state.pydatabot_process = start_collector_pool(devices)
+        elif 'run_mode_flag' in st.session_state and st.session_state['run_mode_flag'] == 'Launch Databot script':
+            recording_format = st.session_state.get('recording_format', default='jsonl')
+            rotation = get_rotation_policy()
+            compression = st.session_state.get('recording_compression', default='none')
+            if recording_format == 'jsonl' and rotation.enabled:
+                datafile_path = DATABOT_ROTATED_DIR
+                DATABOT_ROTATED_DIR.mkdir(parents=True, exist_ok=True)
+                remove_rotated_recording(DATABOT_ROTATED_DIR)
+            elif recording_format == 'jsonl':
+                datafile_path = compressed_path(DATABOT_DATA_FILE, compression)
+                # remove datafile
+                if Path(datafile_path).exists():
+                    Path(datafile_path).unlink()
+                time_index_path(datafile_path).unlink(missing_ok=True)
+            else:
+                datafile_path = DATABOT_SEGMENTS_DIR
+                DATABOT_SEGMENTS_DIR.mkdir(parents=True, exist_ok=True)
+                remove_segments(DATABOT_SEGMENTS_DIR)
+            shared_ring = st.session_state.get('shared_ring', default=False)
+            if shared_ring:
+                DATABOT_RING_FILE.unlink(missing_ok=True)
+            # with the shared ring the dashboard reads the live samples from memory, the file is only an archive
+            st.session_state['datafile_path'] = DATABOT_RING_FILE if shared_ring else datafile_path
+            databot_config = create_databot_config()
             with open("streamlit_databot_config.pkl", "wb") as f:
                 pickle.dump(databot_config, f)
             # windows needs shell=True, macos shell=False
             shell_flag = st.session_state.is_windows
-            st.session_state.pydatabot_process = subprocess.Popen(["python", "pydatabot_save_data_to_file.py"],
+            durability = st.session_state.get('write_durability', default='flush')
+            st.session_state.pydatabot_process = subprocess.Popen(["python", "pydatabot_save_data_to_file.py",
+                                                                   "--format", recording_format,
+                                                                   "--durability", durability,
+                                                                   "--compress", compression,
+                                                                   *rotation_args(rotation),
+                                                                   *shared_ring_args(),
+                                                                   *alert_args(),
+                                                                   *simulation_args()],
                                                                   cwd=Path(".").absolute(), shell=shell_flag)
             # st.session_state.pydatabot_process = subprocess.Popen(["python", "pydatabot_run_webserver.py"],
             #                                                       cwd=Path(".").absolute(), shell=shell_flag)
-
-            t = threading.Thread(target=_get_data_from_webserver_save_to_file,
-                                 args=(DATABOT_DATA_FILE, st.session_state['databot_data_refresh_rate']), daemon=True)
-            t.start()
-
-            st.session_state.webserver_thread = t
+            # pydatabot_save_data_to_file.py records the samples itself.  A collector thread from
+            # _get_data_from_webserver_save_to_file() is only needed with pydatabot_run_webserver.py, which serves
+            # the samples without saving them, a second writer would corrupt the time index of the data file.
     st.session_state['read_data_flag'] = True
     st.session_state.run_mode = 'start'
 
 
+def get_sample_store() -> SampleStore:
+    # the sample store is shared by read_databot_data_file and _display_dataframe_data
+    capacity = st.session_state.get('sample_store_capacity', default=DEFAULT_SAMPLE_STORE_CAPACITY)
+    sample_store = st.session_state.get('sample_store', default=None)
+    if sample_store is None or sample_store.capacity != capacity:
+        sample_store = SampleStore(capacity=capacity)
+        st.session_state.sample_store = sample_store
+        # a new store needs to be filled with everything the data hub still has
+        if st.session_state.get('data_subscription', default=None) is not None:
+            st.session_state.data_subscription.close()
+        st.session_state.data_subscription = None
+        # and a time range slice has to be read again
+        st.session_state.time_range_key = None
+        st.session_state.downsample_cache = DownsampleCache()
+        st.session_state.long_form_caches = {}
+        if st.session_state.get('time_buckets', default=None) is not None:
+            st.session_state.time_buckets.reset()
+        if st.session_state.get('signal_engine', default=None) is not None:
+            st.session_state.signal_engine.reset()
+        if st.session_state.get('streaming_spectrum', default=None) is not None:
+            st.session_state.streaming_spectrum.reset()
+    return sample_store
+
+
+def get_signal_engine() -> SignalEngine:
+    # derived signals and rolling statistics are computed once per new sample as it is read
+    engine_key = (tuple(get_display_data_columns()),
+                  tuple(st.session_state.get('rolling_statistics', default=[])),
+                  tuple(st.session_state.get('derived_signals', default=[])),
+                  st.session_state.get('rolling_window', default=DEFAULT_ROLLING_WINDOW))
+    signal_engine = st.session_state.get('signal_engine', default=None)
+    if signal_engine is None or st.session_state.get('signal_engine_key') != engine_key:
+        signal_engine = SignalEngine(*engine_key)
+        st.session_state.signal_engine = signal_engine
+        st.session_state.signal_engine_key = engine_key
+        # start over with a new sample store, so the samples already read get the new columns too
+        st.session_state.sample_store = None
+    return signal_engine
+
+
+def get_time_buckets() -> TimeBucketAggregator | None:
+    # the buckets are only kept while they are shown, switching them on reads everything again
+    enabled = st.session_state.get('time_bucket', default='off') != 'off'
+    time_buckets = st.session_state.get('time_buckets', default=None)
+    if enabled and time_buckets is None:
+        st.session_state.time_buckets = TimeBucketAggregator(series_column=DEVICE_ID_COLUMN)
+        st.session_state.sample_store = None
+    elif not enabled and time_buckets is not None:
+        st.session_state.time_buckets = None
+    return st.session_state.time_buckets if enabled else None
+
+
+def time_bucket_key() -> tuple | None:
+    if st.session_state.get('time_bucket', default='off') == 'off':
+        return None
+    return (st.session_state.get('time_bucket'), st.session_state.get('bucket_statistic'),
+            st.session_state.get('bucket_window'))
+
+
+def get_streaming_spectrum() -> StreamingSpectrum:
+    # keeps the spectrum of every frame it has computed, as long as the frame is in the sample store
+    spectrum_key = (st.session_state.get('fft_size', default=DEFAULT_FFT_SIZE),
+                    st.session_state.get('fft_overlap', default=DEFAULT_FFT_OVERLAP))
+    streaming_spectrum = st.session_state.get('streaming_spectrum', default=None)
+    if streaming_spectrum is None or (streaming_spectrum.fft_size, streaming_spectrum.overlap) != spectrum_key:
+        streaming_spectrum = StreamingSpectrum(*spectrum_key)
+        st.session_state.streaming_spectrum = streaming_spectrum
+    return streaming_spectrum
+
+
+def get_downsample_cache() -> DownsampleCache:
+    if 'downsample_cache' not in st.session_state:
+        st.session_state.downsample_cache = DownsampleCache()
+    return st.session_state.downsample_cache
+
+
+def _downsample_for_chart(df: pd.DataFrame, value_columns: list, series_columns: list) -> pd.DataFrame:
+    # reduce each series to about the chart width before altair serializes it into the vega spec
+    # the kind of window rather than its contents, which change on every refresh while collecting,
+    # the finished buckets of the window are kept from one refresh to the next
+    window_key = (id(get_sample_store()), st.session_state.get('number_of_samples_to_display', default=0),
+                  get_selected_devices(), time_bucket_key(), st.session_state.get('time_range_key'))
+    # charts of several databots are drawn over the collector's timestamp
+    x_column = 'time' if 'time' in df.columns else 'timestamp'
+    return downsample_frame(df, x_column, value_columns,
+                            threshold=st.session_state.get('chart_points', default=DEFAULT_CHART_POINTS),
+                            mode=st.session_state.get('downsample_mode', default='lttb'),
+                            cache=get_downsample_cache(), window_key=window_key, series_columns=series_columns,
+                            live=True)
+
+
+def get_long_form_caches() -> dict:
+    # the long form of every multi column sensor, melted a few new rows at a time
+    if 'long_form_caches' not in st.session_state:
+        st.session_state.long_form_caches = {}
+    return st.session_state.long_form_caches
+
+
+def get_selected_devices() -> tuple | None:
+    """
+    Returns the device ids picked in the databot selector, or None to show every databot.
+    """
+    device_ids = st.session_state.get('device_ids', default=[])
+    selected_devices = st.session_state.get('selected_devices', default=[])
+    if not selected_devices or set(selected_devices) >= set(device_ids):
+        return None
+    return tuple(selected_devices)
+
+
+def device_selector():
+    # only shown once the samples of more than one databot have been read
+    device_ids = st.session_state.get('device_ids', default=[])
+    if len(device_ids) < 2:
+        return
+    if 'selected_devices' in st.session_state:
+        # a new recording may not have the databots picked before
+        st.session_state.selected_devices = [device for device in st.session_state.selected_devices
+                                             if device in device_ids]
+    st.multiselect(label="Databots", options=device_ids, key="selected_devices",
+                   placeholder="All databots", help="Only chart the samples of these databots")
+
+
+@st.cache_resource
+def get_data_hub() -> DataHub:
+    # one hub per server process, shared by every session
+    return DataHub()
+
+
+def get_data_subscription(datafile_path) -> HubSubscription:
+    # every session watching the same file shares one reader in the data hub,
+    # and only pulls the rows it has not seen yet
+    subscription = st.session_state.get('data_subscription', default=None)
+    if subscription is None or subscription.source.datafile_path != Path(datafile_path):
+        if subscription is not None:
+            subscription.close()
+        subscription = get_data_hub().subscribe(datafile_path)
+        st.session_state.data_subscription = subscription
+    return subscription
+
+
+def get_time_range() -> tuple[float, float] | None:
+    """
+    Returns the start and end time, in seconds, selected with the sidebar time range slider, or
+    None when the whole file is followed.
+    """
+    if st.session_state.get('run_mode_flag', default=None) != 'Read from a Databot file':
+        return None
+    if not st.session_state.get('use_time_range', default=False):
+        return None
+    origin = st.session_state.get('time_range_origin', default=None)
+    time_range = st.session_state.get('time_range', default=None)
+    if origin is None or time_range is None:
+        return None
+    return origin + time_range[0], origin + time_range[1]
+
+
+def read_time_range_slice(datafile_path, time_range: tuple[float, float],
+                          columns: list) -> tuple[pd.DataFrame | None, bool]:
+    """
+    Read the rows in `time_range` once, like HubSubscription.read_new does for new rows.
+
+    Returns:
+    - The rows in the range, or None if the range, the file and the columns have not changed.
+    - True when the sample store has to be cleared before the rows are added.
+    """
+    time_range_key = (str(datafile_path), time_range, tuple(columns))
+    if st.session_state.get('time_range_key', default=None) == time_range_key:
+        return None, False
+    # the slice replaces whatever the data hub was streaming into the sample store
+    if st.session_state.get('data_subscription', default=None) is not None:
+        st.session_state.data_subscription.close()
+        st.session_state.data_subscription = None
+    st.session_state.time_range_key = time_range_key
+    with get_metrics().timer('read_time_range'):
+        return read_recording_time_range(datafile_path, *time_range, columns=columns), True
+
+
+@st.cache_resource
+def get_startup_import_seconds() -> float:
+    # cached from the first script run of the server process, the one that imported everything
+    return _import_seconds
+
+
+def get_metrics() -> HotPathMetrics:
+    if 'metrics' not in st.session_state:
+        st.session_state.metrics = HotPathMetrics()
+    return st.session_state.metrics
+
+
 def read_databot_data_file(status_placeholder) -> pd.DataFrame | None:
+    with get_metrics().timer('read_databot_data_file'):
+        return _read_databot_data_file(status_placeholder)
+
+
+def _read_databot_data_file(status_placeholder) -> pd.DataFrame | None:
+    metrics = get_metrics()
     try:
         datafile_path = st.session_state.get('datafile_path', default=DATABOT_DATA_FILE)
-        if get_run_mode() == 'start':
-            # look for the file to watch
-            datafile_path = st.session_state['datafile_path']
-            if datafile_path:
-                while not Path(datafile_path).exists():
-                    status_placeholder.warning(f"Waiting for file: {datafile_path}")
-                    time.sleep(1)
-
         if not datafile_path:
             return None
 
+        if get_run_mode() == 'start' and not Path(datafile_path).exists():
+            # look for the file to watch on the next refresh, never block the script thread
+            status_placeholder.warning(f"Waiting for file: {datafile_path}")
+            return None
+
         status_placeholder.success(f"Reading from datafile: {datafile_path}")
 
-        df = pd.read_json(path_or_buf=datafile_path, lines=True)
+        signal_engine = get_signal_engine()
+        # columnar recordings only load the columns of the sensors being displayed
+        # and the ones the derived signals are computed from
+        read_columns = ['time', 'timestamp'] + signal_engine.input_columns + \
+                       [column for column in get_display_data_columns() if column not in signal_engine.input_columns]
+        time_range = get_time_range()
+        if time_range is None and st.session_state.get('time_range_key', default=None) is not None:
+            # back to following the whole file, start over with everything the data hub has
+            st.session_state.time_range_key = None
+            st.session_state.sample_store = None
+        time_buckets = get_time_buckets()
+        sample_store = get_sample_store()
+        if time_range is None:
+            subscription = get_data_subscription(datafile_path)
+            subscription.columns = read_columns
+            new_df, reset = subscription.read_new()
+            bytes_read = subscription.source.bytes_read
+            metrics.observe('bytes_per_refresh', max(0, bytes_read - st.session_state.get('last_bytes_read', bytes_read)))
+            st.session_state.last_bytes_read = bytes_read
+        else:
+            new_df, reset = read_time_range_slice(datafile_path, time_range, read_columns)
+        if reset:
+            sample_store.clear()
+            signal_engine.reset()
+            get_streaming_spectrum().reset()
+            if time_buckets is not None:
+                time_buckets.reset()
+            st.session_state.device_ids = []
+        if new_df is not None:
+            new_df = signal_engine.process(new_df)
+            sample_store.append(new_df)
+            if time_buckets is not None:
+                with metrics.timer('time_buckets'):
+                    time_buckets.append(new_df)
+            if DEVICE_ID_COLUMN in new_df.columns:
+                st.session_state.device_ids = sorted(set(st.session_state.get('device_ids', default=[])) |
+                                                     set(new_df[DEVICE_ID_COLUMN].dropna().astype(str)))
+        metrics.observe('rows_per_refresh', 0 if new_df is None else new_df.shape[0])
+        if len(sample_store) == 0:
+            return None
+
         # only pull out the columns for the selected sensors.
-        columns_to_drop = st.session_state.updated_sensor_df.query("display == False")['data_columns'].to_list()
-        columns_to_drop = [item for sublist in columns_to_drop for item in sublist]
-        df = df.drop(columns=columns_to_drop, errors='ignore')
+        with metrics.timer('column_drop'):
+            columns_to_drop = st.session_state.updated_sensor_df.query("display == False")['data_columns'].to_list()
+            columns_to_drop = [item for sublist in columns_to_drop for item in sublist]
+            columns = [column for column in sample_store.columns if column not in columns_to_drop]
         if get_run_mode() == 'start':
-            if df.shape[1] == 2:
+            if len(columns) == 2:
                 # means all we have are the time and the timestamp columns which means the
                 # script to save values is not saving the values selected in the checkbox list
                 st.error(f"The script to save databot values does not save the sensors selected.  Make sure you have selected all of the sensors in the save data script that you might want to see in the Dashboard")
 
-        df.sort_values(by=['time'], ascending=False, inplace=True)
-        if st.session_state['number_of_samples_to_display'] > 0:
-            df = df.head(st.session_state['number_of_samples_to_display'])
+        selected_devices = get_selected_devices()
+        if time_buckets is not None:
+            # one row per bucket of the window instead of the samples
+            bucket = st.session_state.get('time_bucket')
+            df = time_buckets.to_dataframe(st.session_state.get('bucket_window') or None,
+                                           st.session_state.get('bucket_statistic', default='mean'),
+                                           level=None if bucket == 'auto' else bucket,
+                                           max_points=st.session_state.get('chart_points', default=DEFAULT_CHART_POINTS))
+            df = df[[column for column in df.columns if column in columns]]
+            if selected_devices is not None:
+                df = df[df[DEVICE_ID_COLUMN].isin(selected_devices)]
+            return df
+
+        # samples are stored in arrival order, so the newest 'n' come straight off the end of the store
+        with metrics.timer('head'):
+            number_of_samples = st.session_state['number_of_samples_to_display']
+            if selected_devices is None:
+                df = sample_store.to_dataframe(number_of_samples, columns=columns)
+            else:
+                df = sample_store.to_dataframe(columns=columns)
+                df = df[df[DEVICE_ID_COLUMN].isin(selected_devices)]
+                # newest first, so the last 'n' samples of the selected databots are on top
+                df = df.head(number_of_samples) if number_of_samples else df
         return df
     except Exception as exc:
         return None
 
 
-def create_databot_config() -> DatabotConfig:
+def create_databot_config() -> 'DatabotConfig':
+    # the databot package pulls in the bluetooth stack, only load it when a collector is launched
+    from databot.PyDatabot import DatabotConfig
+
     databot_config = DatabotConfig()
     checked_save_records = get_save_fields_from_sensor_table()
     for checked_save_record in checked_save_records:
@@ -233,86 +632,201 @@ def create_databot_config() -> DatabotConfig:
     return databot_config
 
 
+def _build_sensor_charts(df: pd.DataFrame) -> list:
+    charts = []
+    # the long forms continue the previous refresh's as long as the window is the same kind of window
+    reset_key = (id(get_sample_store()), st.session_state.get('number_of_samples_to_display'),
+                 get_selected_devices(), st.session_state.get('time_range_key'))
+    display_fields_records = get_display_fields_from_sensor_table() + \
+                             get_signal_engine().chart_fields(list(df.columns))
+    for field in display_fields_records:
+        logging.debug(field)
+        try:
+            # it is possible that the new selection and the existing data have
+            # different columns...
+            with get_metrics().timer('build_chart', sensor=field['sensor_name']):
+                chart_df, spec = sensor_chart_data(df, field['data_columns'], downsample=_downsample_for_chart,
+                                                   series_column=DEVICE_ID_COLUMN,
+                                                   # the newest bucket changes in place, the long form cache only appends
+                                                   long_form_caches=None if time_bucket_key() else get_long_form_caches(),
+                                                   reset_key=reset_key)
+            charts.append((field['friendly_name'], chart_df, spec))
+        except:
+            pass
+    return charts
+
+
+def collection_finished() -> bool:
+    # the collectors stop by themselves after the number of samples to collect, or on an alert rule
+    process = st.session_state.get('pydatabot_process', default=None)
+    if process is not None:
+        # a CollectorPool has the exit code of every databot's collector
+        status = process.poll()
+        return all(code is not None for code in status.values()) if isinstance(status, dict) else status is not None
+    collector = st.session_state.get('webserver_collector', default=None)
+    return collector is not None and collector.stop_reason is not None
+
+
+def _display_alerts():
+    alerts = read_recent_alerts(DATABOT_ALERTS_FILE)
+    for alert in alerts:
+        st.write(f":red[Alert at sample {alert['sample_number']}: {alert['rule']}, value {alert['value']:g}]")
+
+
+def _arrow_table(df: pd.DataFrame) -> 'pa.Table':
+    # streamlit converts a pandas frame to Arrow every time it is drawn, a table only once
+    import pyarrow as pa
+    return pa.Table.from_pandas(df)
+
+
 def _display_dataframe_data(df: pd.DataFrame):
     if df is None:
         return
 
-    st.write(f":cyan[Number of records read: {df.shape[0]}]")
+    sample_store = get_sample_store()
+    number_of_records_read = sample_store.total_count
+    st.write(f":cyan[Number of records read: {number_of_records_read}]")
+    collector = st.session_state.get('webserver_collector', default=None)
+    if collector is not None and (collector.late_ticks or collector.dropped_ticks):
+        st.write(f":orange[Collector late ticks: {collector.late_ticks}, dropped ticks: {collector.dropped_ticks}]")
 
-    # if the pydata is processing/collecting data
-    # then check to see if we should stop collecting
-    if 'pydatabot_process' in st.session_state:
-        number_of_samples_to_collect = st.session_state['number_of_samples_to_collect']
-        if number_of_samples_to_collect > 0 and df.shape[0] >= number_of_samples_to_collect:
-            stop_collecting_data_on_click()
-            return
+    _display_alerts()
 
-    st.dataframe(df, use_container_width=True)
-    display_fields_records = get_display_fields_from_sensor_table()
-    for field in display_fields_records:
-        logging.debug(field)
-        data_columns = field['data_columns']
-        if len(data_columns) == 1:
-            # st.line_chart(df, x="time", y=data_column, use_container_width=True)
-            try:
-                st.divider()
-                st.write(field['friendly_name'])
-                c = alt.Chart(df).mark_line().encode(x='time', y=data_columns[0])
-                st.altair_chart(c, use_container_width=True)
-            except:
-                pass
-        else:
-            # make multi-line line chart in altair.... which is a little weird for the data
-            # https://altair-viz.github.io/user_guide/data.html#long-form-vs-wide-form-data
+    # the collectors stop on their own, only the buttons are left to update
+    if get_run_mode() != 'stop' and collection_finished():
+        stop_collecting_data_on_click()
+        # rerun the whole app, not just the live data fragment, so the buttons update
+        st.rerun()
+
+    # only rebuild the charts when the data or the display settings have changed
+    render_key = (sample_store.version, tuple(df.columns), st.session_state.get('number_of_samples_to_display'),
+                  st.session_state.get('downsample_mode'), st.session_state.get('chart_points'), get_selected_devices(),
+                  time_bucket_key())
+    last_render = st.session_state.get('last_render', default=None)
+    if last_render is None or last_render['key'] != render_key:
+        # converted to Arrow once, a refresh without new samples re-sends the same tables,
+        # which streamlit only sends to the browser as a reference to the previous message
+        last_render = {'key': render_key, 'df': _arrow_table(df.head(DATAFRAME_ROWS)),
+                       'rows_hidden': max(0, df.shape[0] - DATAFRAME_ROWS),
+                       'charts': [(friendly_name, _arrow_table(chart_df), spec)
+                                  for friendly_name, chart_df, spec in _build_sensor_charts(df)]}
+        st.session_state.last_render = last_render
+
+    st.dataframe(last_render['df'], use_container_width=True)
+    if last_render['rows_hidden']:
+        st.caption(f"The newest {DATAFRAME_ROWS} samples, the charts show all of them.")
+    for friendly_name, chart_df, spec in last_render['charts']:
+        st.divider()
+        st.write(friendly_name)
+        st.vega_lite_chart(chart_df, spec, use_container_width=True)
 
-            # df_cols are the columns we expect from collecting data
-            df_cols = data_columns.copy()
-            df_cols.append("time")
-            try:
-                # it is possible that the new selection and the existing data have
-                # different columns...
-                df_sensor_values = df[df_cols]
-                # print(df_sensor_values.columns)
-
-                st.divider()
-                st.write(field['friendly_name'])
-                c = alt.Chart(df_sensor_values).transform_fold(field['data_columns'],
-                                                               as_=['sensor_name', 'sensor_value']
-                                                               ).mark_line().encode(x='time:T',
-                                                                                    y='sensor_value:Q',
-                                                                                    color='sensor_name:N')
-                st.altair_chart(c, use_container_width=True)
-            except:
-                pass
-
-
-def draw_dashboard(placeholder_component, status_placeholder):
-    if get_run_mode() == 'start':
-        with placeholder_component.container():
-            # st.info("Reading datafile...")
-            df = read_databot_data_file(status_placeholder)
-            if df is not None:
-                st.session_state.last_df = df
-                _display_dataframe_data(df)
-    else:
-        # get the last dataframe read to display that
-        with placeholder_component.container():
-            # st.info("Reading datafile...")
+
+def draw_dashboard():
+    status_placeholder = st.empty()
+    device_selector()
+    metrics = get_metrics()
+    try:
+        with metrics.timer('refresh'):
             df = read_databot_data_file(status_placeholder)
             if df is not None:
+                if get_run_mode() == 'start':
+                    st.session_state.last_df = df
                 _display_dataframe_data(df)
+    except Exception as exc:
+        logging.exception("Could not draw the dashboard", exc_info=exc)
+    metrics.set_gauge('rss_bytes', current_rss_bytes())
+
+
+def _build_spectrum_charts(sensor_fields: list) -> list:
+    sample_store = get_sample_store()
+    streaming_spectrum = get_streaming_spectrum()
+    charts = []
+    for field in sensor_fields:
+        data_columns = [column for column in field['data_columns'] if column in sample_store.columns]
+        if st.session_state.get('spectrum_mode', default='PSD') == 'PSD':
+            psd_df = streaming_spectrum.psd(sample_store, data_columns,
+                                            st.session_state.get('psd_average_frames', default=DEFAULT_AVERAGE_FRAMES))
+            if psd_df is not None:
+                charts.append((f"{field['friendly_name']} power spectral density", build_psd_chart(psd_df)))
+        else:
+            for column in data_columns:
+                spectrogram_df = streaming_spectrum.spectrogram(sample_store, column)
+                if spectrogram_df is not None:
+                    charts.append((f"{field['friendly_name']} spectrogram: {column}",
+                                   build_spectrogram_chart(spectrogram_df)))
+    return charts
+
+
+def draw_spectrum():
+    sensor_fields = [field for field in get_display_fields_from_sensor_table() if field['sensor_name'] in IMU_SENSORS]
+    if not sensor_fields:
+        st.write("Display one of the Acceleration, Linear Acceleration, Gyroscope or Magneto sensors to see its spectrum.")
+        return
+
+    # only the frames that completed since the last refresh are transformed, and the charts are
+    # only rebuilt when there is new data or the settings changed
+    sample_store = get_sample_store()
+    render_key = (sample_store.version, tuple(field['sensor_name'] for field in sensor_fields),
+                  st.session_state.get('spectrum_mode'), st.session_state.get('fft_size'),
+                  st.session_state.get('fft_overlap'), st.session_state.get('psd_average_frames'))
+    last_render = st.session_state.get('last_spectrum_render', default=None)
+    if last_render is None or last_render['key'] != render_key:
+        with get_metrics().timer('spectrum'):
+            last_render = {'key': render_key, 'charts': _build_spectrum_charts(sensor_fields)}
+        st.session_state.last_spectrum_render = last_render
+
+    if not last_render['charts']:
+        st.write(f"Waiting for {get_streaming_spectrum().fft_size} samples with a `time` column.")
+    for friendly_name, c in last_render['charts']:
+        st.write(friendly_name)
+        st.altair_chart(c, use_container_width=True)
+        st.divider()
+
+
+def get_all_metrics() -> HotPathMetrics:
+    # this session's metrics, plus the collector thread's if it is running
+    all_metrics = HotPathMetrics()
+    all_metrics.merge(get_metrics())
+    collector = st.session_state.get('webserver_collector', default=None)
+    if collector is not None:
+        all_metrics.merge(collector.metrics)
+    return all_metrics
+
+
+def draw_diagnostics():
+    all_metrics = get_all_metrics()
+    st.metric(label="Dashboard process memory (RSS)", value=f"{current_rss_bytes() / 1024 / 1024:.1f} MB")
+    rows = all_metrics.rows()
+    if not rows:
+        st.write("No measurements yet, start reading data.")
+        return
+    st.write("Latencies are in seconds.  Percentiles are over the most recent refreshes and collector ticks.")
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    prometheus_text = all_metrics.to_prometheus()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Download Prometheus metrics", data=prometheus_text, file_name="databot_metrics.prom",
+                           mime="text/plain")
+    with col2:
+        if st.button("Write Prometheus metrics file", help=f"Writes {DATABOT_METRICS_FILE}"):
+            all_metrics.write_prometheus_file(DATABOT_METRICS_FILE)
+            st.success(f"Wrote {DATABOT_METRICS_FILE}")
 
 
 def main():
     st.header("DroneBlocks databot2.0™ Dashboard")
     setup_input_selection_sidebar()
     # tab1, tab2 = st.tabs(["Dashboard", "Sensor Map"])
-    tab1 = st.tabs(["Dashboard"])
+    tab_names = ["Dashboard"]
+    if st.session_state.get('show_spectrum', default=False):
+        tab_names.append("Spectrum")
+    if st.session_state.get('show_diagnostics', default=False):
+        tab_names.append("Diagnostics")
+    tab1 = st.tabs(tab_names)
     if 'read_data_flag' not in st.session_state:
         st.session_state['read_data_flag'] = False
 
     with tab1[0]:
-        status_placeholder = st.empty()
         col1, col2, col3 = st.columns(3)
         st.divider()
         with col1:  # start button
@@ -338,25 +852,28 @@ def main():
                 st.button("Continue Reading Data", key="pause_collect_data_btn", disabled=False,
                           on_click=continue_btn_on_click)
 
-        placeholder = st.empty()
-
         # ************************************************
-        #           DATABOT DISPLAY EVENT LOOP
+        #           DATABOT DISPLAY REFRESH
         # ************************************************
-        try:
-            while get_run_mode() == 'start':
-                draw_dashboard(placeholder, status_placeholder)
-                time.sleep(1)
-        except Exception as exc:
-            pass
-
-        try:
-            if get_run_mode() == 'stop' or get_run_mode() == 'pause':
-                draw_dashboard(placeholder, status_placeholder)
-        except:
-            pass
-        finally:
-            time.sleep(0.2)
+        # only the live data fragment reruns on the timer, the rest of the page and the
+        # buttons are left alone so they respond right away
+        refresh_every = DASHBOARD_REFRESH_SECONDS if get_run_mode() == 'start' else None
+        st.fragment(draw_dashboard, run_every=refresh_every)()
+
+    if "Spectrum" in tab_names:
+        with tab1[tab_names.index("Spectrum")]:
+            st.fragment(draw_spectrum, run_every=refresh_every)()
+
+    if "Diagnostics" in tab_names:
+        with tab1[tab_names.index("Diagnostics")]:
+            st.fragment(draw_diagnostics, run_every=refresh_every)()
+
+    metrics = get_metrics()
+    metrics.set_gauge('startup_import_seconds', get_startup_import_seconds())
+    if 'first_paint_seconds' not in st.session_state:
+        # the first full script run of this browser session
+        st.session_state.first_paint_seconds = time.perf_counter() - _script_started
+        metrics.set_gauge('first_paint_seconds', st.session_state.first_paint_seconds)
 
 
 @st.cache_data
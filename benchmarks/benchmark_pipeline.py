@@ -0,0 +1,285 @@
+"""
+End to end benchmark of the dashboard data path.
+
+Generates synthetic databot recordings and times each stage the dashboard runs on them:
+file parse, ingest into the sample store, column drop, head (newest 'n' samples), downsampling,
+and the chart data and Vega-Lite spec, plus the size of the chart specs with their data in bytes.
+
+Run from the repository root:
+
+    python -m benchmarks.benchmark_pipeline --sizes 1k,100k --output bench.json
+    python -m benchmarks.benchmark_pipeline --sizes 1k,100k --save-baseline
+    python -m benchmarks.benchmark_pipeline --sizes 1k,100k --baseline benchmarks/baseline.json
+
+The results are compared to benchmarks/baseline.json, the committed baseline of the 1k and 100k
+sizes, unless another baseline or --no-baseline is given.  The median of at least
+MIN_BASELINE_REPEAT runs is compared, and the exit code is 1 when a stage is slower than the
+baseline by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from utils.databot_simulator import SyntheticDatabotSource
+from utils.downsample import DOWNSAMPLE_MODES, DEFAULT_CHART_POINTS, downsample_frame
+from utils.sample_schema import read_json_lines
+from utils.sample_store import SampleStore
+from utils.sensor_charts import sensor_chart_data
+from utils.sensor_constants import DEFAULT_SAMPLE_STORE_CAPACITY, databot_sensor_table, databot_sensors
+
+DEFAULT_SIZES = "1k,100k,10M"
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+DEFAULT_DATA_DIR = Path(__file__).parent / "data"
+# a slower stage is only a regression when it is slower by more than this fraction...
+DEFAULT_THRESHOLD = 0.25
+# ...and by more than this many seconds, so timer noise on tiny stages is not flagged
+MIN_REGRESSION_SECONDS = 0.002
+# a single run is too noisy to compare, the median of at least this many is
+MIN_BASELINE_REPEAT = 3
+# read the recording in pieces of about this size, like the data hub reads a growing file
+PARSE_CHUNK_BYTES = 32 * 1024 * 1024
+GENERATE_CHUNK_ROWS = 100_000
+TIMED_STAGES = ['parse', 'ingest', 'column_drop', 'head', 'downsample', 'spec']
+
+
+def parse_size(size: str) -> int:
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    size = size.strip().lower()
+    if size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(size)
+
+
+def generate_recording(file_path: Path, number_of_rows: int, sensors: List[str], seed: int = 0):
+    """
+    Write a JSON lines recording like the databot collectors do.  Each line is formatted from
+    one template, which is much faster than json.dumps for the 10M row recording.
+    """
+    source = SyntheticDatabotSource(rate_hz=100.0, sensors=sensors, seed=seed)
+    columns = ['time', *source.columns]
+    template = "{" + ", ".join(f'"{column}": "%.2f"' if column == 'time' else f'"{column}": "%.4f"'
+                               for column in columns) + ', "timestamp": %.6f}'
+    start_time = 1_700_000_000.0
+    tmp_path = file_path.with_suffix(".tmp")
+    with tmp_path.open("wb") as f:
+        for start in range(0, number_of_rows, GENERATE_CHUNK_ROWS):
+            stop = min(start + GENERATE_CHUNK_ROWS, number_of_rows)
+            values = source.values(start, stop)
+            timestamps = start_time + np.arange(start, stop) / source.rate_hz
+            np.savetxt(f, np.column_stack([*(values[column] for column in columns), timestamps]), fmt=template)
+    tmp_path.replace(file_path)
+
+
+def get_recording(data_dir: Path, number_of_rows: int, sensors: List[str], seed: int) -> Path:
+    # recordings are kept between runs, the big ones take a while to generate
+    data_dir.mkdir(parents=True, exist_ok=True)
+    sensor_names = 'all' if sensors == list(databot_sensors.keys()) else '-'.join(sensors)
+    file_path = data_dir / f"databot_{number_of_rows}_{sensor_names}_{seed}.jsonl"
+    if not file_path.exists():
+        print(f"generating {file_path.name}", file=sys.stderr)
+        generate_recording(file_path, number_of_rows, sensors, seed)
+    return file_path
+
+
+def _read_chunks(file_path: Path):
+    with file_path.open("rb") as f:
+        remainder = b""
+        while True:
+            data = f.read(PARSE_CHUNK_BYTES)
+            if not data:
+                break
+            data = remainder + data
+            end = data.rfind(b"\n") + 1
+            remainder = data[end:]
+            yield data[:end]
+        if remainder.strip():
+            yield remainder
+
+
+def _sensor_table(sensors: List[str]) -> pd.DataFrame:
+    # the sidebar sensor table, with the benchmarked sensors set to display
+    df = pd.DataFrame(databot_sensor_table)
+    df['display'] = df['sensor_name'].isin(sensors)
+    return df
+
+
+def _timed(timings: dict, stage: str, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return result
+
+
+def run_pipeline(file_path: Path, sensors: List[str], capacity: int, display_samples: int,
+                 downsample_mode: str, chart_points: int) -> dict:
+    """
+    Run every stage once on the recording and return the seconds spent in each, the number of
+    rows charted and the size of the chart specs.
+    """
+    timings = {}
+    store = SampleStore(capacity=capacity)
+    for data in _read_chunks(file_path):
+        # the same parse JsonLinesTailReader does on the new bytes of the file
+        df = _timed(timings, 'parse', read_json_lines, data)
+        _timed(timings, 'ingest', store.append, df)
+
+    sensor_table = _sensor_table(sensors)
+
+    def column_drop():
+        columns_to_drop = sensor_table.query("display == False")['data_columns'].to_list()
+        columns_to_drop = [item for sublist in columns_to_drop for item in sublist]
+        return [column for column in store.columns if column not in columns_to_drop]
+
+    columns = _timed(timings, 'column_drop', column_drop)
+    df = _timed(timings, 'head', store.to_dataframe, display_samples, columns=columns)
+
+    def downsample(chart_df, value_columns, series_columns):
+        return _timed(timings, 'downsample', downsample_frame, chart_df, 'time', value_columns,
+                      threshold=chart_points, mode=downsample_mode, series_columns=series_columns)
+
+    def spec_with_data(chart_df, spec):
+        return json.dumps({**spec, 'data': {'values': json.loads(chart_df.to_json(orient='records'))}})
+
+    spec_bytes = 0
+    fields = json.loads(sensor_table.query("display == True").to_json(orient='records'))
+    for field in fields:
+        chart_df, spec = sensor_chart_data(df, field['data_columns'], downsample=downsample)
+        spec_bytes += len(_timed(timings, 'spec', spec_with_data, chart_df, spec).encode("utf-8"))
+
+    return {'timings': timings, 'rows': int(df.shape[0]), 'charts': len(fields), 'spec_bytes': spec_bytes,
+            'store_bytes': store.nbytes}
+
+
+def run_benchmarks(sizes: List[int], sensors: List[str], repeat: int, data_dir: Path, seed: int = 0,
+                   capacity: int = DEFAULT_SAMPLE_STORE_CAPACITY, display_samples: int = 0,
+                   downsample_mode: str = 'lttb', chart_points: int = DEFAULT_CHART_POINTS) -> dict:
+    results = {}
+    for number_of_rows in sizes:
+        file_path = get_recording(data_dir, number_of_rows, sensors, seed)
+        runs = [run_pipeline(file_path, sensors, capacity, display_samples, downsample_mode, chart_points)
+                for _ in range(repeat)]
+        results[str(number_of_rows)] = {
+            'file_bytes': file_path.stat().st_size,
+            'rows_charted': runs[-1]['rows'],
+            'charts': runs[-1]['charts'],
+            'spec_bytes': runs[-1]['spec_bytes'],
+            'store_bytes': runs[-1]['store_bytes'],
+            # the median is less sensitive to a run disturbed by something else on the machine
+            'seconds': {stage: statistics.median(run['timings'].get(stage, 0.0) for run in runs)
+                        for stage in TIMED_STAGES},
+        }
+        print(f"{number_of_rows:>10} rows: " + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds
+                                                          in results[str(number_of_rows)]['seconds'].items()),
+              file=sys.stderr)
+    return {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                 'pandas': pd.__version__, 'altair': alt.__version__, 'created': time.time(),
+                 'sensors': sensors, 'repeat': repeat, 'capacity': capacity, 'display_samples': display_samples,
+                 'downsample_mode': downsample_mode, 'chart_points': chart_points},
+        'results': results,
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Returns a message for every stage, and every spec size, that got worse than the baseline by
+    more than `threshold`.  Sizes that are not in the baseline are skipped.
+    """
+    regressions = []
+    for size, result in results['results'].items():
+        baseline_result = baseline['results'].get(size)
+        if baseline_result is None:
+            continue
+        for stage, seconds in result['seconds'].items():
+            baseline_seconds = baseline_result['seconds'].get(stage)
+            if baseline_seconds is None:
+                continue
+            if seconds > baseline_seconds * (1 + threshold) and seconds - baseline_seconds > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{size} rows, {stage}: {seconds * 1000:.1f} ms, "
+                                   f"baseline {baseline_seconds * 1000:.1f} ms")
+        if result['spec_bytes'] > baseline_result['spec_bytes'] * (1 + threshold):
+            regressions.append(f"{size} rows, spec size: {result['spec_bytes']} bytes, "
+                               f"baseline {baseline_result['spec_bytes']} bytes")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data path on synthetic recordings")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated row counts, 1k and 10M style allowed")
+    parser.add_argument("--sensors", default=",".join(databot_sensors.keys()),
+                        help="comma separated databot_sensors keys to record and chart")
+    parser.add_argument("--repeat", type=int, default=MIN_BASELINE_REPEAT,
+                        help=f"runs per size, the median is reported, at least {MIN_BASELINE_REPEAT} when "
+                             f"comparing to a baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="where generated recordings are kept")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_SAMPLE_STORE_CAPACITY,
+                        help="sample store capacity, like the sidebar setting")
+    parser.add_argument("--display-samples", type=int, default=0, help="number of samples to display, 0 for all")
+    parser.add_argument("--downsample-mode", choices=DOWNSAMPLE_MODES, default='lttb')
+    parser.add_argument("--chart-points", type=int, default=DEFAULT_CHART_POINTS)
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=None,
+                        help=f"compare the results to this baseline JSON file, defaults to {DEFAULT_BASELINE}")
+    parser.add_argument("--no-baseline", action="store_true", help="do not compare the results to a baseline")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), default=None,
+                        help=f"write the results as the new baseline, defaults to {DEFAULT_BASELINE}")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction a stage may be slower than the baseline before it is flagged")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sensors = [sensor.strip() for sensor in args.sensors.split(",") if sensor.strip()]
+    unknown = [sensor for sensor in sensors if sensor not in databot_sensors]
+    if unknown:
+        print(f"Unknown sensors: {unknown}, expected some of {list(databot_sensors.keys())}", file=sys.stderr)
+        return 2
+
+    baseline_path = args.baseline
+    if baseline_path is None and not args.no_baseline and not args.save_baseline and DEFAULT_BASELINE.exists():
+        baseline_path = str(DEFAULT_BASELINE)
+    repeat = max(1, args.repeat)
+    if baseline_path and repeat < MIN_BASELINE_REPEAT:
+        print(f"comparing the median of {MIN_BASELINE_REPEAT} runs to the baseline", file=sys.stderr)
+        repeat = MIN_BASELINE_REPEAT
+
+    results = run_benchmarks([parse_size(size) for size in args.sizes.split(",")], sensors, repeat,
+                             Path(args.data_dir), seed=args.seed, capacity=args.capacity,
+                             display_samples=args.display_samples, downsample_mode=args.downsample_mode,
+                             chart_points=args.chart_points)
+    output = json.dumps(results, indent=1)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(output)
+        print(f"saved baseline {args.save_baseline}", file=sys.stderr)
+
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())
+        if baseline['meta'].get('platform') != results['meta']['platform']:
+            print(f"the baseline is from {baseline['meta'].get('platform')}, timings on another machine "
+                  f"are only roughly comparable", file=sys.stderr)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("no regressions", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
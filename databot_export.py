@@ -0,0 +1,68 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from utils.recording_export import DEFAULT_CHUNK_BYTES, EXPORT_FORMATS, RESAMPLE_AGGREGATIONS, export_format_of, \
+    export_recording, export_recordings, parse_time
+from utils.sensor_constants import databot_sensors
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert databot recordings to CSV, Parquet or Arrow files")
+    parser.add_argument("recordings", nargs="+",
+                        help="JSON lines recordings, plain or compressed, rotated recording directories "
+                             "or columnar recording directories")
+    parser.add_argument("--output", default=None,
+                        help="the file to write, only for a single recording, the format follows from its suffix")
+    parser.add_argument("--output-dir", default=None,
+                        help="write the export of every recording into this directory, named after the recording")
+    parser.add_argument("--format", dest="file_format", choices=list(EXPORT_FORMATS), default=None,
+                        help="the output format, defaults to the suffix of --output, or csv with --output-dir")
+    parser.add_argument("--sensors", default=None,
+                        help=f"comma separated sensors to export, defaults to every column, choose from: "
+                             f"{','.join(databot_sensors)}")
+    parser.add_argument("--start", default=None, help="only export samples from this time, epoch seconds or an ISO date in UTC")
+    parser.add_argument("--end", default=None, help="only export samples up to this time, epoch seconds or an ISO date in UTC")
+    parser.add_argument("--resample", default=None, help="resample into buckets of this size, like 100ms or 1s")
+    parser.add_argument("--how", choices=RESAMPLE_AGGREGATIONS, default="mean",
+                        help="resample only: how the samples of a bucket are combined")
+    parser.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / 1024 / 1024,
+                        help="megabytes of JSON converted at a time, the memory used grows with it")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="processes converting recordings at the same time, defaults to one per core")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    if (args.output is None) == (args.output_dir is None):
+        raise SystemExit("Pass either --output or --output-dir")
+    if args.output is not None and len(args.recordings) > 1:
+        raise SystemExit("--output takes a single recording, use --output-dir for several")
+
+    options = {
+        'sensors': args.sensors.split(",") if args.sensors else None,
+        'start_time': parse_time(args.start),
+        'end_time': parse_time(args.end),
+        'resample': args.resample,
+        'how': args.how,
+        'chunk_bytes': int(args.chunk_mb * 1024 * 1024),
+    }
+    try:
+        if args.output is not None:
+            file_format = args.file_format or export_format_of(args.output)
+            rows = {args.recordings[0]: export_recording(args.recordings[0], args.output, file_format, **options)}
+        else:
+            rows = export_recordings(args.recordings, args.output_dir, args.file_format or 'csv', args.jobs, **options)
+    except (ValueError, FileNotFoundError) as exc:
+        raise SystemExit(str(exc))
+    for recording, number_of_rows in rows.items():
+        print(f"{Path(recording).name}: {number_of_rows} rows", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
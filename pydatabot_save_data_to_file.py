@@ -1,31 +1,161 @@
+import argparse
 import time
 
-from databot.PyDatabot import PyDatabot, PyDatabotSaveToFileDataCollector, DatabotConfig
+from databot.PyDatabot import PyDatabot, DatabotConfig
 
-from utils.sensor_constants import DATABOT_DATA_FILE
+from utils.alert_rules import AlertEngine, load_alert_rules
+from utils.batched_writer import DURABILITY_POLICIES, DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, DEFAULT_FSYNC_EVERY, \
+    DEFAULT_FSYNC_INTERVAL
+from utils.columnar_recording import DEFAULT_SEGMENT_SAMPLES, DEFAULT_SEGMENT_FLUSH_INTERVAL
+from utils.compressed_recording import COMPRESSIONS, compressed_path
+from utils.databot_collectors import PyDatabotSaveToBatchedFileDataCollector, PyDatabotSaveToColumnarDataCollector, \
+    PyDatabotSaveToRotatingFileDataCollector, PyDatabotSaveToSharedRingDataCollector
+from utils.databot_simulator import SIMULATED_DATABOT_ADDRESS, create_simulation_source, simulated_collector_class
+from utils.segment_rotation import RotationPolicy
+from utils.sensor_constants import DATABOT_ALERTS_FILE, DATABOT_DATA_FILE, DATABOT_RING_FILE, DATABOT_ROTATED_DIR, \
+    DATABOT_SEGMENTS_DIR, databot_sensors
+from utils.shared_ring import DEFAULT_RING_CAPACITY, SharedRingWriter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Collect databot sensor values and save them to a file")
+    parser.add_argument("--format", dest="file_format", choices=["jsonl", "arrow", "parquet"], default="jsonl",
+                        help="jsonl writes one JSON line per sample, arrow and parquet write rolling columnar segments")
+    parser.add_argument("--flush-every-samples", type=int, default=DEFAULT_SEGMENT_SAMPLES,
+                        help="columnar formats only: number of samples per segment")
+    parser.add_argument("--flush-interval", type=float, default=None,
+                        help=f"maximum number of seconds a sample is buffered before it is written, "
+                             f"defaults to {DEFAULT_FLUSH_INTERVAL} for jsonl and {DEFAULT_SEGMENT_FLUSH_INTERVAL} for the columnar formats")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="jsonl only: number of samples written with one write call")
+    parser.add_argument("--durability", choices=DURABILITY_POLICIES, default="flush",
+                        help="jsonl only: none never fsyncs, flush fsyncs every --fsync-interval seconds, "
+                             "fsync every --fsync-every batches, both also fsync when collection ends")
+    parser.add_argument("--fsync-every", type=int, default=DEFAULT_FSYNC_EVERY,
+                        help="jsonl only: number of batches between fsyncs with --durability fsync")
+    parser.add_argument("--fsync-interval", type=float, default=DEFAULT_FSYNC_INTERVAL,
+                        help="jsonl only: minimum number of seconds between fsyncs with --durability flush")
+    parser.add_argument("--compress", choices=COMPRESSIONS, default="none",
+                        help="jsonl only: write every batch as a gzip or zstd frame, adds .gz or .zst to the file name")
+    parser.add_argument("--rotate-bytes", type=int, default=0,
+                        help="jsonl only: start a new numbered segment once the current one is this many bytes")
+    parser.add_argument("--rotate-seconds", type=float, default=0,
+                        help="jsonl only: start a new numbered segment once the current one is this many seconds old")
+    parser.add_argument("--keep-segments", type=int, default=0,
+                        help="rotated jsonl only: delete the oldest closed segments beyond this many, 0 keeps all")
+    parser.add_argument("--compress-segments", action="store_true",
+                        help="rotated jsonl only: gzip closed segments")
+    parser.add_argument("--simulate", action="store_true",
+                        help="collect from a simulated databot instead of a real one over bluetooth")
+    parser.add_argument("--simulate-rate", type=float, default=10.0,
+                        help="simulated databot only: synthetic samples per second")
+    parser.add_argument("--simulate-seed", type=int, default=0,
+                        help="simulated databot only: seed for the synthetic noise")
+    parser.add_argument("--replay", default=None,
+                        help="simulated databot only: replay this JSON lines recording instead of synthetic data")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="simulated databot only: replay speed, 2 replays twice as fast")
+    parser.add_argument("--shared-ring", action="store_true",
+                        help=f"also publish every sample into the shared memory ring {DATABOT_RING_FILE} for the dashboard")
+    parser.add_argument("--ring-capacity", type=int, default=DEFAULT_RING_CAPACITY,
+                        help="shared ring only: number of samples in the ring")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="shared ring only: do not save the samples to a file")
+    parser.add_argument("--device-id", default=None,
+                        help="add this device_id to every sample, to tell several databots apart")
+    parser.add_argument("--address", default=None,
+                        help="bluetooth address of the databot, defaults to the first one found")
+    parser.add_argument("--output", default=None,
+                        help=f"jsonl only: the file to save to, defaults to {DATABOT_DATA_FILE}")
+    parser.add_argument("--sensors", default=None,
+                        help=f"comma separated sensors to collect, defaults to all of: {','.join(databot_sensors)}")
+    parser.add_argument("--refresh", type=int, default=None,
+                        help="milliseconds between samples, defaults to the databot's default")
+    parser.add_argument("--rules", default=None,
+                        help="JSON file of alert rules checked on every sample, see utils/alert_rules.py")
+    parser.add_argument("--alerts-file", default=str(DATABOT_ALERTS_FILE),
+                        help="where the alerts the rules fire are appended as JSON lines")
+    parser.add_argument("--stop-after", type=int, default=0,
+                        help="stop after this many samples, 0 collects until stopped")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
     c = DatabotConfig()
-    c.accl = True
-    c.alti = True
-    c.ambLight = True
-    c.pressure = True
-    c.co2 = True
-    c.Etemp1 = True
-    c.Etemp2 = True
-    c.gyro = True
-    c.hum = True
-    c.Laccl = True
-    c.magneto = True
-    c.UV = True
-    c.voc = True
-    c.Sdist = True
-    c.address = PyDatabot.get_databot_address()
-
-    print(f"Save data to file: {DATABOT_DATA_FILE}")
-    time.sleep(2)
-    db = PyDatabotSaveToFileDataCollector(c, file_name=DATABOT_DATA_FILE)
+    if args.sensors:
+        for sensor in args.sensors.split(","):
+            if sensor not in databot_sensors:
+                raise SystemExit(f"Unknown sensor: {sensor}, choose from {','.join(databot_sensors)}")
+            setattr(c, sensor, True)
+    else:
+        c.accl = True
+        c.alti = True
+        c.ambLight = True
+        c.pressure = True
+        c.co2 = True
+        c.Etemp1 = True
+        c.Etemp2 = True
+        c.gyro = True
+        c.hum = True
+        c.Laccl = True
+        c.magneto = True
+        c.UV = True
+        c.voc = True
+        c.Sdist = True
+    if args.refresh:
+        c.refresh = args.refresh
+    if args.simulate:
+        c.address = SIMULATED_DATABOT_ADDRESS
+    elif args.address:
+        c.address = args.address
+    else:
+        c.address = PyDatabot.get_databot_address()
+    extra_data = None if args.device_id is None else {'device_id': args.device_id}
+    data_file = compressed_path(args.output or DATABOT_DATA_FILE, args.compress)
+
+    def collector_class(cls):
+        return simulated_collector_class(cls) if args.simulate else cls
+
+    rotation = RotationPolicy(max_bytes=args.rotate_bytes, max_seconds=args.rotate_seconds,
+                              keep_segments=args.keep_segments, compress=args.compress_segments)
+    if args.shared_ring and args.no_archive:
+        print(f"Publish data to the shared ring: {DATABOT_RING_FILE}")
+        db = collector_class(PyDatabotSaveToSharedRingDataCollector)(c, ring_path=DATABOT_RING_FILE,
+                                                                      ring_capacity=args.ring_capacity,
+                                                                      extra_data=extra_data)
+    elif args.file_format == "jsonl" and rotation.enabled:
+        print(f"Save rotated data files to: {DATABOT_ROTATED_DIR}")
+        time.sleep(2)
+        db = collector_class(PyDatabotSaveToRotatingFileDataCollector)(
+            c, directory=DATABOT_ROTATED_DIR, rotation=rotation, extra_data=extra_data, batch_size=args.batch_size,
+            flush_interval=args.flush_interval or DEFAULT_FLUSH_INTERVAL,
+            durability=args.durability, fsync_every=args.fsync_every, fsync_interval=args.fsync_interval)
+    elif args.file_format == "jsonl":
+        print(f"Save data to file: {data_file}")
+        time.sleep(2)
+        db = collector_class(PyDatabotSaveToBatchedFileDataCollector)(
+            c, file_name=data_file, extra_data=extra_data, batch_size=args.batch_size,
+            flush_interval=args.flush_interval or DEFAULT_FLUSH_INTERVAL,
+            durability=args.durability, fsync_every=args.fsync_every, fsync_interval=args.fsync_interval,
+            compression=args.compress)
+    else:
+        print(f"Save {args.file_format} segments to: {DATABOT_SEGMENTS_DIR}")
+        time.sleep(2)
+        db = collector_class(PyDatabotSaveToColumnarDataCollector)(
+            c, directory=DATABOT_SEGMENTS_DIR, file_format=args.file_format, extra_data=extra_data,
+            flush_every_samples=args.flush_every_samples,
+            flush_interval=args.flush_interval or DEFAULT_SEGMENT_FLUSH_INTERVAL)
+    if args.shared_ring and not args.no_archive:
+        print(f"Publish data to the shared ring: {DATABOT_RING_FILE}")
+        db.tee_to(SharedRingWriter(DATABOT_RING_FILE, capacity=args.ring_capacity))
+    if args.rules or args.stop_after:
+        rules = load_alert_rules(args.rules) if args.rules else []
+        db.alert_engine = AlertEngine(rules, stop_after_samples=args.stop_after, alert_file=args.alerts_file)
+    if args.simulate:
+        db.simulation_source = create_simulation_source(args.simulate_rate, args.replay, args.replay_speed,
+                                                        seed=args.simulate_seed)
     db.run()
 
 
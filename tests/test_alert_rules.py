@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.alert_rules import AlertEngine, AlertRule, alert_rules_from_dicts, load_alert_rules, read_recent_alerts
+
+
+def _run(engine: AlertEngine, column: str, values, step: float = 0.02) -> list:
+    # the databot's time, seconds with two decimals
+    return [alert for n, value in enumerate(values)
+            for alert in engine.evaluate({'time': round(12.34 + n * step, 2), column: value})]
+
+
+def test_threshold_fires_once_and_again_after_it_cleared():
+    engine = AlertEngine([AlertRule('external_temp_1', above=35)], alert_file=None)
+    alerts = _run(engine, 'external_temp_1', [30, 36, 37, 36, 30, 31, 40])
+
+    assert [alert.value for alert in alerts] == [36, 40]
+    assert [alert.sample_number for alert in alerts] == [2, 7]
+    assert alerts[0].time == 12.36
+    assert alerts[0].rule == "external_temp_1 above 35"
+
+
+def test_rate_is_per_second():
+    engine = AlertEngine([AlertRule('pressure', kind='rate', limit=10.0)], alert_file=None)
+    # 0.1 per 20 ms is 5 per second, 0.4 per 20 ms is 20 per second
+    alerts = _run(engine, 'pressure', [1000.0, 1000.1, 1000.2, 1000.6, 1000.7])
+    assert [alert.sample_number for alert in alerts] == [4]
+
+
+def test_zscore_fires_on_a_spike_only():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0.0, 1.0, 300)
+    values[200] = 12.0
+    engine = AlertEngine([AlertRule('acceleration_x', kind='zscore', limit=6, window=100)], alert_file=None)
+    alerts = _run(engine, 'acceleration_x', values)
+    assert [alert.sample_number for alert in alerts] == [201]
+
+
+def test_missing_and_nan_values_are_skipped():
+    engine = AlertEngine([AlertRule('light', below=10)], alert_file=None)
+    assert engine.evaluate({'time': 12.34}) == []
+    assert engine.evaluate({'time': 12.36, 'light': float('nan')}) == []
+    assert len(engine.evaluate({'time': 12.38, 'light': 5})) == 1
+
+
+def test_stop_reason():
+    engine = AlertEngine(stop_after_samples=3, alert_file=None)
+    _run(engine, 'light', [1, 2])
+    assert engine.stop_reason is None
+    _run(engine, 'light', [3])
+    assert engine.stop_reason == "collected 3 samples"
+
+    engine = AlertEngine([AlertRule('light', above=100, stop=True)], alert_file=None)
+    _run(engine, 'light', [1, 200, 1])
+    assert engine.stop_reason == "alert: light above 100"
+
+
+def test_rules_file(tmp_path):
+    path = tmp_path / 'alert_rules.json'
+    path.write_text(json.dumps([{"sensor": "accl", "kind": "zscore"}, {"column": "pressure", "below": 900}]))
+    rules = load_alert_rules(path)
+
+    assert [rule.column for rule in rules] == ['acceleration_x', 'acceleration_y', 'acceleration_z',
+                                               'absolute_acceleration', 'pressure']
+    assert rules[0].limit == 3.0 and rules[-1].kind == 'threshold'
+    with pytest.raises(ValueError):
+        alert_rules_from_dicts([{"column": "temperature", "above": 35}])
+    with pytest.raises(ValueError):
+        alert_rules_from_dicts([{"sensor": "thermometer", "above": 35}])
+    with pytest.raises(ValueError):
+        AlertRule('pressure', kind='rate')
+
+
+def test_alerts_are_appended_for_the_dashboard(tmp_path):
+    path = tmp_path / 'alerts.jsonl'
+    engine = AlertEngine([AlertRule('light', above=10)], alert_file=path)
+    _run(engine, 'light', [20, 0, 30, 0, 40])
+    engine.close()
+
+    alerts = read_recent_alerts(path, count=2)
+    assert [alert['value'] for alert in alerts] == [30, 40]
+    assert alerts[-1]['time'] == 12.42
+    assert read_recent_alerts(path, count=5, tail_bytes=150)[-1]['value'] == 40
+    assert read_recent_alerts(tmp_path / 'missing.jsonl') == []
@@ -0,0 +1,44 @@
+import json
+import time
+
+import pytest
+
+from utils.batched_writer import BatchedLineWriter
+
+
+def _write(writer: BatchedLineWriter, start: int, stop: int):
+    for n in range(start, stop):
+        # the databot's time in seconds with two decimals
+        writer.write_record({'time': round(12.34 + n * 0.02, 2), 'light': n})
+
+
+def test_batches_are_visible_as_soon_as_they_are_written(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    with BatchedLineWriter(path, batch_size=10, durability='none') as writer:
+        _write(writer, 0, 25)
+        assert writer.batches_written == 2
+        assert len(path.read_text().splitlines()) == 20
+    assert [json.loads(line)['light'] for line in path.read_text().splitlines()] == list(range(25))
+    assert writer.fsyncs == 0
+
+
+def test_flush_fsyncs_by_interval_and_fsync_by_batches(tmp_path):
+    with BatchedLineWriter(tmp_path / 'flush.jsonl', batch_size=10, durability='flush', fsync_interval=0.1) as writer:
+        _write(writer, 0, 50)
+        # the first interval has not passed yet
+        assert writer.fsyncs == 0
+        time.sleep(0.15)
+        _write(writer, 50, 100)
+        assert writer.fsyncs == 1
+    # and once more when it is closed
+    assert writer.fsyncs == 2
+
+    with BatchedLineWriter(tmp_path / 'fsync.jsonl', batch_size=10, durability='fsync', fsync_every=2) as writer:
+        _write(writer, 0, 50)
+        assert writer.fsyncs == 2
+    assert writer.fsyncs == 3
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        BatchedLineWriter('unused.jsonl', durability='sometimes')
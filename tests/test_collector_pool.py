@@ -0,0 +1,86 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from utils.collector_pool import (CollectorPool, DeviceSpec, MergedDevicesReader, device_file_name,
+                                  is_device_recording, write_devices_manifest)
+from utils.time_index import frame_times
+
+START = 1_700_000_000.0
+
+
+def _append(path, times, light: int = 0):
+    with path.open("a") as f:
+        for sample_time in times:
+            # every databot's own time starts at zero, only the collector's timestamp orders them
+            f.write(json.dumps({'timestamp': sample_time, 'time': round(sample_time - START, 2), 'light': light}) + "\n")
+
+
+def _recording(directory, device_ids):
+    directory.mkdir(exist_ok=True)
+    write_devices_manifest(directory, [DeviceSpec(device_id) for device_id in device_ids])
+    return {device_id: directory / device_file_name(device_id) for device_id in device_ids}
+
+
+def test_merges_the_databots_in_time_order(tmp_path):
+    paths = _recording(tmp_path, ['a', 'b'])
+    assert is_device_recording(tmp_path)
+    reader = MergedDevicesReader(tmp_path)
+    merged = []
+    for chunk in range(3):
+        # a is at 50 Hz, b at 20 Hz and a little behind
+        _append(paths['a'], START + chunk + np.arange(50) * 0.02, light=1)
+        _append(paths['b'], START + chunk + 0.005 + np.arange(18) * 0.05, light=2)
+        df = reader.read_new_records()
+        merged.append(df)
+        # nothing newer than the newest sample of the databot that is behind
+        assert frame_times(df).max() <= START + chunk + 0.005 + 17 * 0.05
+
+    times = np.concatenate([frame_times(chunk) for chunk in merged])
+    assert np.all(np.diff(times) >= 0)
+    # every sample of b, and the ones of a up to the newest of b
+    assert times.shape[0] == 3 * 18 + 2 * 50 + 43
+    assert set(merged[0]['device_id']) == {'a', 'b'}
+    assert reader.device_ids == ['a', 'b']
+
+
+def test_waits_for_every_databot_until_it_is_idle(tmp_path):
+    paths = _recording(tmp_path, ['a', 'b'])
+    reader = MergedDevicesReader(tmp_path, idle_seconds=0.2)
+    _append(paths['a'], START + np.arange(10) * 0.02)
+    # b has not sent its first sample yet
+    assert reader.read_new_records() is None
+
+    time.sleep(0.3)
+    df = reader.read_new_records()
+    assert df.shape[0] == 10 and set(df['device_id']) == {'a'}
+
+    # once b sends again it holds a back again
+    _append(paths['b'], [START + 0.51])
+    _append(paths['a'], START + 0.2 + np.arange(20) * 0.02)
+    df = reader.read_new_records()
+    assert frame_times(df).max() == pytest.approx(START + 0.51)
+    assert df['device_id'].tolist()[-1] == 'b'
+
+
+def test_starts_over_when_the_manifest_is_replaced(tmp_path):
+    paths = _recording(tmp_path, ['a'])
+    reader = MergedDevicesReader(tmp_path)
+    _append(paths['a'], START + np.arange(5) * 0.02)
+    assert reader.read_new_records().shape[0] == 5
+
+    paths = _recording(tmp_path, ['1', '2'])
+    _append(paths['1'], [START + 10.0])
+    _append(paths['2'], [START + 10.01])
+    df = reader.read_new_records()
+    assert reader.file_generation == 1
+    # a device id from the manifest stays a string, even when it looks like a number
+    assert df['device_id'].tolist() == ['1']
+
+
+def test_device_ids_must_be_unique(tmp_path):
+    with pytest.raises(ValueError):
+        CollectorPool([DeviceSpec('a'), DeviceSpec('a')], tmp_path)
+    assert device_file_name('../x y') == "_x_y.json"
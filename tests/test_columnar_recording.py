@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from utils.columnar_recording import (ColumnarSegmentTailReader, ColumnarSegmentWriter, columnar_time_bounds,
+                                      list_segments, read_columnar_recording, read_columnar_time_range, read_segment)
+
+START = 1_700_000_000.0
+
+
+def _record(n: int) -> dict:
+    # like the databot sends them, strings, with the collector's epoch timestamp
+    return {'timestamp': START + n * 0.02, 'time': f"{12.34 + n * 0.02:.2f}", 'pressure': f"{1000 + n * 0.5:.4f}",
+            'acceleration_x': f"{n % 7 - 3:.4f}", 'device_id': 'a'}
+
+
+def _write(directory, file_format: str, number_of_records: int = 250) -> ColumnarSegmentWriter:
+    with ColumnarSegmentWriter(directory, file_format, flush_every_samples=100) as writer:
+        for n in range(number_of_records):
+            writer.write_record(_record(n))
+    return writer
+
+
+@pytest.mark.parametrize('file_format', ['arrow', 'parquet'])
+def test_segments_are_read_with_only_the_requested_columns(tmp_path, file_format):
+    writer = _write(tmp_path, file_format)
+    segments = list_segments(tmp_path)
+
+    assert writer.segment_number == 3 and len(segments) == 3
+    assert all(segment.suffix == f".{file_format}" for segment in segments)
+    table = read_segment(segments[0], ['pressure', 'time', 'not_a_column'])
+    assert table.schema.names == ['pressure', 'time']
+    assert table.num_rows == 100
+
+    df = read_columnar_recording(tmp_path, ['time', 'pressure'])
+    assert df.columns.tolist() == ['time', 'pressure']
+    assert df['time'].iloc[-1] == round(12.34 + 249 * 0.02, 2)
+    # the declared types of the sample schema
+    assert df['pressure'].dtype == np.float32 and df['time'].dtype == np.float64
+    assert read_columnar_recording(tmp_path)['timestamp'].dtype.kind == 'M'
+
+
+@pytest.mark.parametrize('file_format', ['arrow', 'parquet'])
+def test_tail_reader_reads_every_segment_once(tmp_path, file_format):
+    reader = ColumnarSegmentTailReader(tmp_path)
+    assert reader.read_new_records(['pressure']) is None
+    writer = ColumnarSegmentWriter(tmp_path, file_format, flush_every_samples=100)
+    for n in range(150):
+        writer.write_record(_record(n))
+
+    assert reader.read_new_records(['pressure']).shape == (100, 1)
+    assert reader.read_new_records(['pressure']) is None
+    writer.close()
+    assert reader.read_new_records(['pressure'])['pressure'].tolist() == [1000 + n * 0.5 for n in range(100, 150)]
+
+    # other columns are read from the first segment again
+    assert reader.read_new_records(['time']).shape == (150, 1)
+    assert reader.file_generation == 1
+
+
+def test_segments_are_published_by_renaming(tmp_path):
+    _write(tmp_path, 'arrow', number_of_records=100)
+    assert not list(tmp_path.glob('*.tmp'))
+    # a segment that is still being written is not one of the recording's
+    (tmp_path / 'databot_data-000001.arrow.tmp').write_bytes(b"half")
+    assert len(list_segments(tmp_path)) == 1
+    with pytest.raises(ValueError):
+        ColumnarSegmentWriter(tmp_path, 'csv')
+
+
+def test_time_range_reads_the_overlapping_segments(tmp_path):
+    _write(tmp_path, 'parquet')
+    assert columnar_time_bounds(tmp_path) == pytest.approx((START, START + 249 * 0.02))
+
+    df = read_columnar_time_range(tmp_path, START + 1.0, START + 2.5, columns=['pressure'])
+    assert df.columns.tolist() == ['pressure']
+    assert df.shape[0] == 76
@@ -0,0 +1,89 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from utils.batched_writer import BatchedLineWriter
+from utils.compressed_recording import (CompressedTailReader, FrameDecompressor, compress_frame, compressed_path,
+                                        iter_frames, read_frames_between)
+from utils.time_index import load_time_index, read_time_range
+
+
+def _record(n: int) -> dict:
+    # the databot's time in seconds with two decimals
+    return {'time': round(12.34 + n * 0.02, 2), 'light': n}
+
+
+def _lines(start: int, stop: int) -> bytes:
+    return "".join(json.dumps(_record(n)) + "\n" for n in range(start, stop)).encode("utf-8")
+
+
+def test_frames_fed_in_any_pieces():
+    frames = [compress_frame(_lines(start, start + 30), 'gzip') for start in range(0, 120, 30)]
+    data = b"".join(frames)
+    decompressor = FrameDecompressor('gzip', start_offset=100)
+    pieces = [data[position:position + 7] for position in range(0, len(data), 7)]
+    complete = [(offset, complete) for piece in pieces for offset, _, complete in decompressor.feed_frames(piece)
+                if complete]
+
+    assert b"".join(FrameDecompressor('gzip').feed(piece) for piece in [data]) == _lines(0, 120)
+    # the offset of every frame is where it starts in the file
+    assert [offset for offset, _ in complete] == (100 + np.cumsum([0] + [len(f) for f in frames[:-1]])).tolist()
+    # a multi member gzip file for gunzip
+    assert gzip.decompress(data) == _lines(0, 120)
+
+
+def test_tail_reader_waits_for_the_rest_of_a_frame(tmp_path):
+    path = compressed_path(tmp_path / 'databot_data.jsonl', 'gzip')
+    reader = CompressedTailReader(path)
+    assert reader.read_new_records() is None
+
+    with BatchedLineWriter(path, batch_size=25, durability='none', compression='gzip') as writer:
+        for n in range(50):
+            writer.write_record(_record(n))
+        assert reader.read_new_records()['light'].tolist() == list(range(50))
+
+    frame = compress_frame(_lines(50, 60), 'gzip')
+    with path.open("ab") as f:
+        f.write(frame[:len(frame) // 2])
+    # only the complete lines of the part of the frame that is there, the third line is cut off
+    assert reader.read_new_records()['light'].tolist() == [50, 51]
+    with path.open("ab") as f:
+        f.write(frame[len(frame) // 2:])
+    assert reader.read_new_records()['light'].tolist() == list(range(52, 60))
+
+    path.write_bytes(compress_frame(_lines(100, 101), 'gzip'))
+    assert reader.read_new_records()['light'].tolist() == [100]
+    assert reader.file_generation == 1
+
+
+def test_time_index_offsets_are_frame_starts(tmp_path):
+    path = compressed_path(tmp_path / 'databot_data.jsonl', 'gzip')
+    with BatchedLineWriter(path, batch_size=50, durability='none', time_index=True, index_every_rows=100,
+                           compression='gzip') as writer:
+        for n in range(1000):
+            writer.write_record(_record(n))
+
+    frame_offsets = [offset for offset, _ in iter_frames(path)]
+    assert len(frame_offsets) == 20
+    index = load_time_index(path, rebuild=False)
+    assert set(index.offsets.tolist()) <= set(frame_offsets)
+    assert index.times[1] == 14.34
+
+    data = read_frames_between(path, int(index.offsets[2]), int(index.offsets[3]))
+    assert data == _lines(200, 300)
+
+    df = read_time_range(path, 20.0, 22.0)
+    assert df['light'].tolist() == list(range(383, 484))
+
+
+def test_zstd_needs_the_zstandard_package():
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        with pytest.raises(RuntimeError):
+            compress_frame(b"", 'zstd')
+        return
+    data = b"".join(compress_frame(_lines(start, start + 10), 'zstd') for start in range(0, 30, 10))
+    assert FrameDecompressor('zstd').feed(data) == _lines(0, 30)
@@ -0,0 +1,58 @@
+import json
+
+from utils.data_file_reader import JsonLinesTailReader
+
+
+def _line(n: int) -> str:
+    # the databot reports its time in seconds with two decimals
+    return json.dumps({'time': round(12.34 + n * 0.01, 2), 'light': n}) + "\n"
+
+
+def test_returns_only_the_new_rows(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    reader = JsonLinesTailReader(path)
+    assert reader.read_new_records() is None
+
+    path.write_text("".join(_line(n) for n in range(3)))
+    assert reader.read_new_records()['light'].tolist() == [0, 1, 2]
+    assert reader.read_new_records() is None
+
+    with path.open("a") as f:
+        f.write(_line(3))
+    df = reader.read_new_records()
+    assert df['light'].tolist() == [3]
+    assert df['time'].tolist() == [12.37]
+
+
+def test_a_half_written_line_waits_for_its_end(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    line = _line(1)
+    path.write_text(_line(0) + line[:10])
+    reader = JsonLinesTailReader(path)
+    assert reader.read_new_records()['light'].tolist() == [0]
+    assert reader.read_new_records() is None
+
+    with path.open("a") as f:
+        f.write(line[10:])
+    assert reader.read_new_records()['light'].tolist() == [1]
+    assert reader.bytes_read == path.stat().st_size
+
+
+def test_starts_over_when_the_file_is_replaced_or_truncated(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    path.write_text("".join(_line(n) for n in range(5)))
+    reader = JsonLinesTailReader(path)
+    reader.read_new_records()
+
+    path.write_text(_line(10))
+    assert reader.read_new_records()['light'].tolist() == [10]
+    assert reader.file_generation == 1
+
+    # the same size, rewritten in place
+    path.write_text(_line(20))
+    assert reader.read_new_records()['light'].tolist() == [20]
+    assert reader.file_generation == 2
+
+    path.unlink()
+    assert reader.read_new_records() is None
+    assert reader.file_generation == 3
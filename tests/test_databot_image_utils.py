@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from utils.databot_image_utils import HotSpotIndex, find_box
+
+
+def _hot_spots() -> pd.DataFrame:
+    return pd.DataFrame({'name': ['battery', 'light', 'overlap'],
+                         'upper_left_x': [0.1, 0.5, 0.15], 'upper_left_y': [0.1, 0.5, 0.15],
+                         'lower_right_x': [0.3, 0.9, 0.6], 'lower_right_y': [0.3, 0.9, 0.6],
+                         'sensor_number': [1, 2, 3]})
+
+
+def test_query_matches_find_box():
+    df = _hot_spots()
+    index = HotSpotIndex(df, grid_size=8)
+    rng = np.random.default_rng(0)
+    xs, ys = rng.uniform(0, 1, 2000), rng.uniform(0, 1, 2000)
+
+    expected = []
+    for x, y in zip(xs, ys):
+        match = find_box(x, y, df)
+        expected.append(-1 if match is None else df.index.get_loc(match[0]))
+    np.testing.assert_array_equal(index.query(xs, ys), expected)
+
+
+def test_find_boxes_keeps_the_dtypes():
+    df = _hot_spots()
+    boxes = HotSpotIndex(df).find_boxes([0.2, 0.7], [0.2, 0.7])
+    assert boxes['name'].tolist() == ['battery', 'light']
+    assert boxes.dtypes.equals(df.dtypes)
+
+    boxes = HotSpotIndex(df).find_boxes([0.2, 0.95], [0.2, 0.95])
+    assert boxes['sensor_number'].dtype == pd.Int64Dtype()
+    assert boxes['sensor_number'].iloc[0] == 1 and boxes['sensor_number'].isna().iloc[1]
+    assert boxes['upper_left_x'].dtype == np.float64
+
+
+def test_find_boxes_without_points_or_boxes():
+    df = _hot_spots()
+    assert HotSpotIndex(df).find_boxes([], []).columns.tolist() == df.columns.tolist()
+    assert HotSpotIndex(df).find_boxes([], []).shape[0] == 0
+
+    boxes = HotSpotIndex(df.iloc[:0]).find_boxes([0.2], [0.2])
+    assert boxes.shape[0] == 1 and boxes['name'].isna().all()
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from utils.databot_simulator import ReplayDatabotSource, SyntheticDatabotSource, write_simulated_jsonl
+
+
+def test_time_is_seconds_with_two_decimals():
+    source = SyntheticDatabotSource(rate_hz=50.0, sensors=['pressure'])
+    records = source.records(0, 4)
+
+    assert [record['time'] for record in records] == ["0.00", "0.02", "0.04", "0.06"]
+    assert source.record(150)['time'] == "3.00"
+    assert source.index_at(3.0) == 150 and source.offset_of(150) == 3.0
+
+
+def test_records_are_the_same_for_any_range():
+    source = SyntheticDatabotSource(rate_hz=10.0, seed=3)
+    assert source.records(0, 5000)[4321] == SyntheticDatabotSource(rate_hz=10.0, seed=3).record(4321)
+    assert source.record(1) != SyntheticDatabotSource(rate_hz=10.0, seed=4).record(1)
+    with pytest.raises(ValueError):
+        SyntheticDatabotSource(rate_hz=0)
+
+
+def test_replay_keeps_the_pace_of_the_recording(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    write_simulated_jsonl(SyntheticDatabotSource(rate_hz=20.0, sensors=['pressure']), path, 100,
+                          start_time=1_700_000_000.0)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[1]['time'] == "0.05"
+
+    replay = ReplayDatabotSource(path, speed=2.0)
+    assert replay.number_of_records == 100
+    assert 'timestamp' not in replay.record(0)
+    assert replay.offset_of(10) == pytest.approx(0.25)
+    assert replay.index_at(0.25) == 10
+
+
+def test_replay_without_timestamp_paces_by_time(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    path.write_text("".join(json.dumps({'time': time, 'pressure': 1000}) + "\n" for time in ["12.34", "12.44", "12.54"]))
+    replay = ReplayDatabotSource(path, loop=True)
+
+    assert replay.offset_of(2) == pytest.approx(0.2)
+    # the next loop starts one step after the last record
+    assert replay.offset_of(3) == pytest.approx(0.3)
+    assert replay.index_at(0.35) == 3
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from utils.downsample import DownsampleCache, downsample_frame, lttb_indices, minmax_indices
+
+
+def _series(number_of_samples: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    # the databot's time, seconds with two decimals at 100 Hz
+    x = np.round(1_700_000_000.0 + np.arange(number_of_samples) * 0.01, 2)
+    y = np.sin(np.arange(number_of_samples) / 50.0) + rng.normal(0.0, 0.05, number_of_samples)
+    return x, y
+
+
+def test_lttb_keeps_the_end_points_and_a_spike():
+    x, y = _series(10_000)
+    y[4321] = 25.0
+    indices = lttb_indices(x, y, 200)
+
+    assert indices.shape[0] == 200
+    assert indices[0] == 0 and indices[-1] == x.shape[0] - 1
+    assert 4321 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_skips_nan_and_returns_short_series_whole():
+    x, y = _series(10)
+    y[3] = np.nan
+    np.testing.assert_array_equal(lttb_indices(x, y, 100), [0, 1, 2, 4, 5, 6, 7, 8, 9])
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    _, y = _series(1000)
+    y[10], y[990] = -9.0, 9.0
+    indices = minmax_indices(y, 100)
+
+    assert indices.shape[0] <= 100
+    assert 10 in indices and 990 in indices
+
+
+def test_live_window_reuses_the_finished_buckets():
+    x, y = _series(60_000)
+    y[30_000] = 25.0
+    cache = DownsampleCache()
+    window = 20_000
+    for end in range(window, x.shape[0] + 1, 250):
+        # newest first, the way the dashboard's window is ordered
+        window_x, window_y = x[end - window:end][::-1], y[end - window:end][::-1]
+        indices = cache.get_live_indices('pressure', window_x, window_y, 500, 'lttb')
+        if end - window <= 30_000 < end:
+            assert 25.0 in window_y[indices]
+        kept_x = window_x[indices]
+        assert kept_x[0] == window_x.min() and kept_x[-1] == window_x.max()
+        assert np.all(np.diff(kept_x) > 0)
+        assert indices.shape[0] <= 520
+
+    updates = (x.shape[0] - window) // 250
+    # after the first window only the buckets the new samples fall into are computed
+    assert cache.buckets_computed < 500 + updates * 10
+
+
+def test_live_window_starts_over_when_the_samples_do():
+    x, y = _series(5000)
+    cache = DownsampleCache()
+    cache.get_live_indices('pressure', x, y, 100, 'lttb')
+    indices = cache.get_live_indices('pressure', x[:3000] - 1000.0, y[:3000], 100, 'lttb')
+    assert indices[0] == 0 and indices[-1] == 2999
+    assert np.all(indices < 3000)
+
+
+def test_downsample_frame_splits_the_series():
+    x, y = _series(4000)
+    df = pd.DataFrame({'time': x, 'pressure': y, 'device_id': np.where(np.arange(4000) % 2, 'a', 'b')})
+    result = downsample_frame(df, 'time', ['pressure'], threshold=100, mode='lttb', cache=DownsampleCache(),
+                              window_key='window', series_columns=['device_id'], live=True)
+
+    sizes = result.groupby('device_id').size()
+    assert sizes.between(90, 110).all() and sizes.shape[0] == 2
+    assert df.index.is_monotonic_increasing and result.index.isin(df.index).all()
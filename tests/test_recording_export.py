@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.batched_writer import BatchedLineWriter
+from utils.compressed_recording import compressed_path
+from utils.recording_export import (ChunkResampler, _complete_lines, _iter_json_chunks, export_recording,
+                                    export_recordings, iter_recording, sensor_columns)
+from utils.time_index import load_time_index
+
+START = 1_700_000_000.0
+
+
+def _write_recording(path, number_of_records: int = 3000, compression: str = 'none'):
+    rng = np.random.default_rng(0)
+    with BatchedLineWriter(path, batch_size=50, durability='none', time_index=True, index_every_rows=100,
+                           compression=compression) as writer:
+        for n in range(number_of_records):
+            # 50 Hz, the databot's time in seconds with two decimals
+            writer.write_record({'timestamp': START + n * 0.02, 'time': f"{12.34 + n * 0.02:.2f}",
+                                 'pressure': f"{1000 + rng.normal():.4f}",
+                                 'acceleration_x': f"{rng.normal():.4f}"})
+
+
+def test_complete_lines_regroups_the_blocks():
+    blocks = [b'{"a": 1}\n{"a"', b': 2}\n', b'{"a": 3}\n{"a": 4', b'}\n{"a": 5']
+    chunks = list(_complete_lines(iter(blocks), chunk_bytes=10))
+
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    # the last line has no newline yet and is left out
+    assert b"".join(chunks) == b'{"a": 1}\n{"a": 2}\n{"a": 3}\n{"a": 4}\n'
+
+
+def test_resampler_holds_back_the_last_bucket():
+    times = pd.to_datetime(START + np.arange(10) * 0.25, unit='s')
+    df = pd.DataFrame({'timestamp': times, 'time': 12.34 + np.arange(10) * 0.25, 'pressure': np.arange(10.0)})
+    resampler = ChunkResampler('1s')
+
+    # the first chunk ends in the middle of the second bucket
+    first = resampler.feed(df.iloc[:6])
+    assert first['pressure'].tolist() == [1.5]
+    second = resampler.feed(df.iloc[6:])
+    assert second['pressure'].tolist() == [5.5]
+    last = resampler.finish()
+    assert last['pressure'].tolist() == [8.5]
+    assert last['time'].tolist() == [12.34 + 8 * 0.25]
+    with pytest.raises(ValueError):
+        ChunkResampler('1s', how='median')
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_chunked_resample_matches_one_chunk(tmp_path, file_format):
+    recording = tmp_path / 'databot_data.jsonl'
+    _write_recording(recording)
+    small = tmp_path / f'small.{file_format}'
+    large = tmp_path / f'large.{file_format}'
+    rows = export_recording(recording, small, resample='1s', chunk_bytes=10_000)
+    assert export_recording(recording, large, resample='1s', chunk_bytes=10 ** 9) == rows
+
+    read = pd.read_csv if file_format == 'csv' else pd.read_parquet
+    small_df, large_df = read(small), read(large)
+    pd.testing.assert_frame_equal(small_df, large_df)
+    # 3000 samples at 50 Hz are 60 one second buckets, each aggregated once
+    assert rows == 60
+    assert small_df['time'].iloc[1] == pytest.approx(13.34)
+
+
+@pytest.mark.parametrize('compression', ['none', 'gzip'])
+def test_time_range_skips_the_rest_of_the_recording(tmp_path, compression):
+    recording = compressed_path(tmp_path / 'databot_data.jsonl', compression)
+    _write_recording(recording, compression=compression)
+    start_time, end_time = START + 20.0, START + 30.0
+
+    begin, stop = load_time_index(recording, rebuild=False).byte_range(start_time, end_time, recording.stat().st_size)
+    assert 0 < begin < stop < recording.stat().st_size
+    lines = b"".join(_iter_json_chunks(recording, start_time, end_time, chunk_bytes=4096)).count(b"\n")
+    assert lines < 1000
+
+    output = tmp_path / 'range.csv'
+    assert export_recording(recording, output, start_time=start_time, end_time=end_time) == 501
+    df = pd.read_csv(output)
+    assert df['time'].iloc[0] == pytest.approx(32.34)
+    assert df['time'].iloc[-1] == pytest.approx(42.34)
+
+
+def test_sensor_columns_are_projected(tmp_path):
+    recording = tmp_path / 'databot_data.jsonl'
+    _write_recording(recording, number_of_records=200)
+    assert sensor_columns(None) is None
+    with pytest.raises(ValueError):
+        sensor_columns(['thermometer'])
+
+    output = tmp_path / 'pressure.parquet'
+    export_recording(recording, output, sensors=['pressure'])
+    df = pd.read_parquet(output)
+    assert df.columns.tolist() == ['timestamp', 'time', 'pressure']
+    assert df['pressure'].dtype == np.float32
+    assert all(chunk.columns.tolist() == ['timestamp', 'time', 'acceleration_x']
+               for chunk in iter_recording(recording, sensor_columns(['accl']), chunk_bytes=1000))
+
+
+def test_export_recordings_in_parallel(tmp_path):
+    recordings = [tmp_path / 'first.jsonl', tmp_path / 'second.jsonl']
+    for number_of_records, recording in zip([100, 200], recordings):
+        _write_recording(recording, number_of_records=number_of_records)
+
+    rows = export_recordings(recordings, tmp_path / 'exports', 'csv', jobs=2)
+    assert rows == {str(recordings[0]): 100, str(recordings[1]): 200}
+    assert pd.read_csv(tmp_path / 'exports' / 'second.csv').shape[0] == 200
+    with pytest.raises(ValueError):
+        export_recordings([recordings[0], tmp_path / 'other' / 'first.jsonl'], tmp_path / 'exports', 'csv')
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from utils.rolling_stats import RollingWindowStats
+
+
+def _expected(values: np.ndarray, window: int) -> pd.DataFrame:
+    rolling = pd.Series(values).rolling(window, min_periods=1)
+    return pd.DataFrame({'mean': rolling.mean(), 'std': rolling.std(), 'min': rolling.min(), 'max': rolling.max()})
+
+
+def test_matches_pandas_rolling_over_chunks():
+    rng = np.random.default_rng(1)
+    values = rng.normal(100.0, 5.0, 1000)
+    # drifting values make removing the old value from the running mean and variance hard
+    values += np.linspace(0.0, 1e4, values.shape[0])
+    stats = RollingWindowStats(window=50)
+    chunks = np.split(values, [1, 7, 120, 121, 600])
+    results = np.vstack([stats.update(chunk) for chunk in chunks])
+
+    expected = _expected(values, 50)
+    np.testing.assert_allclose(results[:, 0], expected['mean'], rtol=1e-9)
+    np.testing.assert_allclose(results[1:, 1], expected['std'][1:], rtol=1e-6)
+    np.testing.assert_array_equal(results[:, 2], expected['min'])
+    np.testing.assert_array_equal(results[:, 3], expected['max'])
+
+
+def test_nan_values_take_a_place_in_the_window():
+    stats = RollingWindowStats(window=3)
+    results = stats.update([1.0, np.nan, 5.0, 2.0, np.nan, np.nan, np.nan])
+
+    # the windows: [1], [1 nan], [1 nan 5], [nan 5 2], [5 2 nan], [2 nan nan], [nan nan nan]
+    np.testing.assert_array_equal(results[:, 0][:6], [1.0, 1.0, 3.0, 3.5, 3.5, 2.0])
+    np.testing.assert_array_equal(results[:, 2][:6], [1.0, 1.0, 1.0, 2.0, 2.0, 2.0])
+    np.testing.assert_array_equal(results[:, 3][:6], [1.0, 1.0, 5.0, 5.0, 5.0, 2.0])
+    assert np.isnan(results[6]).all()
+
+
+def test_push_is_one_step_of_update():
+    pushed = RollingWindowStats(window=4)
+    updated = RollingWindowStats(window=4)
+    values = [3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0, 6.0]
+    np.testing.assert_array_equal([pushed.push(value) for value in values], updated.update(values))
+
+
+def test_without_min_max_tracking():
+    stats = RollingWindowStats(window=2, track_min_max=False)
+    mean, std, minimum, maximum = stats.update([1.0, 3.0])[-1]
+    assert (mean, std) == (2.0, np.sqrt(2.0))
+    assert np.isnan(minimum) and np.isnan(maximum)
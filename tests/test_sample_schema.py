@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.sample_schema import (MISSING_INTEGER, PackedRecordLayout, apply_schema, read_json_lines, sample_dtype,
+                                 to_sample_dtype)
+
+
+def _lines(records: list) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def test_time_keeps_its_seconds():
+    df = read_json_lines(_lines([{'time': time, 'pressure': "1000.5"} for time in [12.34, 12.44, 12.99]]))
+
+    assert df['time'].dtype == np.float64
+    assert df['time'].tolist() == [12.34, 12.44, 12.99]
+    assert df['pressure'].dtype == sample_dtype('pressure')
+
+
+def test_values_that_are_not_numbers_become_missing():
+    df = read_json_lines(_lines([{'time': 12.34, 'pressure': 1000}, {'time': "", 'pressure': "n/a"}]))
+
+    assert np.isnan(df['time'].iloc[1]) and np.isnan(df['pressure'].iloc[1])
+    assert apply_schema(df) is df
+
+
+def test_packed_layout():
+    layout = PackedRecordLayout(['timestamp', 'time', 'pressure', 'device_id'])
+
+    assert layout.struct.format == '<ddfd'
+    assert layout.record_size == 28
+    positions = {column: position for position, column in enumerate(layout.columns)}
+    values = layout.values({'timestamp': 1_700_000_000.5, 'time': "12.34", 'pressure': "n/a", 'other': 1}, positions)
+    assert values[:2] == [1_700_000_000.5, 12.34] and np.isnan(values[2]) and np.isnan(values[3])
+
+    packed = np.frombuffer(layout.struct.pack(*values), dtype=layout.dtype)
+    assert packed['time'][0] == 12.34
+
+
+def test_integer_columns_hold_missing_integer():
+    values = to_sample_dtype(pd.Series(["3", None, "x"]), np.dtype(np.int16))
+    assert values.dtype == np.int16
+    assert values.tolist() == [3, MISSING_INTEGER, MISSING_INTEGER]
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sample_store import SampleStore
+
+
+def _samples(start: int, stop: int) -> pd.DataFrame:
+    # the databot reports its time in seconds with two decimals
+    numbers = np.arange(start, stop)
+    return pd.DataFrame({'time': np.round(12.34 + numbers * 0.01, 2), 'pressure': numbers.astype(np.float64)})
+
+
+def test_keeps_the_newest_samples_when_it_wraps_around():
+    store = SampleStore(capacity=5, columns=['time', 'pressure'])
+    store.append(_samples(0, 3))
+    store.append(_samples(3, 8))
+
+    assert len(store) == 5
+    assert store.total_count == 8
+    np.testing.assert_array_equal(store.view('pressure'), [3, 4, 5, 6, 7])
+    np.testing.assert_array_equal(store.view('pressure', 2), [6, 7])
+
+
+def test_an_append_larger_than_the_capacity_keeps_its_last_rows():
+    store = SampleStore(capacity=4, columns=['time', 'pressure'])
+    store.append(_samples(0, 10))
+
+    np.testing.assert_array_equal(store.view('pressure'), [6, 7, 8, 9])
+
+
+def test_views_are_contiguous_and_read_only():
+    store = SampleStore(capacity=4, columns=['time', 'pressure'])
+    for start in range(0, 11, 3):
+        store.append(_samples(start, start + 3))
+
+    values = store.view('pressure')
+    assert values.flags.c_contiguous
+    with pytest.raises(ValueError):
+        values[0] = 0
+
+
+def test_to_dataframe_is_newest_first_and_keeps_the_fractional_time():
+    store = SampleStore(capacity=10, columns=['time', 'pressure'])
+    store.append(_samples(0, 3))
+
+    df = store.to_dataframe()
+    assert df['time'].tolist() == [12.36, 12.35, 12.34]
+    assert store.to_dataframe(2, newest_first=False)['pressure'].tolist() == [1, 2]
+
+
+def test_missing_columns_are_nan_and_new_columns_are_added():
+    store = SampleStore(capacity=4, columns=['time', 'pressure'])
+    store.append(_samples(0, 2))
+    store.append(pd.DataFrame({'time': [12.36], 'humidity': [40.5]}))
+
+    assert store.columns == ['time', 'pressure', 'humidity']
+    assert np.isnan(store.view('pressure')[-1])
+    assert np.isnan(store.view('humidity')[:2]).all()
+
+
+def test_version_changes_with_the_contents():
+    store = SampleStore(capacity=4, columns=['time', 'pressure'])
+    version = store.version
+    store.append(_samples(0, 1))
+    assert store.version != version
+    version = store.version
+    store.clear()
+    assert store.version != version
+    assert len(store) == 0
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from utils.segment_rotation import (RotatedSegmentsReader, RotatingLineWriter, RotationPolicy, load_segment_index,
+                                    read_rotated_time_range, remove_rotated_recording, rotated_time_bounds,
+                                    select_segments)
+
+
+def _record(n: int) -> dict:
+    # the databot's time in seconds with two decimals
+    return {'time': round(12.34 + n * 0.02, 2), 'light': n}
+
+
+def _write(writer: RotatingLineWriter, start: int, stop: int):
+    for n in range(start, stop):
+        writer.write_record(_record(n))
+
+
+def test_rotates_by_size(tmp_path):
+    with RotatingLineWriter(tmp_path, RotationPolicy(max_bytes=1000), batch_size=10, durability='none') as writer:
+        _write(writer, 0, 300)
+    segments = load_segment_index(tmp_path)['segments']
+
+    assert len(segments) > 5
+    assert sum(segment['rows'] for segment in segments) == 300
+    assert not any(segment['active'] for segment in segments)
+    assert segments[0]['start_time'] == 12.34 and segments[-1]['end_time'] == round(12.34 + 299 * 0.02, 2)
+    assert all((tmp_path / segment['file']).stat().st_size < 1000 + 10 * 40 for segment in segments)
+    assert rotated_time_bounds(tmp_path) == (12.34, round(12.34 + 299 * 0.02, 2))
+
+    df = read_rotated_time_range(tmp_path, 14.0, 15.0)
+    assert df['light'].tolist() == list(range(83, 134))
+    assert select_segments(segments, 14.0, 15.0)[0]['start_time'] <= 14.0
+
+
+def test_rotates_by_age(tmp_path):
+    with RotatingLineWriter(tmp_path, RotationPolicy(max_seconds=0.1), batch_size=1, durability='none') as writer:
+        _write(writer, 0, 5)
+        time.sleep(0.15)
+        _write(writer, 5, 10)
+    assert [segment['rows'] for segment in load_segment_index(tmp_path)['segments']] == [5, 5]
+
+
+def test_keeps_the_newest_segments_and_gzips_the_older_ones(tmp_path):
+    policy = RotationPolicy(max_bytes=500, keep_segments=3, compress=True)
+    with RotatingLineWriter(tmp_path, policy, batch_size=5, durability='none') as writer:
+        _write(writer, 0, 400)
+        segments = load_segment_index(tmp_path)['segments']
+        closed = [segment for segment in segments if not segment['active']]
+        assert len(closed) == 3 and segments[-1]['active']
+        # the newest closed segment is left for a reader that may still be following it
+        assert [segment['file'].endswith('.gz') for segment in closed] == [True, True, False]
+
+    files = sorted(path.name for path in tmp_path.glob('databot_data-*'))
+    assert files == sorted(segment['file'] for segment in load_segment_index(tmp_path)['segments'])
+    df = read_rotated_time_range(tmp_path, None, None)
+    assert df['light'].tolist() == list(range(400 - df.shape[0], 400))
+
+    remove_rotated_recording(tmp_path)
+    assert not list(tmp_path.iterdir())
+
+
+def test_reader_follows_the_recording_across_rotations(tmp_path):
+    reader = RotatedSegmentsReader(tmp_path)
+    assert reader.read_new_records() is None
+    rows = []
+    policy = RotationPolicy(max_bytes=600, keep_segments=10, compress=True)
+    with RotatingLineWriter(tmp_path, policy, batch_size=1, durability='none') as writer:
+        for start in range(0, 300, 7):
+            _write(writer, start, min(start + 7, 300))
+            df = reader.read_new_records()
+            if df is not None:
+                rows += df['light'].tolist()
+    df = reader.read_new_records()
+    rows += [] if df is None else df['light'].tolist()
+    assert rows == list(range(300))
+
+    remove_rotated_recording(tmp_path)
+    with RotatingLineWriter(tmp_path, policy, batch_size=1, durability='none') as writer:
+        _write(writer, 1000, 1003)
+    assert reader.read_new_records()['light'].tolist() == [1000, 1001, 1002]
+    assert reader.file_generation == 1
+
+
+def test_reader_starts_with_the_segments_of_the_window(tmp_path):
+    with RotatingLineWriter(tmp_path, RotationPolicy(max_bytes=1000), batch_size=10, durability='none') as writer:
+        _write(writer, 0, 300)
+    df = RotatedSegmentsReader(tmp_path, last_rows=50).read_new_records()
+
+    assert 50 <= df.shape[0] < 300
+    assert df['light'].iloc[-1] == 299
+
+
+@pytest.mark.parametrize('policy, enabled', [(RotationPolicy(), False), (RotationPolicy(max_bytes=1), True),
+                                             (RotationPolicy(max_seconds=1), True)])
+def test_rotation_is_enabled_by_a_limit(policy, enabled):
+    assert policy.enabled == enabled
@@ -0,0 +1,60 @@
+import numpy as np
+
+from utils.shared_ring import SharedRingReader, SharedRingWriter
+
+COLUMNS = ['timestamp', 'time', 'pressure', 'light']
+
+
+def _record(n: int) -> dict:
+    return {'timestamp': 1_700_000_000.0 + n * 0.01, 'time': round(12.34 + n * 0.01, 2),
+            'pressure': 1000.0 + n, 'light': n}
+
+
+def test_reader_gets_what_was_written(tmp_path):
+    path = tmp_path / 'databot.ring'
+    with SharedRingWriter(path, columns=COLUMNS, capacity=64) as writer:
+        reader = SharedRingReader(path)
+        assert reader.read_new_records() is None
+        for n in range(10):
+            writer.write_record(_record(n))
+
+        df = reader.read_new_records()
+        assert df['time'].tolist() == [round(12.34 + n * 0.01, 2) for n in range(10)]
+        assert df['light'].tolist() == list(range(10))
+        assert df['timestamp'].dtype.kind == 'M'
+        assert reader.read_new_records() is None
+
+        writer.write_record(_record(10))
+        assert reader.read_new_records(columns=['time'])['time'].tolist() == [12.44]
+
+
+def test_reader_behind_the_writer_skips_the_overwritten_rows(tmp_path):
+    path = tmp_path / 'databot.ring'
+    with SharedRingWriter(path, columns=COLUMNS, capacity=16) as writer:
+        reader = SharedRingReader(path)
+        for n in range(40):
+            writer.write_record(_record(n))
+
+        df = reader.read_new_records()
+        # the oldest slot is the one the writer fills next, it is never read
+        assert df.shape[0] == 15
+        assert df['light'].tolist() == list(range(25, 40))
+        assert reader.samples_skipped == 25
+        assert np.all(np.diff(df['time']) > 0)
+
+
+def test_reader_starts_over_on_a_new_ring(tmp_path):
+    path = tmp_path / 'databot.ring'
+    reader = SharedRingReader(path)
+    assert reader.read_new_records() is None
+    with SharedRingWriter(path, columns=COLUMNS, capacity=16) as writer:
+        for n in range(5):
+            writer.write_record(_record(n))
+        assert reader.read_new_records().shape[0] == 5
+    generation = reader.file_generation
+
+    with SharedRingWriter(path, columns=COLUMNS, capacity=16) as writer:
+        writer.write_record(_record(100))
+        df = reader.read_new_records()
+    assert reader.file_generation == generation + 1
+    assert df['light'].tolist() == [100]
@@ -0,0 +1,56 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sample_store import SampleStore
+from utils.spectral import StreamingSpectrum
+
+COLUMNS = ['time', 'timestamp', 'acceleration_x']
+
+
+def _samples(start: int, stop: int, rate_hz: float = 50.0, frequency: float = 5.0) -> pd.DataFrame:
+    numbers = np.arange(start, stop)
+    seconds = numbers / rate_hz
+    # the databot reports its time in seconds with two decimals
+    return pd.DataFrame({'time': np.round(12.34 + seconds, 2),
+                         'timestamp': pd.to_datetime(1_700_000_000.0 + seconds, unit='s'),
+                         'acceleration_x': 9.81 + np.sin(2 * np.pi * frequency * seconds)})
+
+
+def test_sample_rate_from_the_time_in_seconds():
+    store = SampleStore(capacity=4096, columns=COLUMNS)
+    store.append(_samples(0, 1000))
+    assert StreamingSpectrum().sample_rate(store) == pytest.approx(50.0)
+
+
+def test_sample_rate_falls_back_to_the_timestamp():
+    store = SampleStore(capacity=4096, columns=COLUMNS)
+    store.append(_samples(0, 1000, rate_hz=40.0).assign(time=np.nan))
+    assert StreamingSpectrum().sample_rate(store) == pytest.approx(40.0, rel=1e-3)
+
+    store = SampleStore(capacity=4096, columns=['acceleration_x'])
+    store.append(_samples(0, 1000)[['acceleration_x']])
+    assert math.isnan(StreamingSpectrum().sample_rate(store))
+
+
+def test_psd_peaks_at_the_signal_frequency():
+    store = SampleStore(capacity=4096, columns=COLUMNS)
+    store.append(_samples(0, 2048))
+    psd = StreamingSpectrum(fft_size=256).psd(store, ['acceleration_x'])
+
+    assert psd.loc[psd['psd_db'].idxmax(), 'frequency'] == pytest.approx(5.0, abs=50.0 / 256)
+    assert psd['frequency'].max() == pytest.approx(25.0)
+
+
+def test_only_the_new_frames_are_computed():
+    store = SampleStore(capacity=4096, columns=COLUMNS)
+    spectrum = StreamingSpectrum(fft_size=256, overlap=0.5)
+    store.append(_samples(0, 1024))
+    spectrum.psd(store, ['acceleration_x'], average_frames=4)
+    computed = spectrum.frames_computed
+
+    store.append(_samples(1024, 1024 + 128))
+    spectrum.psd(store, ['acceleration_x'], average_frames=4)
+    assert spectrum.frames_computed == computed + 1
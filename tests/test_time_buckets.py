@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.time_buckets import TimeBucketAggregator
+
+
+def _samples(number_of_samples: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    # uneven arrival around 20 ms, the collector's timestamp as a date like the JSON lines files have it
+    seconds = 1_700_000_000.0 + np.cumsum(rng.uniform(0.005, 0.035, number_of_samples))
+    pressure = rng.normal(1000.0, 5.0, number_of_samples)
+    pressure[::7] = np.nan
+    return pd.DataFrame({'timestamp': pd.to_datetime(seconds, unit='s'),
+                         'time': np.round(seconds - seconds[0] + 12.34, 2),
+                         'pressure': pressure})
+
+
+@pytest.mark.parametrize('statistic', ['mean', 'min', 'max', 'last'])
+def test_buckets_match_pandas_across_appends(statistic):
+    df = _samples(5000)
+    aggregator = TimeBucketAggregator(levels=['100ms', '1s', '10s'])
+    for start in range(0, df.shape[0], 389):
+        aggregator.append(df.iloc[start:start + 389])
+
+    expected = df.set_index('timestamp')['pressure'].resample('1s').agg(statistic)
+    expected = expected[df.set_index('timestamp')['time'].resample('1s').count() > 0]
+    result = aggregator.to_dataframe(statistic=statistic, level='1s', newest_first=False)
+    result = result[result['time'].notna()]
+
+    np.testing.assert_array_equal(result['timestamp'], expected.index)
+    np.testing.assert_allclose(result['pressure'], expected.to_numpy(), rtol=1e-12)
+
+
+def test_time_is_the_first_time_of_the_bucket_in_seconds():
+    df = _samples(2000)
+    aggregator = TimeBucketAggregator(levels=['1s', '10s'])
+    aggregator.append(df)
+    result = aggregator.to_dataframe(level='10s', newest_first=False)
+
+    assert result['time'].dtype == np.float64
+    assert result['time'].iloc[0] == 12.34
+    expected = df.set_index('timestamp')['time'].resample('10s').min()
+    np.testing.assert_array_equal(result['time'], expected.to_numpy())
+
+
+def test_window_picks_a_bucket_size_and_keeps_the_order():
+    aggregator = TimeBucketAggregator(levels=['100ms', '1s', '10s'])
+    aggregator.append(_samples(5000))
+    result = aggregator.to_dataframe(window_seconds=30, max_points=100)
+
+    # 30 seconds in at most 100 buckets takes the 1 s buckets
+    assert (result['timestamp'].iloc[0] - result['timestamp'].iloc[1]) == pd.Timedelta('1s')
+    assert result['timestamp'].is_monotonic_decreasing
+    assert 30 <= result.shape[0] <= 31
+
+
+def test_series_get_buckets_of_their_own():
+    df = _samples(1000)
+    df['device_id'] = np.where(np.arange(1000) % 2, 'a', 'b')
+    aggregator = TimeBucketAggregator(levels=['1s'], series_column='device_id')
+    aggregator.append(df)
+    result = aggregator.to_dataframe(statistic='max', newest_first=False)
+
+    for device_id, device_df in df.groupby('device_id'):
+        expected = device_df.set_index('timestamp')['pressure'].resample('1s').max().dropna()
+        np.testing.assert_array_equal(result.loc[result['device_id'] == device_id, 'pressure'].dropna(), expected)
+
+
+def test_late_samples_are_merged_or_counted():
+    aggregator = TimeBucketAggregator(levels=['100ms', '1s'], max_buckets=1)
+    aggregator.append(pd.DataFrame({'time': [0.05, 0.25], 'pressure': [1.0, 3.0]}))
+    # a late sample for a bucket that is still kept is merged into it
+    aggregator.append(pd.DataFrame({'time': [0.26], 'pressure': [5.0]}))
+    assert aggregator.to_dataframe(level='100ms')['pressure'].tolist() == [4.0]
+    assert aggregator.late_samples == 0
+
+    # one for a bucket that was dropped is counted
+    aggregator.append(pd.DataFrame({'time': [0.35, 0.05], 'pressure': [7.0, 9.0]}))
+    assert aggregator.late_samples == 1
+    assert aggregator.to_dataframe(level='1s', statistic='max')['pressure'].tolist() == [9.0]
+
+
+def test_bucket_sizes_must_be_multiples():
+    with pytest.raises(ValueError):
+        TimeBucketAggregator(levels=['100ms', '250ms'])
+    with pytest.raises(ValueError):
+        TimeBucketAggregator().to_dataframe(statistic='median')
@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils.time_index import (build_time_index, first_and_last_time, frame_times, read_time_range, record_time,
+                              time_index_path)
+
+
+def _write_recording(path, number_of_rows: int = 1000) -> np.ndarray:
+    # the databot's time, seconds with two decimals at 50 Hz
+    times = np.round(12.34 + np.arange(number_of_rows) * 0.02, 2)
+    with path.open("w") as f:
+        for n, time in enumerate(times):
+            f.write(json.dumps({'time': float(time), 'light': n}) + "\n")
+    return times
+
+
+def test_times_are_seconds():
+    assert record_time({'time': 12.34}) == 12.34
+    assert record_time({'timestamp': 1_700_000_000.5, 'time': 12.34}) == 1_700_000_000.5
+    assert record_time({'light': 1}) is None
+    np.testing.assert_array_equal(frame_times(pd.DataFrame({'time': [12.34, 12.36]})), [12.34, 12.36])
+    dates = pd.DataFrame({'timestamp': pd.to_datetime([1_700_000_000.5], unit='s')})
+    np.testing.assert_array_equal(frame_times(dates), [1_700_000_000.5])
+
+
+def test_time_range_reads_only_the_indexed_bytes(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    times = _write_recording(path)
+    index = build_time_index(path, every_rows=64)
+    assert time_index_path(path).exists()
+    assert len(index) == 16 and index.times[0] == 12.34
+
+    begin, stop = index.byte_range(22.0, 24.0, path.stat().st_size)
+    assert 0 < begin < stop < path.stat().st_size
+
+    df = read_time_range(path, 22.0, 24.0)
+    expected = np.flatnonzero((times >= 22.0) & (times <= 24.0))
+    assert df['light'].tolist() == expected.tolist()
+    assert read_time_range(path, 1000.0, None) is None
+    assert read_time_range(path, None, 12.40, columns=['time'])['time'].tolist() == [12.34, 12.36, 12.38, 12.40]
+
+
+def test_index_is_rebuilt_for_a_new_recording(tmp_path):
+    path = tmp_path / 'databot_data.jsonl'
+    _write_recording(path)
+    build_time_index(path, every_rows=64)
+    times = _write_recording(path, number_of_rows=10)
+
+    assert read_time_range(path, None, None)['time'].tolist() == times.tolist()
+    assert first_and_last_time(path) == (12.34, 12.52)
@@ -0,0 +1,256 @@
+"""
+Alert rules evaluated by the collector on every sample, whether a dashboard is open or not.
+
+Rules are kept in a JSON file, a list of objects like:
+
+```json
+[
+  {"column": "external_temp_1", "kind": "threshold", "above": 35},
+  {"sensor": "accl", "kind": "zscore", "limit": 4, "window": 200},
+  {"column": "pressure", "kind": "rate", "limit": 0.5, "stop": true}
+]
+```
+
+- `threshold` fires when the value is above `above` or below `below`.
+- `rate` fires when the value changes by more than `limit` per second.
+- `zscore` fires when the value is more than `limit` standard deviations from the mean of the
+  previous `window` values.
+
+A rule names one `column`, or a `sensor` of `databot_sensors` to apply it to every one of its data
+columns.  A rule fires once when its condition starts to hold and again only after it stopped
+holding, so a value that stays out of range is one alert.  With `stop` the collector stops when
+the rule fires.
+"""
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+from .rolling_stats import RollingWindowStats
+from .sample_store import get_all_data_columns
+from .sensor_constants import DATABOT_ALERTS_FILE, databot_sensors
+from .time_index import record_time
+
+ALERT_RULE_KINDS = ['threshold', 'rate', 'zscore']
+DEFAULT_ZSCORE_LIMIT = 3.0
+DEFAULT_ZSCORE_WINDOW = 100
+# values a z-score rule needs before the standard deviation means anything
+MIN_ZSCORE_SAMPLES = 10
+
+
+@dataclass
+class AlertRule:
+    """
+    One condition on one data column.
+
+    - `column`: the data column the rule watches.
+    - `kind`: 'threshold', 'rate' or 'zscore'.
+    - `above`, `below`: threshold only, the limits of the normal range, None for no limit.
+    - `limit`: rate: the largest normal change per second, zscore: the largest normal z-score.
+    - `window`: zscore only, the number of previous values the mean and deviation are taken over.
+    - `stop`: stop collecting when the rule fires.
+    - `name`: shown in the alert, defaults to a description of the rule.
+    """
+    column: str
+    kind: str = 'threshold'
+    above: float | None = None
+    below: float | None = None
+    limit: float | None = None
+    window: int = DEFAULT_ZSCORE_WINDOW
+    stop: bool = False
+    name: str | None = None
+
+    def __post_init__(self):
+        if self.kind not in ALERT_RULE_KINDS:
+            raise ValueError(f"Unknown rule kind: {self.kind}, expected one of {ALERT_RULE_KINDS}")
+        if self.kind == 'threshold' and self.above is None and self.below is None:
+            raise ValueError(f"A threshold rule needs `above` or `below`: {self.column}")
+        if self.kind == 'rate' and self.limit is None:
+            raise ValueError(f"A rate rule needs a `limit`: {self.column}")
+        if self.kind == 'zscore' and self.limit is None:
+            self.limit = DEFAULT_ZSCORE_LIMIT
+        if self.name is None:
+            if self.kind == 'threshold':
+                limits = [f"above {self.above}" if self.above is not None else None,
+                          f"below {self.below}" if self.below is not None else None]
+                self.name = f"{self.column} " + " or ".join(limit for limit in limits if limit)
+            elif self.kind == 'rate':
+                self.name = f"{self.column} changes faster than {self.limit}/s"
+            else:
+                self.name = f"{self.column} more than {self.limit} standard deviations from its mean"
+
+
+@dataclass
+class Alert:
+    """
+    A rule that fired, with the value and the time, in epoch seconds, of the sample that fired it.
+    """
+    rule: str
+    column: str
+    value: float
+    time: float | None
+    sample_number: int
+
+
+def alert_rules_from_dicts(items: List[dict]) -> List[AlertRule]:
+    """
+    Build the rules of a rules file, a rule with a `sensor` becomes one rule per data column.
+    """
+    known_columns = get_all_data_columns()
+    rules = []
+    for item in items:
+        item = dict(item)
+        sensor = item.pop('sensor', None)
+        if sensor is not None:
+            if sensor not in databot_sensors:
+                raise ValueError(f"Unknown sensor: {sensor}, choose from {','.join(databot_sensors)}")
+            columns = databot_sensors[sensor]['data_columns']
+        else:
+            columns = [item.pop('column', None)]
+        for column in columns:
+            if column not in known_columns:
+                raise ValueError(f"Unknown column: {column}, expected one of the data columns of databot_sensors")
+            rules.append(AlertRule(column=column, **item))
+    return rules
+
+
+def load_alert_rules(file_path: str | Path) -> List[AlertRule]:
+    with Path(file_path).open("r", encoding="utf-8") as f:
+        return alert_rules_from_dicts(json.load(f))
+
+
+def read_recent_alerts(file_path: str | Path = DATABOT_ALERTS_FILE, count: int = 5,
+                       tail_bytes: int = 64 * 1024) -> List[dict]:
+    """
+    Returns the last `count` alerts of an alerts file, newest last, from only its last `tail_bytes`.
+    """
+    try:
+        with Path(file_path).open("rb") as f:
+            f.seek(0, 2)
+            size = f.tell()
+            f.seek(max(0, size - tail_bytes))
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    lines = data.split(b"\n")
+    if size > tail_bytes:
+        # the first line is probably cut off
+        lines = lines[1:]
+    alerts = []
+    for line in lines[::-1]:
+        if len(alerts) == count:
+            break
+        try:
+            alerts.append(json.loads(line))
+        except ValueError:
+            continue
+    return alerts[::-1]
+
+
+class _RuleState:
+    # what a rule remembers between samples, a constant amount per rule
+    def __init__(self, rule: AlertRule):
+        self.rule = rule
+        self.active = False
+        self.previous_value = None
+        self.previous_time = None
+        self.stats = RollingWindowStats(rule.window, track_min_max=False) if rule.kind == 'zscore' else None
+        self.number_of_values = 0
+        self.mean = 0.0
+        self.std = 0.0
+
+    def check(self, value: float, sample_time: float | None) -> bool:
+        rule = self.rule
+        if rule.kind == 'threshold':
+            return (rule.above is not None and value > rule.above) or (rule.below is not None and value < rule.below)
+        if rule.kind == 'rate':
+            previous_value, previous_time = self.previous_value, self.previous_time
+            self.previous_value, self.previous_time = value, sample_time
+            if previous_value is None or sample_time is None or previous_time is None or sample_time <= previous_time:
+                return False
+            return abs(value - previous_value) / (sample_time - previous_time) > rule.limit
+        # compared to the values before this one, so a spike does not raise its own deviation
+        firing = self.number_of_values >= MIN_ZSCORE_SAMPLES and self.std > 0 and \
+            abs(value - self.mean) / self.std > rule.limit
+        self.mean, self.std, _, _ = self.stats.push(value)
+        self.number_of_values = min(self.number_of_values + 1, rule.window)
+        return firing
+
+
+class AlertEngine:
+    """
+    Evaluate alert rules on every sample as the collector writes it.
+
+    Every rule keeps a constant amount of state, the previous value for a rate, a rolling window
+    for a z-score, so a sample costs the same however long the collection runs.  Alerts are
+    logged, appended as JSON lines to `alert_file` for the dashboard, and passed to `on_alert`.
+
+    The engine also counts the samples, `stop_reason` tells the collector when to stop: after
+    `stop_after_samples` samples, or when a rule with `stop` fires.
+
+    Parameters:
+    - `rules` (List[AlertRule]): The rules to evaluate.
+    - `stop_after_samples` (int): Stop after this many samples, zero for no limit.
+    - `alert_file` (str | Path | None): Append the alerts to this file, None to only log them.
+    - `on_alert`: Called with every Alert.
+    """
+
+    def __init__(self, rules: List[AlertRule] | None = None, stop_after_samples: int = 0,
+                 alert_file: str | Path | None = DATABOT_ALERTS_FILE, on_alert=None):
+        self.rules = list(rules or [])
+        self.stop_after_samples = stop_after_samples
+        self.alert_file = None if alert_file is None else Path(alert_file)
+        self.on_alert = on_alert
+        self.number_of_samples = 0
+        self.number_of_alerts = 0
+        self.stop_reason = None
+        self._states = [_RuleState(rule) for rule in self.rules]
+        self._file = None
+
+    def evaluate(self, record: dict) -> List[Alert]:
+        """
+        Check every rule against one sample.
+
+        Returns:
+        - The alerts the sample fired, usually none.
+        """
+        self.number_of_samples += 1
+        alerts = []
+        sample_time = record_time(record) if self._states else None
+        for state in self._states:
+            try:
+                value = float(record[state.rule.column])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if value != value:
+                continue
+            firing = state.check(value, sample_time)
+            if firing and not state.active:
+                alerts.append(Alert(state.rule.name, state.rule.column, value, sample_time, self.number_of_samples))
+                if state.rule.stop and self.stop_reason is None:
+                    self.stop_reason = f"alert: {state.rule.name}"
+            state.active = firing
+        for alert in alerts:
+            self._publish(alert)
+        if self.stop_after_samples and self.number_of_samples >= self.stop_after_samples and self.stop_reason is None:
+            self.stop_reason = f"collected {self.number_of_samples} samples"
+        return alerts
+
+    def _publish(self, alert: Alert):
+        self.number_of_alerts += 1
+        logging.warning(f"alert: {alert.rule}, value {alert.value} at sample {alert.sample_number}")
+        if self.alert_file is not None:
+            if self._file is None:
+                self.alert_file.parent.mkdir(parents=True, exist_ok=True)
+                # line buffered, an alert is on disk for the dashboard as soon as it fires
+                self._file = self.alert_file.open("a", encoding="utf-8", buffering=1)
+            self._file.write(json.dumps({**asdict(alert), 'logged': time.time()}) + "\n")
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from .compressed_recording import COMPRESSIONS, compress_frame
+from .time_index import TimeIndexWriter, record_time, DEFAULT_INDEX_EVERY_ROWS
+
+DURABILITY_POLICIES = ['none', 'flush', 'fsync']
+DEFAULT_BATCH_SIZE = 50
+# keep this under the dashboard refresh so new samples show up on the next redraw
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_FSYNC_EVERY = 10
+# seconds between fsyncs of the 'flush' policy, about the most a power cut can lose
+DEFAULT_FSYNC_INTERVAL = 30.0
+
+
+class BatchedLineWriter:
+    """
+    Append JSON lines to a file in batches instead of one open/write/close per sample.
+
+    Lines are buffered in memory and handed to the operating system with a single write call
+    once `batch_size` lines are buffered or `flush_interval` seconds have passed since the last
+    write, whichever comes first.  The file is opened once and kept open.
+
+    The durability policy decides when the data is forced onto the storage device:
+
+    - 'none': never fsync, the operating system writes the page cache back when it wants to.
+    - 'flush': fsync at most every `fsync_interval` seconds, at a batch write, and when the writer
+      is closed.
+    - 'fsync': fsync every `fsync_every` batches, and when the writer is closed.
+
+    Fewer fsyncs mean far fewer writes to the SD card on a Raspberry Pi, at the cost of losing the
+    most recent samples if the power goes out.  Every policy makes a batch visible to readers of
+    the file as soon as it is written.
+
+    Parameters:
+    - `file_path` (str | Path): The JSON lines file to append to.
+    - `batch_size` (int): Number of lines that triggers a write.
+    - `flush_interval` (float): Maximum number of seconds a line waits in the buffer.
+    - `durability` (str): One of DURABILITY_POLICIES.
+    - `fsync_every` (int): Number of batches between fsyncs for the 'fsync' policy.
+    - `fsync_interval` (float): Minimum number of seconds between fsyncs for the 'flush' policy.
+    - `time_index` (bool): Also write a sidecar time index, see `utils.time_index`.
+    - `index_every_rows` (int): Minimum number of rows between time index entries.
+    - `compression` (str): One of COMPRESSIONS.  'gzip' and 'zstd' write every batch as its own
+      compressed frame, see `utils.compressed_recording`.  Larger batches compress better.
+    - `compression_level` (int | None): The gzip or zstd level, None for the default.
+    """
+
+    def __init__(self, file_path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, durability: str = 'flush',
+                 fsync_every: int = DEFAULT_FSYNC_EVERY, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                 time_index: bool = False,
+                 index_every_rows: int = DEFAULT_INDEX_EVERY_ROWS, compression: str = 'none',
+                 compression_level: int | None = None):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown durability policy: {durability}, expected one of {DURABILITY_POLICIES}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}, expected one of {COMPRESSIONS}")
+        self.file_path = Path(file_path)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self.compression = compression
+        self.compression_level = compression_level
+        self.batches_written = 0
+        self.lines_written = 0
+        self.bytes_written = 0
+        self._lines = []
+        self._batch_time = None
+        self._last_flush = time.monotonic()
+        self._last_fsync = self._last_flush
+        self.fsyncs = 0
+        # the index has to be opened first, it starts over when the recording is empty
+        self._time_index = TimeIndexWriter(self.file_path, index_every_rows) if time_index else None
+        # unbuffered, so each batch is exactly one write system call
+        self._file = self.file_path.open("ab", buffering=0)
+        self._start_offset = os.fstat(self._file.fileno()).st_size
+
+    def write_line(self, line: str):
+        self._lines.append(line)
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def write_record(self, record: dict):
+        if self._time_index is not None and not self._lines:
+            self._batch_time = record_time(record)
+        self.write_line(json.dumps(record))
+
+    def flush_if_due(self):
+        """
+        Write the buffered lines if they have been waiting longer than `flush_interval`.
+        Call this periodically when samples may stop arriving.
+        """
+        if self._lines and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._lines:
+            return
+        data = ("\n".join(self._lines) + "\n").encode("utf-8")
+        lines = len(self._lines)
+        self._lines = []
+        if self.compression != 'none':
+            # a frame per batch, readers decompress it on its own
+            data = compress_frame(data, self.compression, self.compression_level)
+        view = memoryview(data)
+        while view:
+            view = view[self._file.write(view):]
+        if self._time_index is not None:
+            self._time_index.add(self._start_offset + self.bytes_written, self._batch_time, lines)
+            self._batch_time = None
+        self.batches_written += 1
+        self.lines_written += lines
+        self.bytes_written += len(data)
+        if self.durability == 'fsync' and self.batches_written % self.fsync_every == 0:
+            self._fsync()
+        elif self.durability == 'flush' and self._last_flush - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self.fsyncs += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            self.flush()
+            if self.durability != 'none':
+                self._fsync()
+        finally:
+            self._file.close()
+            if self._time_index is not None:
+                self._time_index.close()
+            logging.debug(f"closed {self.file_path} after {self.lines_written} lines in {self.batches_written} batches")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,296 @@
+"""
+Collect from several databots at once, and read their samples back as one merged timeline.
+
+A CollectorPool runs one `pydatabot_save_data_to_file.py` subprocess per databot.  Each of them
+writes its own JSON lines file into the devices directory and tags every sample with the
+`device_id` of its databot.  A `devices.json` manifest in the directory lists the databots and
+their files, which is how `open_recording_reader` recognizes the directory.
+
+MergedDevicesReader tails every file and merges the samples into one stream ordered by the
+collector's `timestamp`.  The databot's own `time` cannot be used for that, it counts from the
+start of each databot.
+"""
+import heapq
+import json
+import logging
+import os
+import re
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .data_file_reader import JsonLinesTailReader
+from .sensor_constants import DATABOT_DEVICES_DIR
+from .time_index import frame_times, time_index_path
+
+DEVICES_MANIFEST_FILE = 'devices.json'
+DEVICE_ID_COLUMN = 'device_id'
+# a databot that has not sent a sample for this long no longer holds back the merged timeline
+DEVICE_IDLE_SECONDS = 5.0
+COLLECTOR_SCRIPT = "pydatabot_save_data_to_file.py"
+
+
+@dataclass
+class DeviceSpec:
+    """
+    One databot of a CollectorPool, and how to collect from it.
+
+    - `device_id`: the name of the databot in the dashboard, added to every one of its samples.
+    - `address`: the bluetooth address of the databot, None to connect to the first one found.
+    - `sensors`: the keys of `databot_sensors` to collect, None for the collector's default.
+    - `refresh`: milliseconds between samples, None for the databot's default.
+    - `extra_args`: more command line arguments for this databot's collector.
+    """
+    device_id: str
+    address: str | None = None
+    sensors: List[str] | None = None
+    refresh: int | None = None
+    extra_args: List[str] = field(default_factory=list)
+
+
+def is_device_recording(path: str | Path) -> bool:
+    return (Path(path) / DEVICES_MANIFEST_FILE).exists()
+
+
+def device_file_name(device_id: str) -> str:
+    # the device id is typed in by the user, keep it from escaping the directory
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", device_id).lstrip(".") + ".json"
+
+
+def load_devices_manifest(directory: str | Path) -> dict | None:
+    """
+    Returns the manifest of a multi databot recording, `{'recording_id': str, 'devices': [...]}`,
+    where each device entry has its `device_id`, `file` and `address`.  None if there is none.
+    """
+    try:
+        with (Path(directory) / DEVICES_MANIFEST_FILE).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_devices_manifest(directory: str | Path, devices: List[DeviceSpec]) -> dict:
+    directory = Path(directory)
+    manifest = {'recording_id': uuid.uuid4().hex,
+                'devices': [{'device_id': device.device_id, 'file': device_file_name(device.device_id),
+                             'address': device.address} for device in devices]}
+    manifest_path = directory / DEVICES_MANIFEST_FILE
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def remove_device_recording(directory: str | Path):
+    directory = Path(directory)
+    manifest = load_devices_manifest(directory)
+    if manifest is None:
+        return
+    for device in manifest['devices']:
+        (directory / device['file']).unlink(missing_ok=True)
+        time_index_path(directory / device['file']).unlink(missing_ok=True)
+    (directory / DEVICES_MANIFEST_FILE).unlink(missing_ok=True)
+
+
+class CollectorPool:
+    """
+    Run one collector subprocess per databot, each saving to its own file in `directory`.
+
+    Has the `terminate()` of a `subprocess.Popen`, so the dashboard can stop a pool the same way
+    it stops a single collector.
+
+    Parameters:
+    - `devices` (List[DeviceSpec]): The databots to collect from, with unique device ids.
+    - `directory` (str | Path): Where the manifest and the per databot files are written.
+    - `collector_args` (List[str] | None): Command line arguments every collector gets.
+    - `shell` (bool): Passed to `subprocess.Popen`, windows needs True.
+    """
+
+    def __init__(self, devices: List[DeviceSpec], directory: str | Path = DATABOT_DEVICES_DIR,
+                 collector_args: List[str] | None = None, shell: bool = False):
+        device_ids = [device.device_id for device in devices]
+        if len(set(device_ids)) != len(device_ids):
+            raise ValueError(f"Device ids must be unique: {device_ids}")
+        self.devices = devices
+        self.directory = Path(directory)
+        self.collector_args = collector_args or []
+        self.shell = shell
+        self.processes = {}
+
+    def device_path(self, device: DeviceSpec) -> Path:
+        return self.directory / device_file_name(device.device_id)
+
+    def collector_command(self, device: DeviceSpec) -> List[str]:
+        command = ["python", COLLECTOR_SCRIPT, "--device-id", device.device_id,
+                   "--output", str(self.device_path(device)), *self.collector_args]
+        if device.address:
+            command += ["--address", device.address]
+        if device.sensors:
+            command += ["--sensors", ",".join(device.sensors)]
+        if device.refresh:
+            command += ["--refresh", str(device.refresh)]
+        return command + device.extra_args
+
+    def start(self) -> 'CollectorPool':
+        self.directory.mkdir(parents=True, exist_ok=True)
+        remove_device_recording(self.directory)
+        write_devices_manifest(self.directory, self.devices)
+        for device in self.devices:
+            self.processes[device.device_id] = subprocess.Popen(self.collector_command(device),
+                                                                cwd=Path(".").absolute(), shell=self.shell)
+            logging.debug(f"started the collector of {device.device_id}")
+        return self
+
+    def poll(self) -> dict:
+        """
+        Returns the exit code of every device's collector, None for the ones still running.
+        """
+        return {device_id: process.poll() for device_id, process in self.processes.items()}
+
+    def terminate(self):
+        for process in self.processes.values():
+            process.terminate()
+
+    def wait(self, timeout: float | None = None):
+        for process in self.processes.values():
+            process.wait(timeout)
+
+
+class _DeviceStream:
+    # the samples of one databot that have been read but not merged yet
+    def __init__(self, device_id: str, file_path: Path, started: float):
+        self.device_id = device_id
+        self.reader = JsonLinesTailReader(file_path)
+        self.pending = []
+        self.pending_times = np.empty(0)
+        # the newest time this databot has sent, the merged timeline cannot pass it while it is active
+        self.latest_time = None
+        self.last_arrival = started
+
+    def read(self, now: float):
+        new_df = self.reader.read_new_records()
+        if new_df is None:
+            return
+        # from the manifest, pandas would read a device id like "1" as a number
+        new_df[DEVICE_ID_COLUMN] = self.device_id
+        times = frame_times(new_df)
+        if times is None:
+            times = np.full(new_df.shape[0], np.nan)
+        self.pending.append(new_df)
+        self.pending_times = np.concatenate([self.pending_times, times])
+        if not np.isnan(times).all():
+            self.latest_time = max(np.nanmax(times), self.latest_time or -np.inf)
+        self.last_arrival = now
+
+    def take(self, count: int) -> pd.DataFrame:
+        df = self.pending[0] if len(self.pending) == 1 else pd.concat(self.pending, ignore_index=True)
+        self.pending = [df.iloc[count:].reset_index(drop=True)] if count < df.shape[0] else []
+        self.pending_times = self.pending_times[count:]
+        return df.iloc[:count]
+
+
+class MergedDevicesReader:
+    """
+    Read the recordings of a CollectorPool as one stream of samples ordered by `timestamp`.
+
+    Has the same `read_new_records` interface as `JsonLinesTailReader`.  Every databot's file is
+    tailed on its own, and the new samples of all of them are merged up to the watermark, the
+    newest time every active databot has reached, with a k-way merge of the already ordered
+    streams.  Samples newer than the watermark wait for the other databots to catch up.  A databot
+    that has not sent anything for `idle_seconds` stops holding the others back, its samples are
+    merged as they arrive.
+
+    Parameters:
+    - `directory` (str | Path): The devices directory with the `devices.json` manifest.
+    - `idle_seconds` (float): How long to wait for a silent databot.
+    """
+
+    def __init__(self, directory: str | Path = DATABOT_DEVICES_DIR, idle_seconds: float = DEVICE_IDLE_SECONDS):
+        self.directory = Path(directory)
+        self.idle_seconds = idle_seconds
+        self.file_generation = 0
+        self._recording_id = None
+        self._streams = []
+        self._bytes_read_before = 0
+
+    @property
+    def bytes_read(self) -> int:
+        return self._bytes_read_before + sum(stream.reader.bytes_read for stream in self._streams)
+
+    @property
+    def device_ids(self) -> List[str]:
+        return [stream.device_id for stream in self._streams]
+
+    def _start_over(self, manifest: dict | None):
+        if self._recording_id is not None:
+            self.file_generation += 1
+        self._bytes_read_before = self.bytes_read
+        self._recording_id = None if manifest is None else manifest['recording_id']
+        started = time.monotonic()
+        self._streams = [] if manifest is None else \
+            [_DeviceStream(device['device_id'], self.directory / device['file'], started)
+             for device in manifest['devices']]
+
+    def watermark(self, now: float) -> float:
+        """
+        Returns the time up to which the samples of every databot have been read.
+        """
+        active = [stream for stream in self._streams if now - stream.last_arrival < self.idle_seconds]
+        if not active:
+            return np.inf
+        if any(stream.latest_time is None for stream in active):
+            # wait for every databot to send its first sample
+            return -np.inf
+        return min(stream.latest_time for stream in active)
+
+    def read_new_records(self) -> pd.DataFrame | None:
+        """
+        Read the new samples of every databot and merge the ones below the watermark.
+
+        Returns:
+        - A DataFrame of the merged samples with a `device_id` column, or None if there are none.
+        """
+        manifest = load_devices_manifest(self.directory)
+        if manifest is None or manifest['recording_id'] != self._recording_id:
+            # a new pool replaced the recording
+            self._start_over(manifest)
+            if manifest is None:
+                return None
+
+        now = time.monotonic()
+        for stream in self._streams:
+            file_generation = stream.reader.file_generation
+            stream.read(now)
+            if stream.reader.file_generation != file_generation:
+                logging.debug(f"the file of {stream.device_id} was replaced, start over")
+                self._start_over(manifest)
+                return None
+
+        watermark = self.watermark(now)
+        counts = [int(np.searchsorted(stream.pending_times, watermark, side='right')) if stream.pending else 0
+                  for stream in self._streams]
+        if not any(counts):
+            return None
+        parts = []
+        sorted_runs = []
+        offset = 0
+        for stream, count in zip(self._streams, counts):
+            if count == 0:
+                continue
+            times = stream.pending_times[:count].tolist()
+            parts.append(stream.take(count))
+            # (time, position in the concatenated frame), the runs are each in time order already
+            sorted_runs.append(zip(times, range(offset, offset + count)))
+            offset += count
+        df = pd.concat(parts, ignore_index=True)
+        if len(parts) == 1:
+            return df
+        order = [position for _, position in heapq.merge(*sorted_runs)]
+        return df.take(order).reset_index(drop=True)
@@ -0,0 +1,299 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List
+
+import numpy as np
+import pandas as pd
+
+from .sample_schema import sample_dtype, to_sample_dtype
+from .time_index import filter_time_range, frame_times
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# pyarrow is imported by the functions that need it, so the dashboard only loads it for a
+# columnar recording
+
+COLUMNAR_FORMATS = {
+    'arrow': '.arrow',
+    'parquet': '.parquet',
+}
+DEFAULT_SEGMENT_SAMPLES = 1000
+DEFAULT_SEGMENT_FLUSH_INTERVAL = 5.0
+
+
+def is_columnar_recording(path: str | Path) -> bool:
+    path = Path(path)
+    return path.is_dir() or path.suffix in COLUMNAR_FORMATS.values()
+
+
+def list_segments(path: str | Path) -> List[Path]:
+    """
+    Return the segment files of a columnar recording in the order they were written.
+
+    `path` can be the recording directory or a single segment file.
+    """
+    path = Path(path)
+    if path.is_file():
+        return [path]
+    if not path.is_dir():
+        return []
+    return sorted(p for p in path.iterdir() if p.suffix in COLUMNAR_FORMATS.values())
+
+
+def remove_segments(directory: str | Path):
+    for segment in list_segments(directory):
+        segment.unlink(missing_ok=True)
+
+
+def _to_arrow_value(value):
+    # the databot reports every sensor value as a string, store them as numbers when we can
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def sample_arrow_type(column: str) -> 'pa.DataType | None':
+    """
+    Returns the Arrow type of a column of the sample schema, None for a column that is not in it.
+    """
+    import pyarrow as pa
+    dtype = sample_dtype(column)
+    if dtype is None:
+        return None
+    return pa.timestamp('ns') if dtype.kind == 'M' else pa.from_numpy_dtype(dtype)
+
+
+def records_to_table(records: List[dict]) -> 'pa.Table':
+    """
+    Build a table of the samples with the declared types of the sample schema, float32 sensor
+    values, a float64 `time` and a `timestamp`.  Other columns are float64 or, when their values are
+    not numbers, strings.  Missing values are nulls.
+    """
+    import pyarrow as pa
+    columns = {}
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns[key] = []
+    for record in records:
+        for key, values in columns.items():
+            values.append(_to_arrow_value(record.get(key)))
+
+    fields = []
+    arrays = []
+    for key, values in columns.items():
+        arrow_type = sample_arrow_type(key)
+        if arrow_type is not None:
+            # converted to the declared dtype first, the values are strings and epoch seconds
+            array = pa.array(to_sample_dtype(pd.Series(values), sample_dtype(key)), type=arrow_type, from_pandas=True)
+        else:
+            try:
+                array = pa.array(values, type=pa.float64())
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                array = pa.array([None if v is None else str(v) for v in values], type=pa.string())
+        fields.append(pa.field(key, array.type))
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+class ColumnarSegmentWriter:
+    """
+    Write databot samples as rolling columnar segments instead of one JSON line per sample.
+
+    Samples are buffered in memory and written out as a new segment file every
+    `flush_every_samples` samples or `flush_interval` seconds, whichever comes first.  Each
+    segment is written to a temporary file and renamed into place, so a reader never sees a
+    half written segment.
+
+    Parameters:
+    - `directory` (str | Path): The directory that holds the segments of the recording.
+    - `file_format` (str): 'arrow' for Arrow IPC files or 'parquet' for Parquet files.
+    - `flush_every_samples` (int): Number of buffered samples that triggers a new segment.
+    - `flush_interval` (float): Number of seconds after which buffered samples are written regardless.
+    """
+
+    def __init__(self, directory: str | Path, file_format: str = 'arrow',
+                 flush_every_samples: int = DEFAULT_SEGMENT_SAMPLES,
+                 flush_interval: float = DEFAULT_SEGMENT_FLUSH_INTERVAL, segment_prefix: str = 'databot_data'):
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format: {file_format}, expected one of {list(COLUMNAR_FORMATS)}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.file_format = file_format
+        self.flush_every_samples = flush_every_samples
+        self.flush_interval = flush_interval
+        self.segment_prefix = segment_prefix
+        self.segment_number = len(list_segments(self.directory))
+        self._records = []
+        self._last_flush = time.monotonic()
+
+    def write_record(self, record: dict):
+        self._records.append(record)
+        if len(self._records) >= self.flush_every_samples:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if self._records and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._records:
+            return
+        import pyarrow as pa
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+
+        table = records_to_table(self._records)
+        self._records = []
+
+        segment_path = self.directory / f"{self.segment_prefix}-{self.segment_number:06d}{COLUMNAR_FORMATS[self.file_format]}"
+        tmp_path = segment_path.with_suffix(segment_path.suffix + ".tmp")
+        if self.file_format == 'parquet':
+            pq.write_table(table, tmp_path)
+        else:
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        os.replace(tmp_path, segment_path)
+        self.segment_number += 1
+        logging.debug(f"wrote segment {segment_path} with {table.num_rows} rows")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_segment(segment_path: str | Path, columns: List[str] | None = None) -> 'pa.Table':
+    """
+    Read one segment, loading only `columns` when given.  Columns the segment does not have are skipped.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+
+    segment_path = Path(segment_path)
+    if segment_path.suffix == COLUMNAR_FORMATS['parquet']:
+        if columns is not None:
+            schema_names = pq.read_schema(segment_path).names
+            columns = [column for column in columns if column in schema_names]
+        return pq.read_table(segment_path, columns=columns)
+
+    # memory map the arrow file so the columns we do not select are never read from disk
+    with pa.memory_map(str(segment_path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([column for column in columns if column in table.schema.names])
+    return table
+
+
+def read_columnar_recording(path: str | Path, columns: List[str] | None = None) -> pd.DataFrame | None:
+    """
+    Load a whole columnar recording into a DataFrame, reading only the requested columns.
+    """
+    import pyarrow as pa
+
+    tables = [read_segment(segment, columns) for segment in list_segments(path)]
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="default").to_pandas()
+
+
+
+def _segment_times(segment_path: Path):
+    # only the time columns are read, the other columns of the segment stay on disk
+    return frame_times(read_segment(segment_path, ['timestamp', 'time']).to_pandas())
+
+
+def read_columnar_time_range(path: str | Path, start_time: float | None, end_time: float | None,
+                             columns: List[str] | None = None) -> pd.DataFrame | None:
+    """
+    Read the rows of a columnar recording between `start_time` and `end_time`, in seconds.
+
+    The time columns of every segment are read to find the segments that overlap the range, and
+    only those are loaded with all of the requested `columns`.
+    """
+    import pyarrow as pa
+
+    tables = []
+    for segment in list_segments(path):
+        times = _segment_times(segment)
+        if times is None or times.shape[0] == 0:
+            continue
+        if start_time is not None and np.nanmax(times) < start_time:
+            continue
+        if end_time is not None and np.nanmin(times) > end_time:
+            continue
+        tables.append(read_segment(segment, None if columns is None else list(dict.fromkeys([*columns, 'timestamp', 'time']))))
+    if not tables:
+        return None
+    df = filter_time_range(pa.concat_tables(tables, promote_options="default").to_pandas(), start_time, end_time)
+    if columns is not None:
+        df = df[[column for column in df.columns if column in columns]]
+    return df if df.shape[0] else None
+
+
+def columnar_time_bounds(path: str | Path) -> tuple[float, float] | None:
+    """
+    Returns the time of the first and the last row of a columnar recording, from the time columns
+    of its first and last segments.
+    """
+    segments = list_segments(path)
+    if not segments:
+        return None
+    first_times = _segment_times(segments[0])
+    last_times = _segment_times(segments[-1])
+    if first_times is None or last_times is None or not first_times.shape[0] or not last_times.shape[0]:
+        return None
+    return float(np.nanmin(first_times)), float(np.nanmax(last_times))
+
+
+class ColumnarSegmentTailReader:
+    """
+    Follow a columnar recording that is still being written, reading each new segment once.
+
+    This has the same `read_new_records` interface as `JsonLinesTailReader` so the dashboard can
+    use either.  When the requested columns change, or segments we already read disappear, the
+    reader starts again from the first segment and bumps `file_generation`.
+
+    Parameters:
+    - `file_path` (str | Path): The recording directory, or a single segment file.
+    """
+
+    def __init__(self, file_path: str | Path):
+        self.file_path = Path(file_path)
+        self.file_generation = 0
+        self.bytes_read = 0
+        self._segments_read = []
+        self._columns = None
+
+    def read_new_records(self, columns: List[str] | None = None) -> pd.DataFrame | None:
+        import pyarrow as pa
+
+        segments = list_segments(self.file_path)
+        if columns != self._columns or segments[:len(self._segments_read)] != self._segments_read:
+            if self._segments_read:
+                self.file_generation += 1
+            self._segments_read = []
+            self._columns = columns
+
+        new_segments = segments[len(self._segments_read):]
+        if not new_segments:
+            return None
+        tables = [read_segment(segment, columns) for segment in new_segments]
+        self._segments_read.extend(new_segments)
+        self.bytes_read += sum(table.nbytes for table in tables)
+        return pa.concat_tables(tables, promote_options="default").to_pandas()
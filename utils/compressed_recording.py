@@ -0,0 +1,233 @@
+"""
+Compressed JSON lines recordings, written and read one frame at a time.
+
+BatchedLineWriter compresses every batch of lines into its own gzip member or zstd frame and
+appends it to the recording, so the file is a sequence of independent frames.  A growing file
+can be followed by decompressing the new frames only, and together with the time index, whose
+offsets are frame starts, a time range is read by decompressing only the frames that hold it.
+
+A `.gz` recording is a normal multi member gzip file, `gunzip` and `zcat` read it as it is.  zstd
+needs the optional `zstandard` package, `pip install zstandard`.
+"""
+import gzip
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from .sample_schema import read_json_lines
+
+COMPRESSIONS = ['none', 'gzip', 'zstd']
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_COMPRESSION_LEVELS = {'gzip': 6, 'zstd': 3}
+# compressed bytes read at a time when decompressing a whole recording
+READ_CHUNK_BYTES = 1024 * 1024
+# compressed bytes handed to the decompressor at a time, about the size of a few frames
+FEED_CHUNK_BYTES = 64 * 1024
+
+
+def compression_of(file_path: str | Path) -> str:
+    """
+    Returns the compression of a recording from its file suffix, 'none' for plain JSON lines.
+    """
+    suffix = Path(file_path).suffix
+    for compression, compression_suffix in COMPRESSION_SUFFIXES.items():
+        if suffix == compression_suffix:
+            return compression
+    return 'none'
+
+
+def is_compressed_recording(file_path: str | Path) -> bool:
+    return compression_of(file_path) != 'none'
+
+
+def compressed_path(file_path: str | Path, compression: str) -> Path:
+    """
+    Returns `file_path` with the suffix of `compression` added, `file_path` itself for 'none'.
+    """
+    if compression == 'none':
+        return Path(file_path)
+    return Path(str(file_path) + COMPRESSION_SUFFIXES[compression])
+
+
+def _zstandard():
+    # optional, only needed for zstd recordings
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError("zstd recordings need the zstandard package, pip install zstandard") from exc
+    return zstandard
+
+
+def compress_frame(data: bytes, compression: str, level: int | None = None) -> bytes:
+    """
+    Compress `data` into one self contained gzip member or zstd frame.
+    """
+    level = DEFAULT_COMPRESSION_LEVELS[compression] if level is None else level
+    if compression == 'gzip':
+        # no timestamp in the header, the same lines always compress to the same bytes
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unknown compression: {compression}, expected one of {COMPRESSIONS}")
+
+
+class FrameDecompressor:
+    """
+    Decompress a stream of concatenated frames fed in pieces of any size.
+
+    `feed` returns whatever can be decompressed so far, a frame that is cut off in the middle
+    is finished when the rest of it is fed.
+
+    Parameters:
+    - `compression` (str): 'gzip' or 'zstd'.
+    - `start_offset` (int): The file offset of the first byte that will be fed.
+    """
+
+    def __init__(self, compression: str, start_offset: int = 0):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}, expected one of {list(COMPRESSION_SUFFIXES)}")
+        self.compression = compression
+        self.offset = start_offset
+        self.frame_offset = None
+        self._decompressor = None
+
+    def _new_decompressor(self):
+        if self.compression == 'gzip':
+            return zlib.decompressobj(wbits=31)
+        return _zstandard().ZstdDecompressor().decompressobj()
+
+    def feed_frames(self, data: bytes) -> Iterator[tuple[int, bytes, bool]]:
+        """
+        Yields the offset of the frame, its decompressed bytes and whether the frame is complete,
+        for every frame that `data` holds a part of.  A frame may be yielded in several parts.
+        """
+        view = memoryview(data)
+        position = 0
+        while position < len(view):
+            if self._decompressor is None:
+                self._decompressor = self._new_decompressor()
+                self.frame_offset = self.offset
+            # in small pieces, the bytes after the end of a frame are copied into unused_data
+            chunk = view[position:position + FEED_CHUNK_BYTES]
+            output = self._decompressor.decompress(chunk)
+            if not self._decompressor.eof:
+                position += len(chunk)
+                self.offset += len(chunk)
+                yield self.frame_offset, output, False
+                continue
+            consumed = len(chunk) - len(self._decompressor.unused_data)
+            position += consumed
+            self.offset += consumed
+            self._decompressor = None
+            yield self.frame_offset, output, True
+
+    def feed(self, data: bytes) -> bytes:
+        return b"".join(output for _, output, _ in self.feed_frames(data))
+
+
+def decompress_frames(data: bytes, compression: str) -> bytes:
+    """
+    Decompress whole frames, and the complete part of a last frame that is cut off.
+    """
+    return FrameDecompressor(compression).feed(data)
+
+
+def iter_frames(file_path: str | Path, compression: str | None = None) -> Iterator[tuple[int, bytes]]:
+    """
+    Yields the offset and the decompressed bytes of every complete frame of a recording, one
+    frame in memory at a time.
+    """
+    decompressor = FrameDecompressor(compression or compression_of(file_path))
+    pending = []
+    with Path(file_path).open("rb") as f:
+        while data := f.read(READ_CHUNK_BYTES):
+            for frame_offset, output, complete in decompressor.feed_frames(data):
+                pending.append(output)
+                if complete:
+                    yield frame_offset, b"".join(pending)
+                    pending = []
+
+
+class CompressedTailReader:
+    """
+    Incrementally read a compressed JSON lines recording that is being appended to.
+
+    Has the same interface as `JsonLinesTailReader`.  The reader keeps its decompressor between
+    calls, so every call only decompresses the bytes appended since the previous one.  A frame
+    that is still being written is decompressed as far as it goes, and its last partial line is
+    kept until the rest arrives.  If the file is truncated or replaced, the reader starts over.
+
+    Parameters:
+    - `file_path` (str | Path): The `.gz` or `.zst` recording to follow.
+    """
+
+    def __init__(self, file_path: str | Path):
+        self.file_path = Path(file_path)
+        self.compression = compression_of(self.file_path)
+        self.file_generation = 0
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.bytes_read = 0
+        self._file_id = None
+        self._decompressor = FrameDecompressor(self.compression)
+        self._partial_line = b""
+
+    def read_new_bytes(self) -> bytes:
+        """
+        Return the complete lines decompressed from the bytes appended since the last call.
+        """
+        try:
+            stat_result = self.file_path.stat()
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self.reset()
+                self.file_generation += 1
+            return b""
+        file_id = (stat_result.st_dev, stat_result.st_ino)
+        if (self._file_id is not None and file_id != self._file_id) or stat_result.st_size < self.offset:
+            logging.debug(f"data file was truncated or replaced, start over: {self.file_path}")
+            self.reset()
+            self.file_generation += 1
+        self._file_id = file_id
+        if stat_result.st_size == self.offset:
+            return b""
+
+        with self.file_path.open("rb") as f:
+            f.seek(self.offset)
+            data = f.read(stat_result.st_size - self.offset)
+        self.offset += len(data)
+        self.bytes_read += len(data)
+        text = self._partial_line + self._decompressor.feed(data)
+        last_newline = text.rfind(b"\n")
+        self._partial_line = text[last_newline + 1:]
+        return text[:last_newline + 1]
+
+    def read_new_records(self) -> pd.DataFrame | None:
+        """
+        Returns:
+        - A DataFrame with only the new rows, or None if nothing new was written.
+        """
+        chunk = self.read_new_bytes()
+        if not chunk.strip():
+            return None
+        return read_json_lines(chunk)
+
+
+def read_frames_between(file_path: str | Path, begin: int, stop: int | None = None) -> bytes:
+    """
+    Decompress the frames between the byte offsets `begin` and `stop`, which must be frame
+    starts, like the offsets of a time index.  Returns only complete lines.
+    """
+    with Path(file_path).open("rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        stop = file_size if stop is None else min(stop, file_size)
+        f.seek(begin)
+        data = f.read(max(0, stop - begin))
+    text = decompress_frames(data, compression_of(file_path))
+    return text[:text.rfind(b"\n") + 1]
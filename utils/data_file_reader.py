@@ -0,0 +1,96 @@
+import logging
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from .sample_schema import read_json_lines
+
+
+class JsonLinesTailReader:
+    """
+    Incrementally read a JSON lines data file that is being appended to by another process.
+
+    The reader remembers the byte offset just past the last complete line it parsed, so every
+    call to `read_new_records` only parses the lines appended since the previous call.  A half
+    written last line is left in the file until the writer finishes it.  If the file is truncated,
+    deleted or replaced, the reader starts over from the beginning of the new file.
+
+    Parameters:
+    - `file_path` (str | Path): The JSON lines file to follow.
+    """
+
+    def __init__(self, file_path: str | Path):
+        self.file_path = Path(file_path)
+        # bumped every time the file is found truncated or replaced, so callers holding
+        # rows from the old file know to drop them
+        self.file_generation = 0
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.bytes_read = 0
+        self._file_id = None
+        self._last_line = b""
+
+    def _file_was_replaced(self, stat_result: os.stat_result, f) -> bool:
+        file_id = (stat_result.st_dev, stat_result.st_ino)
+        if self._file_id is not None and file_id != self._file_id:
+            return True
+        if stat_result.st_size < self.offset:
+            return True
+        if self._last_line:
+            # make sure the last line we parsed is still where we left it.  A file that was
+            # rewritten in place will not have the same bytes in front of our offset.
+            f.seek(self.offset - len(self._last_line))
+            if f.read(len(self._last_line)) != self._last_line:
+                return True
+        return False
+
+    def read_new_bytes(self) -> bytes:
+        """
+        Return the complete lines appended to the file since the last call, as raw bytes.
+        """
+        try:
+            stat_result = self.file_path.stat()
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self.reset()
+                self.file_generation += 1
+            return b""
+
+        with self.file_path.open("rb") as f:
+            if self._file_was_replaced(stat_result, f):
+                logging.debug(f"data file was truncated or replaced, start over: {self.file_path}")
+                self.reset()
+                self.file_generation += 1
+            self._file_id = (stat_result.st_dev, stat_result.st_ino)
+
+            if stat_result.st_size == self.offset:
+                return b""
+
+            f.seek(self.offset)
+            chunk = f.read(stat_result.st_size - self.offset)
+
+        # only consume up to the last newline, a partial line will be picked up on the next read
+        last_newline = chunk.rfind(b"\n")
+        if last_newline == -1:
+            return b""
+        chunk = chunk[:last_newline + 1]
+        self.offset += len(chunk)
+        self.bytes_read += len(chunk)
+        previous_newline = chunk.rfind(b"\n", 0, last_newline)
+        self._last_line = chunk[previous_newline + 1:]
+        return chunk
+
+    def read_new_records(self) -> pd.DataFrame | None:
+        """
+        Parse the lines appended to the file since the last call.
+
+        Returns:
+        - A DataFrame with only the new rows, or None if nothing new was written.
+        """
+        chunk = self.read_new_bytes()
+        if not chunk.strip():
+            return None
+        return read_json_lines(chunk)
@@ -0,0 +1,258 @@
+import logging
+import threading
+import weakref
+from pathlib import Path
+
+import pandas as pd
+
+from .collector_pool import MergedDevicesReader, is_device_recording
+from .compressed_recording import CompressedTailReader, is_compressed_recording
+from .columnar_recording import ColumnarSegmentTailReader, columnar_time_bounds, is_columnar_recording, \
+    list_segments, read_columnar_time_range
+from .data_file_reader import JsonLinesTailReader
+from .sample_store import SampleStore
+from .segment_rotation import RotatedSegmentsReader, is_rotated_recording, read_rotated_time_range, \
+    rotated_time_bounds
+from .sensor_constants import DEFAULT_SAMPLE_STORE_CAPACITY
+from .shared_ring import SharedRingReader, is_shared_ring
+from .time_index import first_and_last_time, read_time_range
+
+DEFAULT_HUB_POLL_INTERVAL = 0.5
+
+
+def open_recording_reader(datafile_path: str | Path, last_rows: int = 0):
+    """
+    Return the tail reader that matches the kind of recording at `datafile_path`.
+
+    Returns None for a directory that does not hold any recording yet, because we cannot tell
+    what kind of reader it needs.
+    """
+    if is_shared_ring(datafile_path):
+        return SharedRingReader(datafile_path)
+    if is_device_recording(datafile_path):
+        return MergedDevicesReader(datafile_path)
+    if is_rotated_recording(datafile_path):
+        return RotatedSegmentsReader(datafile_path, last_rows=last_rows)
+    if Path(datafile_path).is_dir() and not list_segments(datafile_path):
+        return None
+    if is_columnar_recording(datafile_path):
+        return ColumnarSegmentTailReader(datafile_path)
+    if is_compressed_recording(datafile_path):
+        return CompressedTailReader(datafile_path)
+    return JsonLinesTailReader(datafile_path)
+
+
+
+def read_recording_time_range(datafile_path: str | Path, start_time: float | None, end_time: float | None,
+                              columns: list | None = None) -> pd.DataFrame | None:
+    """
+    Read only the rows between `start_time` and `end_time`, in seconds, from any kind of recording.
+
+    JSON lines files, compressed or not, are read through their time index, rotated recordings
+    through their segment index, and columnar recordings one overlapping segment at a time.
+    """
+    if is_device_recording(datafile_path):
+        # the databots of a pool have their own files, a range is only read from a single one
+        return None
+    if is_rotated_recording(datafile_path):
+        return read_rotated_time_range(datafile_path, start_time, end_time, columns)
+    if Path(datafile_path).is_dir() and not list_segments(datafile_path):
+        return None
+    if is_columnar_recording(datafile_path):
+        return read_columnar_time_range(datafile_path, start_time, end_time, columns)
+    return read_time_range(datafile_path, start_time, end_time, columns)
+
+
+def recording_time_bounds(datafile_path: str | Path) -> tuple[float, float] | None:
+    """
+    Returns the time of the first and the last row of any kind of recording, in seconds, or None
+    when it does not have rows with a time yet.
+    """
+    if is_device_recording(datafile_path):
+        return None
+    if is_rotated_recording(datafile_path):
+        return rotated_time_bounds(datafile_path)
+    if is_columnar_recording(datafile_path):
+        return columnar_time_bounds(datafile_path)
+    return first_and_last_time(datafile_path)
+
+
+class HubSubscription:
+    """
+    One dashboard session's cursor into a shared data source.
+
+    `read_new` returns the rows published since the previous call.  When the source starts over
+    because the file was replaced, `read_new` reports it so the session can clear what it has.
+
+    Set `columns` to the columns the session displays.  Columnar recordings are then read with
+    the union of the columns of every subscriber, None means every column.
+    """
+
+    def __init__(self, source: 'HubDataSource'):
+        self.source = source
+        self.generation = None
+        self.cursor = 0
+        self.columns = None
+
+    def read_new(self) -> tuple[pd.DataFrame | None, bool]:
+        """
+        Returns:
+        - A DataFrame of the new rows in arrival order, or None if there are none.
+        - True if the source started over since the previous call.
+        """
+        return self.source.read_since(self)
+
+    def close(self):
+        self.source.unsubscribe(self)
+
+
+class HubDataSource:
+    """
+    Tails one recording on a background thread and keeps the newest rows in a shared SampleStore.
+
+    The thread stops by itself once every subscription has been closed or garbage collected.
+    """
+
+    def __init__(self, datafile_path: str | Path, capacity: int = DEFAULT_SAMPLE_STORE_CAPACITY,
+                 poll_interval: float = DEFAULT_HUB_POLL_INTERVAL, on_idle=None):
+        self.datafile_path = Path(datafile_path)
+        self.poll_interval = poll_interval
+        self.store = SampleStore(capacity=capacity)
+        self.generation = 0
+        self.polls = 0
+        self._reader = None
+        self._lock = threading.Lock()
+        self._subscriptions = weakref.WeakSet()
+        self._stop_event = threading.Event()
+        self._on_idle = on_idle
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def subscribe(self) -> HubSubscription | None:
+        """
+        Returns a new subscription, or None if the source has already stopped.
+        """
+        subscription = HubSubscription(self)
+        with self._lock:
+            if self._stop_event.is_set():
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: HubSubscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    @property
+    def bytes_read(self) -> int:
+        # the reader counts what it has read from the recording over its lifetime
+        return self._reader.bytes_read if self._reader is not None else 0
+
+    @property
+    def number_of_subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def read_since(self, subscription: HubSubscription) -> tuple[pd.DataFrame | None, bool]:
+        with self._lock:
+            reset = subscription.generation != self.generation
+            if reset:
+                # a new subscriber, or the source started over, gets everything still in the store
+                subscription.generation = self.generation
+                subscription.cursor = self.store.total_count - len(self.store)
+            number_of_new_rows = min(self.store.total_count - subscription.cursor, len(self.store))
+            subscription.cursor = self.store.total_count
+            if number_of_new_rows <= 0:
+                return None, reset
+            return self.store.to_dataframe(number_of_new_rows, newest_first=False), reset
+
+    def _subscribed_columns(self) -> list | None:
+        columns = set()
+        with self._lock:
+            for subscription in self._subscriptions:
+                if subscription.columns is None:
+                    return None
+                columns.update(subscription.columns)
+        return sorted(columns)
+
+    def poll(self):
+        if self._reader is None:
+            self._reader = open_recording_reader(self.datafile_path, last_rows=self.store.capacity)
+            if self._reader is None:
+                return
+        file_generation = self._reader.file_generation
+        if isinstance(self._reader, (ColumnarSegmentTailReader, SharedRingReader)):
+            # only load the columns somebody is looking at
+            new_df = self._reader.read_new_records(columns=self._subscribed_columns())
+        else:
+            new_df = self._reader.read_new_records()
+        with self._lock:
+            if self._reader.file_generation != file_generation:
+                self.store.clear()
+                self.generation += 1
+            if new_df is not None:
+                self.store.append(new_df)
+        self.polls += 1
+
+    def _run(self):
+        logging.debug(f"start data hub thread: {self.datafile_path}")
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._stop_event.set()
+            if self._stop_event.is_set():
+                break
+            try:
+                self.poll()
+            except Exception as exc:
+                logging.debug(exc)
+            self._stop_event.wait(self.poll_interval)
+        if self._on_idle is not None:
+            self._on_idle(self)
+        logging.debug(f"**** EXIT data hub thread: {self.datafile_path}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class DataHub:
+    """
+    Process wide registry of shared data sources, so many dashboard sessions watching the same
+    recording cause it to be read and parsed once instead of once per session.
+
+    Parameters:
+    - `capacity` (int): The number of rows each source keeps for late subscribers.
+    - `poll_interval` (float): Seconds between reads of each source.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_SAMPLE_STORE_CAPACITY,
+                 poll_interval: float = DEFAULT_HUB_POLL_INTERVAL):
+        self.capacity = capacity
+        self.poll_interval = poll_interval
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, datafile_path: str | Path) -> HubSubscription:
+        key = str(Path(datafile_path).absolute())
+        with self._lock:
+            source = self._sources.get(key)
+            subscription = source.subscribe() if source is not None else None
+            if subscription is None:
+                source = HubDataSource(datafile_path, capacity=self.capacity, poll_interval=self.poll_interval,
+                                       on_idle=self._remove_source)
+                self._sources[key] = source
+                subscription = source.subscribe()
+                source.start()
+            return subscription
+
+    def _remove_source(self, source: HubDataSource):
+        with self._lock:
+            key = str(source.datafile_path.absolute())
+            if self._sources.get(key) is source:
+                del self._sources[key]
+
+    @property
+    def sources(self) -> list:
+        with self._lock:
+            return list(self._sources.values())
@@ -0,0 +1,138 @@
+import logging
+from pathlib import Path
+
+from databot.PyDatabot import PyDatabot, DatabotConfig, ProcessDatabotDataComplete
+
+from .batched_writer import BatchedLineWriter, DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, DEFAULT_FSYNC_EVERY, \
+    DEFAULT_FSYNC_INTERVAL
+from .columnar_recording import ColumnarSegmentWriter, remove_segments, DEFAULT_SEGMENT_SAMPLES, \
+    DEFAULT_SEGMENT_FLUSH_INTERVAL
+from .segment_rotation import RotatingLineWriter, RotationPolicy, remove_rotated_recording
+from .shared_ring import SharedRingWriter, TeeWriter, DEFAULT_RING_CAPACITY
+from .time_index import time_index_path
+
+
+class PyDatabotSaveToWriterDataCollector(PyDatabot):
+    """
+    Base class for the PyDatabot collectors in this module.
+
+    Works like PyDatabotSaveToFileDataCollector, but hands every sample to `self.writer`, which
+    subclasses create.  A writer has `write_record(record)`, `flush_if_due()` and `close()`.
+
+    When `alert_engine` is set, every sample is checked against its rules after it is written, and
+    collection ends when the engine has a `stop_reason`.
+    """
+
+    def __init__(self, databot_config: DatabotConfig, extra_data: dict | None = None,
+                 number_of_records_to_collect: int | None = None, log_level: int = logging.INFO):
+        super().__init__(databot_config, log_level)
+        self.writer = None
+        self.record_number = 0
+        self.extra_data = extra_data
+        self.number_of_records_to_collect = number_of_records_to_collect
+        self.alert_engine = None
+
+    def process_databot_data(self, epoch, data):
+        data['timestamp'] = epoch
+        if self.extra_data is not None:
+            data.update(**self.extra_data)
+
+        self.writer.write_record(data)
+        self.logger.debug(f"buffered record[{self.record_number}]")
+        self.record_number = self.record_number + 1
+        if self.number_of_records_to_collect is not None:
+            if self.record_number >= self.number_of_records_to_collect:
+                self.writer.close()
+                raise ProcessDatabotDataComplete("Done collecting data")
+        if self.alert_engine is not None:
+            self.alert_engine.evaluate(data)
+            if self.alert_engine.stop_reason is not None:
+                self.writer.close()
+                raise ProcessDatabotDataComplete(f"Done collecting data, {self.alert_engine.stop_reason}")
+
+    def tee_to(self, writer):
+        """
+        Hand every sample to `writer` as well, for example a SharedRingWriter for the live dashboard.
+        """
+        self.writer = TeeWriter([writer, self.writer])
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            self.writer.close()
+            if self.alert_engine is not None:
+                self.alert_engine.close()
+
+
+class PyDatabotSaveToBatchedFileDataCollector(PyDatabotSaveToWriterDataCollector):
+    """
+    A PyDatabot collector that saves JSON lines like PyDatabotSaveToFileDataCollector, but through a
+    BatchedLineWriter so the file is opened once and written in batches with a configurable
+    durability policy.  A time index is written next to the file, see `utils.time_index`.  With a
+    `compression`, every batch is written as a compressed frame, see `utils.compressed_recording`.
+    """
+
+    def __init__(self, databot_config: DatabotConfig, file_name: str | Path, extra_data: dict | None = None,
+                 number_of_records_to_collect: int | None = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, durability: str = 'flush',
+                 fsync_every: int = DEFAULT_FSYNC_EVERY, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                 compression: str = 'none',
+                 log_level: int = logging.INFO):
+        super().__init__(databot_config, extra_data, number_of_records_to_collect, log_level)
+        self.file_path = Path(file_name)
+        if self.file_path.exists():
+            self.file_path.unlink(missing_ok=True)
+        time_index_path(self.file_path).unlink(missing_ok=True)
+        self.writer = BatchedLineWriter(self.file_path, batch_size=batch_size, flush_interval=flush_interval,
+                                        durability=durability, fsync_every=fsync_every,
+                                        fsync_interval=fsync_interval, time_index=True,
+                                        compression=compression)
+
+
+class PyDatabotSaveToRotatingFileDataCollector(PyDatabotSaveToWriterDataCollector):
+    """
+    A PyDatabot collector that saves JSON lines into numbered segments that are rotated by size
+    or age, with a segment index and an optional retention policy.
+    """
+
+    def __init__(self, databot_config: DatabotConfig, directory: str | Path, rotation: RotationPolicy,
+                 extra_data: dict | None = None, number_of_records_to_collect: int | None = None,
+                 log_level: int = logging.INFO, **writer_options):
+        super().__init__(databot_config, extra_data, number_of_records_to_collect, log_level)
+        remove_rotated_recording(directory)
+        self.writer = RotatingLineWriter(directory, rotation, **writer_options)
+
+
+class PyDatabotSaveToColumnarDataCollector(PyDatabotSaveToWriterDataCollector):
+    """
+    A PyDatabot collector that saves the data as rolling Arrow IPC or Parquet segments.
+
+    Instead of appending one JSON line per sample it writes a columnar segment every
+    `flush_every_samples` samples or `flush_interval` seconds.
+    """
+
+    def __init__(self, databot_config: DatabotConfig, directory: str | Path, file_format: str = 'arrow',
+                 extra_data: dict | None = None, number_of_records_to_collect: int | None = None,
+                 flush_every_samples: int = DEFAULT_SEGMENT_SAMPLES,
+                 flush_interval: float = DEFAULT_SEGMENT_FLUSH_INTERVAL, log_level: int = logging.INFO):
+        super().__init__(databot_config, extra_data, number_of_records_to_collect, log_level)
+        remove_segments(directory)
+        self.writer = ColumnarSegmentWriter(directory, file_format=file_format,
+                                            flush_every_samples=flush_every_samples,
+                                            flush_interval=flush_interval)
+
+
+
+class PyDatabotSaveToSharedRingDataCollector(PyDatabotSaveToWriterDataCollector):
+    """
+    A PyDatabot collector that only publishes the samples into a shared memory ring for the
+    dashboard, nothing is saved.  To save them too, use another collector and `tee_to` a
+    SharedRingWriter.
+    """
+
+    def __init__(self, databot_config: DatabotConfig, ring_path: str | Path,
+                 ring_capacity: int = DEFAULT_RING_CAPACITY, extra_data: dict | None = None,
+                 number_of_records_to_collect: int | None = None, log_level: int = logging.INFO):
+        super().__init__(databot_config, extra_data, number_of_records_to_collect, log_level)
+        self.writer = SharedRingWriter(ring_path, capacity=ring_capacity)
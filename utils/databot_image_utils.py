@@ -1,6 +1,8 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import cv2
+
+HOT_SPOT_BOX_COLUMNS = ['upper_left_x', 'upper_left_y', 'lower_right_x', 'lower_right_y']
 
 
 def is_point_in_box(x1, y1, x2, y2, x, y):
@@ -8,12 +10,118 @@ def is_point_in_box(x1, y1, x2, y2, x, y):
 
 
 def find_box(normal_x: float, normal_y: float, df: pd.DataFrame):
-    for row in df.iterrows():
-        if is_point_in_box(row[1]['upper_left_x'], row[1]['upper_left_y'], row[1]['lower_right_x'],
-                           row[1]['lower_right_y'], normal_x, normal_y):
-            return row
-    else:
+    # compare the point against every box at once instead of iterating over the rows
+    boxes = df[HOT_SPOT_BOX_COLUMNS].to_numpy(dtype=np.float64)
+    inside = (boxes[:, 0] <= normal_x) & (normal_x <= boxes[:, 2]) & \
+             (boxes[:, 1] <= normal_y) & (normal_y <= boxes[:, 3])
+    matches = np.flatnonzero(inside)
+    if matches.shape[0] == 0:
         return None
+    # same (index, row) tuple that df.iterrows() produces, for the first matching box
+    return df.index[matches[0]], df.iloc[matches[0]]
+
+
+class HotSpotIndex:
+    """
+    Grid index over the hot spot boxes for mapping many normalized (x, y) points to boxes at once.
+
+    The boxes are copied into NumPy arrays and every grid cell keeps the positions of the boxes
+    that overlap it, so a query only tests the few boxes in the point's cell.  When boxes overlap,
+    the first box in the DataFrame wins, the same as `find_box`.
+
+    Parameters:
+    - `df` (pd.DataFrame): The hot spots, as returned by `read_hot_spots`.
+    - `grid_size` (int): Number of cells along each axis.
+    """
+
+    def __init__(self, df: pd.DataFrame, grid_size: int = 32):
+        self.df = df
+        self.grid_size = grid_size
+        self.boxes = df[HOT_SPOT_BOX_COLUMNS].to_numpy(dtype=np.float64)
+        number_of_boxes = self.boxes.shape[0]
+        if number_of_boxes == 0:
+            self.min_xy = np.zeros(2)
+            self.cell_size = np.ones(2)
+            self.cell_offsets = np.zeros(grid_size * grid_size + 1, dtype=np.int64)
+            self.cell_boxes = np.zeros(0, dtype=np.int64)
+            return
+
+        self.min_xy = self.boxes[:, 0:2].min(axis=0)
+        max_xy = self.boxes[:, 2:4].max(axis=0)
+        self.cell_size = np.maximum((max_xy - self.min_xy) / grid_size, np.finfo(np.float64).eps)
+
+        # the range of cells each box covers
+        first_cell = self._cells(self.boxes[:, 0:2])
+        last_cell = self._cells(self.boxes[:, 2:4])
+        cell_ids = []
+        box_ids = []
+        for box in range(number_of_boxes):
+            xs = np.arange(first_cell[box, 0], last_cell[box, 0] + 1)
+            ys = np.arange(first_cell[box, 1], last_cell[box, 1] + 1)
+            cells = (ys[:, None] * grid_size + xs[None, :]).ravel()
+            cell_ids.append(cells)
+            box_ids.append(np.full(cells.shape[0], box))
+        cell_ids = np.concatenate(cell_ids)
+        box_ids = np.concatenate(box_ids)
+        # sort by cell, keeping the boxes of each cell in DataFrame order
+        order = np.lexsort((box_ids, cell_ids))
+        self.cell_boxes = box_ids[order]
+        self.cell_offsets = np.searchsorted(cell_ids[order], np.arange(grid_size * grid_size + 1))
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        cells = np.floor((points - self.min_xy) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.grid_size - 1)
+
+    def query(self, xs, ys) -> np.ndarray:
+        """
+        Map normalized points to hot spot boxes.
+
+        Returns:
+        - The row position in the DataFrame of the box that holds each point, or -1 if none does.
+        """
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
+        points = np.column_stack([xs, ys])
+        result = np.full(points.shape[0], -1, dtype=np.int64)
+        if self.boxes.shape[0] == 0 or points.shape[0] == 0:
+            return result
+
+        cells = self._cells(points)
+        cell = cells[:, 1] * self.grid_size + cells[:, 0]
+        starts = self.cell_offsets[cell]
+        counts = self.cell_offsets[cell + 1] - starts
+
+        # every (point, candidate box) pair, without a Python loop over the points
+        point_ids = np.repeat(np.arange(points.shape[0]), counts)
+        candidate_positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + \
+                              np.repeat(starts, counts)
+        candidates = self.cell_boxes[candidate_positions]
+        px = xs[point_ids]
+        py = ys[point_ids]
+        boxes = self.boxes[candidates]
+        inside = (boxes[:, 0] <= px) & (px <= boxes[:, 2]) & (boxes[:, 1] <= py) & (py <= boxes[:, 3])
+
+        first_match = np.full(points.shape[0], self.boxes.shape[0], dtype=np.int64)
+        np.minimum.at(first_match, point_ids[inside], candidates[inside])
+        found = first_match < self.boxes.shape[0]
+        result[found] = first_match[found]
+        return result
+
+    def find_boxes(self, xs, ys) -> pd.DataFrame:
+        """
+        Like `query`, but returns the matching hot spot rows, one per point, with missing values for
+        misses.  The columns keep their dtypes, integer columns become nullable integers if a point misses.
+        """
+        positions = self.query(xs, ys)
+        boxes = self.df.reset_index(drop=True)
+        if positions.shape[0] == 0:
+            return boxes.iloc[:0]
+        if np.any(positions < 0):
+            # a plain integer column can not hold the missing values, it would turn into floats
+            boxes = boxes.astype({column: pd.Int64Dtype() for column in boxes.columns
+                                  if pd.api.types.is_integer_dtype(boxes[column].dtype)})
+        # -1 is not a row label, so a miss becomes a row of missing values
+        return boxes.reindex(positions).reset_index(drop=True)
 
 
 @st.cache_data
@@ -22,10 +130,16 @@ def read_hot_spots(csv_filepath: str) -> pd.DataFrame:
     return df
 
 
+@st.cache_resource
+def get_hot_spot_index(csv_filepath: str) -> HotSpotIndex:
+    return HotSpotIndex(read_hot_spots(csv_filepath))
+
+
 @st.cache_data
 def read_image(image_path: str):
+    # opencv takes long to import, only pay for it when an image is actually read
+    import cv2
     _image = cv2.imread(image_path)
     im_rgb = cv2.cvtColor(_image, cv2.COLOR_BGR2RGB)
     # _image = imutils.resize(_image, width, height)
     return im_rgb
-
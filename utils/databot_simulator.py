@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from .batched_writer import BatchedLineWriter
+from .sensor_constants import DATABOT_DATA_FILE, databot_sensors
+
+# PyDatabot refuses a config without an address, the simulator does not need a real one
+SIMULATED_DATABOT_ADDRESS = "SIMULATED"
+DATABOT_SIMULATOR_PORT = 8321
+
+# the noise is drawn in blocks seeded by the block number, so any record can be regenerated on its own
+_NOISE_BLOCK_SIZE = 1024
+
+# column: (offset, amplitude, period in seconds, noise)
+_WAVEFORMS = {
+    'acceleration_x': (0.0, 0.5, 2.0, 0.02),
+    'acceleration_y': (0.0, 0.5, 3.0, 0.02),
+    'acceleration_z': (9.81, 0.3, 5.0, 0.02),
+    'linear_acceleration_x': (0.0, 0.5, 2.0, 0.02),
+    'linear_acceleration_y': (0.0, 0.5, 3.0, 0.02),
+    'linear_acceleration_z': (0.0, 0.3, 5.0, 0.02),
+    'gyro_x': (0.0, 20.0, 4.0, 0.5),
+    'gyro_y': (0.0, 15.0, 6.0, 0.5),
+    'gyro_z': (0.0, 10.0, 8.0, 0.5),
+    'mag_x': (20.0, 5.0, 10.0, 0.2),
+    'mag_y': (-5.0, 5.0, 12.0, 0.2),
+    'mag_z': (-40.0, 3.0, 15.0, 0.2),
+    'external_temp_1': (22.0, 1.0, 120.0, 0.05),
+    'external_temp_2': (24.0, 1.5, 90.0, 0.05),
+    'pressure': (101.3, 0.05, 300.0, 0.005),
+    'altitude': (120.0, 0.5, 300.0, 0.05),
+    'ambient_light_in_lux': (300.0, 50.0, 60.0, 2.0),
+    'uv_index': (1.0, 0.5, 60.0, 0.02),
+    'co2': (420.0, 30.0, 180.0, 2.0),
+    'voc': (50.0, 10.0, 150.0, 1.0),
+    'humidity': (40.0, 5.0, 240.0, 0.2),
+    'distance': (500.0, 200.0, 20.0, 5.0),
+}
+
+# magnitudes that are computed from their components, like the databot does
+_MAGNITUDES = {
+    'absolute_acceleration': ['acceleration_x', 'acceleration_y', 'acceleration_z'],
+    'absolute_linear_acceleration': ['linear_acceleration_x', 'linear_acceleration_y', 'linear_acceleration_z'],
+}
+
+
+class SyntheticDatabotSource:
+    """
+    Deterministic synthetic databot samples for exercising the app without hardware.
+
+    Every column of the selected sensors is a sine wave with Gaussian noise, and the magnitude
+    columns are computed from their axes.  Values are strings, and `time` is the device clock in
+    seconds with two decimals, just like the records PyDatabot passes to `process_databot_data`.  The same
+    `seed` always produces the same records, and any range of records can be generated on its own.
+
+    Parameters:
+    - `rate_hz` (float): Samples per second.
+    - `sensors` (List[str] | None): Keys of `databot_sensors` to generate, None for all of them.
+    - `seed` (int): Seed for the noise.
+    """
+
+    def __init__(self, rate_hz: float = 10.0, sensors: List[str] | None = None, seed: int = 0):
+        if rate_hz <= 0:
+            raise ValueError(f"rate_hz must be positive, got {rate_hz}")
+        self.rate_hz = rate_hz
+        self.seed = seed
+        sensors = list(databot_sensors.keys()) if sensors is None else sensors
+        self.columns = [column for sensor in sensors for column in databot_sensors[sensor]['data_columns']]
+        self._noise_columns = [column for column in self.columns if column in _WAVEFORMS]
+        # an endless source
+        self.number_of_records = None
+        self._noise_cache = (None, None)
+
+    def offset_of(self, index: int) -> float:
+        """
+        Returns the number of seconds between the first record and record `index`.
+        """
+        return index / self.rate_hz
+
+    def index_at(self, elapsed: float) -> int:
+        """
+        Returns the index of the newest record that is due `elapsed` seconds after the first one.
+        """
+        return int(elapsed * self.rate_hz)
+
+    def _noise_block(self, block: int) -> np.ndarray:
+        if self._noise_cache[0] != block:
+            rng = np.random.default_rng([self.seed, block])
+            self._noise_cache = (block, rng.standard_normal((_NOISE_BLOCK_SIZE, len(_WAVEFORMS))))
+        return self._noise_cache[1]
+
+    def _noise(self, start: int, stop: int) -> np.ndarray:
+        blocks = [self._noise_block(block) for block in range(start // _NOISE_BLOCK_SIZE,
+                                                               (stop - 1) // _NOISE_BLOCK_SIZE + 1)]
+        first = start % _NOISE_BLOCK_SIZE
+        return np.concatenate(blocks)[first:first + stop - start]
+
+    def values(self, start: int, stop: int) -> dict:
+        """
+        Returns the float values of records `start` to `stop` as one array per column.
+        """
+        offsets = np.arange(start, stop) / self.rate_hz
+        noise = self._noise(start, stop)
+        values = {'time': np.round(offsets, 2)}
+        for position, (column, (offset, amplitude, period, noise_level)) in enumerate(_WAVEFORMS.items()):
+            phase = position * 0.7
+            values[column] = offset + amplitude * np.sin(2 * np.pi * offsets / period + phase) + \
+                             noise_level * noise[:, position]
+        for column, axes in _MAGNITUDES.items():
+            values[column] = np.sqrt(sum(values[axis] ** 2 for axis in axes))
+        return {column: values[column] for column in ['time', *self.columns]}
+
+    def records(self, start: int, stop: int) -> List[dict]:
+        values = self.values(start, stop)
+        # format each column once, instead of every value separately
+        strings = {column: (np.char.mod('%.2f', column_values) if column == 'time'
+                            else np.char.mod('%.4f', column_values)).tolist()
+                   for column, column_values in values.items()}
+        return [dict(zip(strings.keys(), row)) for row in zip(*strings.values())]
+
+    def record(self, index: int) -> dict:
+        return self.records(index, index + 1)[0]
+
+
+class ReplayDatabotSource:
+    """
+    Replay a recorded JSON lines data file at `speed` times its original pace.
+
+    Has the same interface as SyntheticDatabotSource.  The recorded `timestamp` of each line sets
+    its pace and is removed, so the collector can stamp the record again when it is replayed.
+
+    Parameters:
+    - `file_path` (str | Path): A JSON lines file written by one of the databot collectors.
+    - `speed` (float): 2.0 replays twice as fast as the recording.
+    - `loop` (bool): Start from the beginning again at the end of the file, forever.
+    """
+
+    def __init__(self, file_path: str | Path, speed: float = 1.0, loop: bool = False):
+        if speed <= 0:
+            raise ValueError(f"speed must be positive, got {speed}")
+        self.file_path = Path(file_path)
+        self.speed = speed
+        self.loop = loop
+        self._records = []
+        recorded_times = []
+        with self.file_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                recorded_time = record.pop('timestamp', None)
+                if recorded_time is None:
+                    recorded_time = float(record.get('time', 0))
+                recorded_times.append(float(recorded_time))
+                self._records.append(record)
+        if not self._records:
+            raise ValueError(f"{self.file_path} does not hold any records")
+        self._offsets = [(recorded_time - recorded_times[0]) / speed for recorded_time in recorded_times]
+        # the gap between the last record and the first one of the next loop
+        self._loop_gap = self._offsets[-1] / max(1, len(self._offsets) - 1) if len(self._offsets) > 1 else 1.0
+        self._loop_duration = self._offsets[-1] + self._loop_gap
+        self.number_of_records = None if loop else len(self._records)
+
+    def offset_of(self, index: int) -> float:
+        loops, position = divmod(index, len(self._records))
+        return loops * self._loop_duration + self._offsets[position]
+
+    def index_at(self, elapsed: float) -> int:
+        loops = 0
+        if self.loop:
+            loops, elapsed = divmod(elapsed, self._loop_duration)
+        position = max(0, bisect.bisect_right(self._offsets, elapsed) - 1)
+        return int(loops) * len(self._records) + position
+
+    def records(self, start: int, stop: int) -> List[dict]:
+        return [dict(self._records[index % len(self._records)]) for index in range(start, stop)]
+
+    def record(self, index: int) -> dict:
+        return self.records(index, index + 1)[0]
+
+
+def write_simulated_jsonl(source, file_path: str | Path, number_of_records: int, start_time: float | None = None,
+                          realtime: bool = False, chunk_size: int = 1000):
+    """
+    Write the JSON lines file PyDatabotSaveToFileDataCollector would write for these records.
+
+    Parameters:
+    - `source`: A SyntheticDatabotSource or ReplayDatabotSource.
+    - `file_path` (str | Path): The file to create, an existing file is replaced.
+    - `number_of_records` (int): The number of records to write, limited to the length of a replay.
+    - `start_time` (float | None): Epoch `timestamp` of the first record, None for now.  A fixed start
+      time makes the file identical on every run.
+    - `realtime` (bool): Append the records at their own pace, so the file grows like a live recording.
+    """
+    if source.number_of_records is not None:
+        number_of_records = min(number_of_records, source.number_of_records)
+    file_path = Path(file_path)
+    file_path.unlink(missing_ok=True)
+    start_time = time.time() if start_time is None else start_time
+    started = time.monotonic()
+    with BatchedLineWriter(file_path, batch_size=chunk_size, durability='none', time_index=True) as writer:
+        for start in range(0, number_of_records, chunk_size):
+            stop = min(start + chunk_size, number_of_records)
+            for index, record in enumerate(source.records(start, stop), start=start):
+                offset = source.offset_of(index)
+                if realtime:
+                    delay = offset - (time.monotonic() - started)
+                    if delay > 0:
+                        writer.flush()
+                        time.sleep(delay)
+                record['timestamp'] = start_time + offset
+                writer.write_record(record)
+
+
+class SimulatedDatabotConnection:
+    """
+    Mixin that replaces the BLE connection of a PyDatabot collector with a simulated databot.
+
+    Put it in front of any PyDatabot subclass, or use `simulated_collector_class`, and set
+    `simulation_source` before calling `run`.  Records are put on the collector's queue at the
+    pace of the source, so `process_databot_data` sees the same data flow as with hardware.
+    Records that fall behind, at kHz rates, are delivered together on the next wake up.
+    """
+
+    simulation_source = None
+
+    async def connect(self):
+        source = self.simulation_source
+        self.logger.info("connecting to a simulated databot")
+        start_time = time.time()
+        started = time.monotonic()
+        index = 0
+        while self.collect_data:
+            if source.number_of_records is not None and index >= source.number_of_records:
+                break
+            due = source.index_at(time.monotonic() - started) + 1
+            if source.number_of_records is not None:
+                due = min(due, source.number_of_records)
+            if due > index:
+                for record_index, record in enumerate(source.records(index, due), start=index):
+                    await self.queue.put((start_time + source.offset_of(record_index), record))
+                index = due
+            await asyncio.sleep(max(0.0, source.offset_of(index) - (time.monotonic() - started)))
+        # tell the queue consumer there is no more data, like a disconnect
+        await self.queue.put((time.time(), None))
+
+
+def simulated_collector_class(collector_class: type) -> type:
+    """
+    Returns a subclass of the PyDatabot collector class that reads from a simulated databot.
+    """
+    return type(f"Simulated{collector_class.__name__}", (SimulatedDatabotConnection, collector_class), {})
+
+
+class _SimulatorRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send the headers and the body with one write, and without waiting for delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps(self.server.simulator.latest_record()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+
+class SimulatorWebserver:
+    """
+    Serve the latest simulated record over HTTP like `start_databot_webserver` does for a databot.
+
+    Lets `WebserverPollingCollector` and the dashboard be load tested without hardware.  Each GET
+    returns the record that is due at that moment, with its `timestamp`, or null before the first
+    record.  Keep-alive connections are supported.
+
+    Parameters:
+    - `source`: A SyntheticDatabotSource or ReplayDatabotSource.
+    - `host` (str): The address to listen on.
+    - `port` (int): The port to listen on, 0 picks a free port.
+    """
+
+    def __init__(self, source, host: str = "localhost", port: int = DATABOT_SIMULATOR_PORT):
+        self.source = source
+        self._server = ThreadingHTTPServer((host, port), _SimulatorRequestHandler)
+        self._server.daemon_threads = True
+        self._server.simulator = self
+        self._thread = None
+        self._start_time = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._latest = (None, None)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def latest_record(self) -> dict | None:
+        index = self.source.index_at(time.monotonic() - self._started)
+        if self.source.number_of_records is not None:
+            index = min(index, self.source.number_of_records - 1)
+        with self._lock:
+            if self._latest[0] != index:
+                record = self.source.record(index)
+                record['timestamp'] = self._start_time + self.source.offset_of(index)
+                self._latest = (index, record)
+            return self._latest[1]
+
+    def start(self) -> threading.Thread:
+        self._start_time = time.time()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def create_simulation_source(rate_hz: float = 10.0, replay_file: str | Path | None = None, speed: float = 1.0,
+                             loop: bool = False, seed: int = 0):
+    if replay_file is not None:
+        return ReplayDatabotSource(replay_file, speed=speed, loop=loop)
+    return SyntheticDatabotSource(rate_hz=rate_hz, seed=seed)
+
+
+def add_simulation_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--rate", type=float, default=10.0, help="synthetic samples per second")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic noise")
+    parser.add_argument("--replay", default=None, help="replay this JSON lines recording instead of synthetic data")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 2 replays twice as fast")
+    parser.add_argument("--loop", action="store_true", help="replay the recording forever")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulated databot for running the dashboard without hardware")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve the latest sample over HTTP like the databot webserver")
+    add_simulation_arguments(serve)
+    serve.add_argument("--host", default="localhost")
+    serve.add_argument("--port", type=int, default=DATABOT_SIMULATOR_PORT)
+    write = commands.add_parser("write", help="write a JSON lines data file like the databot collector")
+    add_simulation_arguments(write)
+    write.add_argument("--output", default=str(DATABOT_DATA_FILE))
+    write.add_argument("--records", type=int, default=1000)
+    write.add_argument("--start-time", type=float, default=None,
+                       help="epoch timestamp of the first sample, set it for identical files on every run")
+    write.add_argument("--realtime", action="store_true", help="append samples at their own pace")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    source = create_simulation_source(args.rate, args.replay, args.speed, args.loop, args.seed)
+    if args.command == "serve":
+        server = SimulatorWebserver(source, host=args.host, port=args.port)
+        print(f"Serving simulated databot data on {server.url}")
+        server.start().join()
+    else:
+        print(f"Write simulated databot data to: {args.output}")
+        write_simulated_jsonl(source, args.output, args.records, start_time=args.start_time, realtime=args.realtime)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+DOWNSAMPLE_MODES = ['lttb', 'minmax', 'none']
+DEFAULT_CHART_POINTS = 1000
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of the (at most) `threshold` points that best preserve the visual shape
+    of the series.  The first and last points are always kept.  NaN values are ignored.
+    """
+    valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if threshold >= valid.shape[0] or threshold < 3:
+        return valid
+    x = x[valid]
+    y = y[valid]
+    n = x.shape[0]
+
+    # bucket edges for the points between the first and last point
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # average point of every bucket, used as the third corner of the triangle
+    sums_x = np.add.reduceat(x[:n - 1], edges[:-1])
+    sums_y = np.add.reduceat(y[:n - 1], edges[:-1])
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x[1:] / counts[1:], x[-1])
+    avg_y = np.append(sums_y[1:] / counts[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        bx = x[start:end]
+        by = y[start:end]
+        areas = np.abs((x[a] - avg_x[bucket]) * (by - y[a]) - (x[a] - bx) * (avg_y[bucket] - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[bucket + 1] = a
+    return valid[selected]
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Min/max envelope downsampling.
+
+    Splits the series into `threshold // 2` buckets and keeps the minimum and maximum of each,
+    so spikes are never lost.  Returns the sorted indices of the kept points.
+    """
+    n = y.shape[0]
+    number_of_buckets = max(1, threshold // 2)
+    if n <= threshold:
+        return np.arange(n)
+    bucket_size = -(-n // number_of_buckets)
+    padded = np.full(number_of_buckets * bucket_size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(number_of_buckets, bucket_size)
+    nan_mask = np.isnan(buckets)
+    offsets = np.arange(number_of_buckets) * bucket_size
+    min_idx = offsets + np.argmin(np.where(nan_mask, np.inf, buckets), axis=1)
+    max_idx = offsets + np.argmax(np.where(nan_mask, -np.inf, buckets), axis=1)
+    indices = np.unique(np.concatenate([min_idx, max_idx]))
+    return indices[indices < n]
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, threshold: int, mode: str = 'lttb') -> np.ndarray:
+    if mode == 'none' or threshold <= 0 or y.shape[0] <= threshold:
+        return np.arange(y.shape[0])
+    if mode == 'minmax':
+        return minmax_indices(y, threshold)
+    return lttb_indices(x, y, threshold)
+
+
+def _to_float(values: pd.Series) -> np.ndarray:
+    if values.dtype.kind == 'M':
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+class _LiveSeries:
+    # the points picked in the finished buckets of one live series, buckets are `width` wide in x
+    def __init__(self, width: float):
+        self.width = width
+        self.buckets = np.zeros(0, dtype=np.int64)
+        self.points = np.zeros(0, dtype=np.float64)
+        self.newest_x = -np.inf
+
+
+def _lttb_point(xs: np.ndarray, ys: np.ndarray, start: int, end: int, previous: int,
+                next_x: float, next_y: float) -> int:
+    # the point of a bucket that makes the largest triangle with the previous point kept and the
+    # average of the next bucket
+    areas = np.abs((xs[previous] - next_x) * (ys[start:end] - ys[previous]) -
+                   (xs[previous] - xs[start:end]) * (next_y - ys[previous]))
+    return start + int(np.argmax(areas))
+
+
+class DownsampleCache:
+    """
+    Remembers the downsampled indices of each (series, window) so an unchanged window is not recomputed.
+
+    The window key is supplied by the caller, for example the sample store's total count and the
+    number of samples displayed, which only changes when new samples arrive.
+
+    A live window, whose x grows with every sample, changes on every refresh.  For it
+    `get_live_indices` splits x into LTTB buckets of a fixed width, so a bucket that is finished
+    stays the same from one refresh to the next and its point is kept.  Only the buckets the new
+    samples fall into are computed again.
+
+    Parameters:
+    - `max_entries` (int): Number of (series, window) results to keep before the oldest is dropped.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._live = OrderedDict()
+        self.buckets_computed = 0
+
+    def get_indices(self, key, x: np.ndarray, y: np.ndarray, threshold: int, mode: str) -> np.ndarray:
+        key = (key, threshold, mode)
+        indices = self._entries.get(key)
+        if indices is None:
+            indices = downsample_indices(x, y, threshold, mode)
+            self._entries[key] = indices
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return indices
+
+    def get_live_indices(self, key, x: np.ndarray, y: np.ndarray, threshold: int, mode: str) -> np.ndarray:
+        """
+        Downsample a live window, reusing the LTTB points of the buckets that were finished at the
+        last call with the same `key`.  Returns the indices of the kept points in x order.
+        """
+        if mode != 'lttb':
+            # the min/max envelope is vectorized, computing it again is cheaper than keeping it
+            return downsample_indices(x, y, threshold, mode)
+        valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        if threshold < 3 or valid.shape[0] <= threshold:
+            return valid
+        steps = np.diff(x[valid])
+        if np.all(steps <= 0):
+            # the dashboard's windows are newest first
+            order = valid[::-1]
+        else:
+            order = valid if np.all(steps >= 0) else valid[np.argsort(x[valid], kind='stable')]
+        xs, ys = x[order], y[order]
+        n = xs.shape[0]
+        span = xs[-1] - xs[0]
+        number_of_buckets = threshold - 2
+        if span <= 0:
+            return order[lttb_indices(xs, ys, threshold)]
+
+        key = (key, threshold)
+        state = self._live.get(key)
+        if state is None or xs[-1] < state.newest_x or not 0.5 <= span / (state.width * number_of_buckets) <= 2:
+            # a new window, the samples started over, or the window is a different length now
+            state = _LiveSeries(span / number_of_buckets)
+            self._live[key] = state
+            if len(self._live) > self.max_entries:
+                self._live.popitem(last=False)
+        else:
+            self._live.move_to_end(key)
+        state.newest_x = xs[-1]
+
+        bucket_of_row = np.floor(xs / state.width).astype(np.int64)
+        starts = np.append(0, np.flatnonzero(np.diff(bucket_of_row)) + 1)
+        bucket_ids = bucket_of_row[starts]
+        ends = np.append(starts[1:], n)
+        # the points of the finished buckets that are still in the window
+        rows = np.minimum(np.searchsorted(xs, state.points), n - 1)
+        in_window = xs[rows] == state.points
+        state.buckets, state.points = state.buckets[in_window], state.points[in_window]
+        kept = [rows[in_window]]
+        previous = int(kept[0][-1]) if kept[0].shape[0] else 0
+
+        last_finished = state.buckets[-1] if state.buckets.shape[0] else bucket_ids[0] - 1
+        # the newest bucket is still filling up, and the point of the one before depends on it
+        finished_before = bucket_ids.shape[0] - 2
+        new_buckets, new_points = [], []
+        for position in range(int(np.searchsorted(bucket_ids, last_finished, side='right')), bucket_ids.shape[0]):
+            if position + 1 < bucket_ids.shape[0]:
+                next_start, next_end = starts[position + 1], ends[position + 1]
+                next_x, next_y = xs[next_start:next_end].mean(), ys[next_start:next_end].mean()
+            else:
+                next_x, next_y = xs[-1], ys[-1]
+            previous = _lttb_point(xs, ys, starts[position], ends[position], previous, next_x, next_y)
+            self.buckets_computed += 1
+            if position < finished_before:
+                new_buckets.append(bucket_ids[position])
+                new_points.append(xs[previous])
+            kept.append(np.array([previous]))
+        if new_buckets:
+            state.buckets = np.append(state.buckets, new_buckets)
+            state.points = np.append(state.points, new_points)
+        # the first and last points are always kept
+        return order[np.unique(np.concatenate([[0], *kept, [n - 1]]))]
+
+
+def downsample_frame(df: pd.DataFrame, x_column: str, y_columns: List[str], threshold: int = DEFAULT_CHART_POINTS,
+                     mode: str = 'lttb', cache: DownsampleCache | None = None, window_key=None,
+                     series_columns: List[str] | None = None, live: bool = False) -> pd.DataFrame:
+    """
+    Reduce `df` to roughly `threshold` rows per column in `y_columns` before it is charted.
+
+    Every y column is downsampled on its own and the union of the kept rows is returned, so a
+    multi-line chart keeps the interesting points of each line.
+
+    Parameters:
+    - `df` (pd.DataFrame): The samples to chart.
+    - `x_column` (str): The column used for the x axis, usually 'time'.
+    - `y_columns` (List[str]): The columns that will be drawn.
+    - `threshold` (int): Target number of points per column, about the chart's width in pixels.
+    - `mode` (str): 'lttb', 'minmax' or 'none'.
+    - `cache` (DownsampleCache | None): Optional cache of previously computed indices.
+    - `window_key`: Identifies the window of data in `df`, required for the cache to be used.
+    - `series_columns` (List[str] | None): Columns like `device_id`, or the `sensor_name` of long
+      form data, that split `df` into separate lines, each of which is downsampled on its own.
+    - `live` (bool): `df` is a live window whose x grows with every sample.  With a cache, the
+      buckets that are finished are kept between calls with the same `window_key`, which then
+      identifies the kind of window rather than its contents.
+    """
+    if mode == 'none' or threshold <= 0 or df.shape[0] <= threshold:
+        return df
+    series_columns = [column for column in series_columns or []
+                      if column in df.columns and df[column].nunique() > 1]
+    if series_columns:
+        by = series_columns[0] if len(series_columns) == 1 else series_columns
+        return pd.concat([downsample_frame(series_df, x_column, y_columns, threshold, mode, cache,
+                                           None if window_key is None else (series, window_key), live=live)
+                          for series, series_df in df.groupby(by, sort=False, observed=True)])
+
+    x = _to_float(df[x_column])
+    kept = []
+    for y_column in y_columns:
+        if y_column not in df.columns:
+            continue
+        y = _to_float(df[y_column])
+        if cache is not None and window_key is not None and live:
+            indices = cache.get_live_indices((y_column, window_key), x, y, threshold, mode)
+        elif cache is not None and window_key is not None:
+            indices = cache.get_indices((y_column, window_key), x, y, threshold, mode)
+        else:
+            indices = downsample_indices(x, y, threshold, mode)
+        kept.append(indices)
+    if not kept:
+        return df
+    return df.iloc[np.unique(np.concatenate(kept))]
@@ -0,0 +1,119 @@
+"""
+Report how long the dashboard's imports take, and check that the slow optional ones stay deferred.
+
+Every module is imported in a fresh interpreter with `python -X importtime`, so the numbers are
+cold start numbers and one module does not profit from another one being loaded already.
+
+Run from the repository root:
+
+    python -m utils.import_profile
+    python -m utils.import_profile altair pyarrow.parquet
+
+The exit code is 1 when importing the dashboard modules loads one of DEFERRED_MODULES.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+REPOSITORY_ROOT = Path(__file__).parent.parent
+APP_SCRIPT = REPOSITORY_ROOT / "app.py"
+
+
+def dashboard_modules(app_script: Path = APP_SCRIPT) -> List[str]:
+    """
+    Returns the modules app.py imports before it draws anything, read from its module level import
+    statements, so the list cannot fall behind app.py.  The standard library and the imports that
+    are only for type checking are left out.
+    """
+    modules = []
+    for node in ast.parse(app_script.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name.split(".")[0] not in sys.stdlib_module_names and name not in modules:
+                modules.append(name)
+    return modules
+
+
+DASHBOARD_MODULES = dashboard_modules()
+# slow imports that are only loaded when the feature that needs them is used.  pyarrow itself is
+# not in the list, pandas loads it when it is installed, but not its parquet reader.
+DEFERRED_MODULES = ['altair', 'pyarrow.parquet', 'requests', 'cv2', 'databot', 'bleak']
+
+
+def measure_import_time(modules: List[str], python: str = sys.executable) -> dict:
+    """
+    Import `modules` one after the other in a fresh interpreter.
+
+    Returns:
+    - A dict with the `modules`, the total import `seconds`, and an `error` when an import failed.
+    """
+    code = "".join(f"import {module}\n" for module in modules)
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=REPOSITORY_ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'modules': modules, 'seconds': None, 'error': result.stderr.strip().splitlines()[-1]}
+    seconds = 0.0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, nested imports are indented
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].startswith("import time:") and not parts[2].startswith("  "):
+            try:
+                seconds += int(parts[1].strip()) / 1_000_000
+            except ValueError:
+                # the header line
+                pass
+    return {'modules': modules, 'seconds': seconds, 'error': None}
+
+
+def loaded_deferred_modules(modules: List[str] = DASHBOARD_MODULES, deferred: List[str] = DEFERRED_MODULES,
+                            python: str = sys.executable) -> List[str]:
+    """
+    Returns the `deferred` modules that importing `modules` loads, in a fresh interpreter.
+    """
+    code = "import json, sys\n" + "".join(f"import {module}\n" for module in modules) + \
+           f"print(json.dumps([m for m in {deferred!r} if m in sys.modules]))"
+    result = subprocess.run([python, "-c", code], cwd=REPOSITORY_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Report the cold import time of the dashboard modules")
+    parser.add_argument("modules", nargs="*", help="modules to measure, defaults to the ones app.py imports")
+    args = parser.parse_args()
+    modules = args.modules or DASHBOARD_MODULES
+
+    # each module on its own shows what it costs, dependencies included
+    for timing in sorted((measure_import_time([module]) for module in modules),
+                         key=lambda timing: -(timing['seconds'] or 0.0)):
+        if timing['error']:
+            print(f"{timing['modules'][0]:<32} failed: {timing['error']}")
+        else:
+            print(f"{timing['modules'][0]:<32} {timing['seconds'] * 1000:8.1f} ms")
+    # together, the modules share their dependencies
+    timing = measure_import_time(modules)
+    if timing['error'] is None:
+        print(f"{'all of the above':<32} {timing['seconds'] * 1000:8.1f} ms")
+
+    if args.modules:
+        return 0
+    loaded = loaded_deferred_modules(modules)
+    if loaded:
+        print(f"deferred modules loaded by the dashboard imports: {', '.join(loaded)}", file=sys.stderr)
+        return 1
+    print(f"none of {', '.join(DEFERRED_MODULES)} are loaded by the dashboard imports", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
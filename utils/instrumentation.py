@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# number of recent observations the percentiles are computed over
+DEFAULT_METRICS_WINDOW = 300
+METRIC_QUANTILES = [0.5, 0.9, 0.99]
+DATABOT_METRICS_FILE = Path("./data/databot_metrics.prom").absolute()
+
+
+def current_rss_bytes() -> int:
+    """
+    Returns the resident set size of this process.  Outside of Linux this is the peak RSS, and
+    zero on Windows, because the current value is not available without extra dependencies.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        # windows
+        return 0
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes everywhere else
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RollingSummary:
+    """
+    Percentiles over the most recent `window` observations, plus a count and sum over all of them.
+    """
+
+    def __init__(self, window: int = DEFAULT_METRICS_WINDOW):
+        self._values = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._values.append(value)
+        self.count += 1
+        self.sum += value
+
+    def copy(self) -> 'RollingSummary':
+        summary = RollingSummary(self._values.maxlen)
+        summary._values.extend(self._values)
+        summary.count = self.count
+        summary.sum = self.sum
+        return summary
+
+    @property
+    def last(self) -> float | None:
+        return self._values[-1] if self._values else None
+
+    def quantiles(self, quantiles: List[float] = METRIC_QUANTILES) -> List[float]:
+        if not self._values:
+            return [float('nan')] * len(quantiles)
+        return np.quantile(np.fromiter(self._values, dtype=np.float64), quantiles).tolist()
+
+
+def _label_text(labels: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class HotPathMetrics:
+    """
+    Lightweight timings and counters for the dashboard and collector hot paths.
+
+    Recording a value is a dictionary lookup and a deque append under a lock, so it is cheap
+    enough for every refresh and every collector tick, and safe to use from the collector thread.
+
+    - `timer(stage)` records the seconds spent in a block as `latency_seconds{stage=...}`.
+    - `observe(name, value)` records any other per-event value, like rows per refresh.
+    - `set_gauge(name, value)` records a current value, like the RSS.
+
+    Parameters:
+    - `window` (int): Number of recent observations the percentiles are computed over.
+    - `prefix` (str): Prefix of the Prometheus metric names.
+    """
+
+    def __init__(self, window: int = DEFAULT_METRICS_WINDOW, prefix: str = 'databot'):
+        self.window = window
+        self.prefix = prefix
+        self._summaries = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = RollingSummary(self.window)
+            summary.observe(value)
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('latency_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def merge(self, other: 'HotPathMetrics'):
+        """
+        Add a snapshot of the summaries and gauges of `other`, so one export can cover the
+        collector thread too.
+        """
+        with other._lock:
+            summaries = {key: summary.copy() for key, summary in other._summaries.items()}
+            gauges = dict(other._gauges)
+        with self._lock:
+            self._summaries.update(summaries)
+            self._gauges.update(gauges)
+
+    def rows(self) -> List[dict]:
+        """
+        Returns one row per metric, for display in a table.
+        """
+        rows = []
+        with self._lock:
+            for (name, labels), summary in sorted(self._summaries.items()):
+                p50, p90, p99 = summary.quantiles()
+                rows.append({'metric': name, 'labels': ", ".join(f"{k}={v}" for k, v in labels),
+                             'count': summary.count, 'last': summary.last, 'p50': p50, 'p90': p90, 'p99': p99})
+            for (name, labels), value in sorted(self._gauges.items()):
+                rows.append({'metric': name, 'labels': ", ".join(f"{k}={v}" for k, v in labels),
+                             'count': None, 'last': value, 'p50': None, 'p90': None, 'p99': None})
+        return rows
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.  Observations are exported
+        as summaries with quantiles over the recent window, and gauges as gauges.
+        """
+        lines = []
+        typed = set()
+        with self._lock:
+            for (name, labels), summary in sorted(self._summaries.items()):
+                metric = f"{self.prefix}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} summary")
+                    typed.add(metric)
+                for quantile, value in zip(METRIC_QUANTILES, summary.quantiles()):
+                    quantile_label = f'quantile="{quantile}"'
+                    lines.append(f"{metric}{_label_text(labels, quantile_label)} {value}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {summary.sum}")
+                lines.append(f"{metric}_count{_label_text(labels)} {summary.count}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                metric = f"{self.prefix}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} gauge")
+                    typed.add(metric)
+                lines.append(f"{metric}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, file_path: str | Path = DATABOT_METRICS_FILE):
+        """
+        Write the metrics for the node exporter textfile collector, replacing the file atomically.
+        """
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(".tmp")
+        tmp_path.write_text(self.to_prometheus(), encoding="utf-8")
+        os.replace(tmp_path, file_path)
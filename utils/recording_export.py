@@ -0,0 +1,385 @@
+"""
+Convert databot recordings to CSV, Parquet or Arrow files, without the dashboard.
+
+A recording is read as a stream of DataFrame chunks of about `chunk_bytes` of JSON each, and
+every chunk goes through the column selection, the time range filter and the resampler before
+it is written and dropped, so a recording of any size is converted in about the same memory.
+The time index of a JSON lines file, and the segment index of a rotated recording, skip the
+parts outside the time range without reading them.
+
+`databot_export.py` is the command line for this module.
+"""
+import gzip
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List
+
+import pandas as pd
+
+from .collector_pool import DEVICE_ID_COLUMN, is_device_recording
+from .columnar_recording import is_columnar_recording, list_segments, read_segment
+from .compressed_recording import READ_CHUNK_BYTES, FrameDecompressor, compression_of, is_compressed_recording
+from .sample_schema import read_json_lines
+from .segment_rotation import is_rotated_recording, load_segment_index, select_segments
+from .sensor_constants import databot_sensors
+from .shared_ring import is_shared_ring
+from .time_index import filter_time_range, frame_times, load_time_index
+
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+RESAMPLE_AGGREGATIONS = ['mean', 'min', 'max', 'first', 'last']
+# bytes of JSON parsed into one DataFrame chunk
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def export_format_of(file_path: str | Path) -> str | None:
+    """
+    Returns the export format of an output file from its suffix, None for an unknown suffix.
+    """
+    suffix = Path(file_path).suffix
+    for file_format, format_suffix in EXPORT_FORMATS.items():
+        if suffix == format_suffix:
+            return file_format
+    return None
+
+
+def sensor_columns(sensors: List[str] | None) -> List[str] | None:
+    """
+    Returns the time columns, the device id and the data columns of `sensors`, keys of
+    `databot_sensors`.  None, every column, when no sensors are given.
+    """
+    if not sensors:
+        return None
+    columns = ['time', 'timestamp', DEVICE_ID_COLUMN]
+    for sensor in sensors:
+        if sensor not in databot_sensors:
+            raise ValueError(f"Unknown sensor: {sensor}, choose from {','.join(databot_sensors)}")
+        columns += [column for column in databot_sensors[sensor]['data_columns'] if column not in columns]
+    return columns
+
+
+def parse_time(value: str | None) -> float | None:
+    """
+    Parse a time given on the command line, epoch seconds or an ISO date in UTC, into epoch seconds.
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    # a naive pandas timestamp is read as UTC, like the recorded timestamps
+    return timestamp.timestamp()
+
+
+def _read_blocks(f, limit: int | None = None) -> Iterator[bytes]:
+    # raw reads of a file object, up to `limit` bytes
+    while limit is None or limit > 0:
+        data = f.read(READ_CHUNK_BYTES if limit is None else min(READ_CHUNK_BYTES, limit))
+        if not data:
+            return
+        if limit is not None:
+            limit -= len(data)
+        yield data
+
+
+def _complete_lines(blocks: Iterator[bytes], chunk_bytes: int) -> Iterator[bytes]:
+    # regroup blocks of any size into chunks of complete lines of at least `chunk_bytes`
+    pending = []
+    pending_bytes = 0
+    for block in blocks:
+        pending.append(block)
+        pending_bytes += len(block)
+        if pending_bytes < chunk_bytes:
+            continue
+        data = b"".join(pending)
+        last_newline = data.rfind(b"\n")
+        pending = [data[last_newline + 1:]]
+        pending_bytes = len(pending[0])
+        if last_newline >= 0:
+            yield data[:last_newline + 1]
+    data = b"".join(pending)
+    # a last line without a newline is still being written, it is left out like the tail readers do
+    data = data[:data.rfind(b"\n") + 1]
+    if data:
+        yield data
+
+
+def _iter_json_chunks(file_path: Path, start_time: float | None, end_time: float | None,
+                      chunk_bytes: int) -> Iterator[bytes]:
+    begin, stop = 0, None
+    if start_time is not None or end_time is not None:
+        # an existing index is used, building one would read the whole file an extra time
+        index = load_time_index(file_path, rebuild=False)
+        if index is not None:
+            begin, stop = index.byte_range(start_time, end_time, file_path.stat().st_size)
+    with file_path.open("rb") as f:
+        f.seek(begin)
+        blocks = _read_blocks(f, None if stop is None else stop - begin)
+        if is_compressed_recording(file_path):
+            # the offsets of the index of a compressed recording are frame starts
+            decompressor = FrameDecompressor(compression_of(file_path), begin)
+            blocks = (decompressor.feed(block) for block in blocks)
+        yield from _complete_lines(blocks, chunk_bytes)
+
+
+def _iter_rotated_chunks(directory: Path, start_time: float | None, end_time: float | None,
+                         chunk_bytes: int) -> Iterator[bytes]:
+    for segment in select_segments(load_segment_index(directory)['segments'], start_time, end_time):
+        segment_path = directory / segment['file']
+        opener = gzip.open if segment_path.suffix == '.gz' else open
+        try:
+            with opener(segment_path, "rb") as f:
+                yield from _complete_lines(_read_blocks(f), chunk_bytes)
+        except FileNotFoundError:
+            # removed by the retention of the collector since the index was read
+            logging.debug(f"segment is gone: {segment_path}")
+
+
+def iter_recording(file_path: str | Path, columns: List[str] | None = None, start_time: float | None = None,
+                   end_time: float | None = None, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[pd.DataFrame]:
+    """
+    Yields the rows of a recording as DataFrame chunks, in the order they were recorded.
+
+    Parameters:
+    - `file_path` (str | Path): A JSON lines file, plain or compressed, a rotated recording or a
+      columnar recording.
+    - `columns` (List[str] | None): Only keep these columns, None for all of them.
+    - `start_time`, `end_time` (float | None): Only keep the rows in this range, in epoch seconds.
+    - `chunk_bytes` (int): About how many bytes of JSON every chunk is parsed from.
+    """
+    file_path = Path(file_path)
+    if is_shared_ring(file_path):
+        raise ValueError(f"A shared ring only holds the latest samples, export its archive instead: {file_path}")
+    if is_device_recording(file_path):
+        raise ValueError(f"Export the file of every databot of a multi databot recording on its own: {file_path}")
+
+    if is_rotated_recording(file_path):
+        frames = (read_json_lines(data) for data in _iter_rotated_chunks(file_path, start_time, end_time, chunk_bytes))
+    elif is_columnar_recording(file_path):
+        # the segments of a columnar recording are small, every one is a chunk
+        read_columns = None if columns is None else list(dict.fromkeys([*columns, 'timestamp', 'time']))
+        frames = (read_segment(segment, read_columns).to_pandas() for segment in list_segments(file_path))
+    else:
+        frames = (read_json_lines(data) for data in _iter_json_chunks(file_path, start_time, end_time, chunk_bytes))
+
+    for df in frames:
+        if start_time is not None or end_time is not None:
+            df = filter_time_range(df, start_time, end_time)
+        if columns is not None:
+            df = df[[column for column in df.columns if column in columns]]
+        if df.shape[0]:
+            yield df
+
+
+class ChunkResampler:
+    """
+    Resample a stream of DataFrame chunks into fixed time buckets.
+
+    The rows of the last bucket of a chunk are held back until a newer bucket starts, so a bucket
+    that spans two chunks is aggregated once.  The buckets start at the `timestamp` of the rows,
+    or at their `time` for recordings without one, and the rows must be in time order.
+
+    Parameters:
+    - `frequency` (str): The bucket size as a pandas offset, like '100ms' or '1s'.
+    - `how` (str): How the values of a bucket are combined, one of RESAMPLE_AGGREGATIONS.
+    """
+
+    def __init__(self, frequency: str, how: str = 'mean'):
+        if how not in RESAMPLE_AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation: {how}, expected one of {RESAMPLE_AGGREGATIONS}")
+        self.frequency = pd.tseries.frequencies.to_offset(frequency)
+        self.how = how
+        self._pending = None
+
+    def _aggregate(self, df: pd.DataFrame, buckets: pd.Series) -> pd.DataFrame:
+        keys = [buckets.rename('timestamp')]
+        if DEVICE_ID_COLUMN in df.columns:
+            keys.append(df[DEVICE_ID_COLUMN])
+        values = df.drop(columns=['timestamp', DEVICE_ID_COLUMN], errors='ignore').select_dtypes('number')
+        aggregations = {column: 'first' if column == 'time' else self.how for column in values.columns}
+        return values.groupby(keys, sort=False, observed=True).agg(aggregations).reset_index()
+
+    def _buckets(self, df: pd.DataFrame) -> pd.Series:
+        times = df['timestamp'] if 'timestamp' in df.columns and df['timestamp'].dtype.kind == 'M' else \
+            pd.Series(pd.to_datetime(frame_times(df), unit='s'), index=df.index)
+        return times.dt.floor(self.frequency)
+
+    def feed(self, df: pd.DataFrame) -> pd.DataFrame | None:
+        """
+        Returns the buckets that `df` completes, None if there are none yet.
+        """
+        if self._pending is not None:
+            df = pd.concat([self._pending, df], ignore_index=True)
+        buckets = self._buckets(df)
+        complete = (buckets < buckets.max()).to_numpy()
+        self._pending = df[~complete]
+        if not complete.any():
+            return None
+        return self._aggregate(df[complete], buckets[complete])
+
+    def finish(self) -> pd.DataFrame | None:
+        """
+        Returns the last bucket, at the end of the recording.
+        """
+        df, self._pending = self._pending, None
+        if df is None or df.shape[0] == 0:
+            return None
+        return self._aggregate(df, self._buckets(df))
+
+
+class CsvExportWriter:
+    """
+    Append DataFrame chunks to a CSV file.  The columns of the first chunk are the columns of the file.
+    """
+
+    def __init__(self, file_path: str | Path):
+        self.file_path = Path(file_path)
+        self.tmp_path = self.file_path.with_suffix(self.file_path.suffix + ".tmp")
+        self.columns = None
+        self._file = self.tmp_path.open("w", encoding="utf-8", newline="")
+
+    def write(self, df: pd.DataFrame):
+        header = self.columns is None
+        if header:
+            self.columns = list(df.columns)
+        df.reindex(columns=self.columns).to_csv(self._file, header=header, index=False)
+
+    def close(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.file_path)
+
+
+class ArrowExportWriter:
+    """
+    Append DataFrame chunks to a Parquet file, one row group per chunk, or to an Arrow IPC file,
+    one record batch per chunk.  The schema of the first chunk is the schema of the file.
+    """
+
+    def __init__(self, file_path: str | Path, file_format: str):
+        self.file_path = Path(file_path)
+        self.tmp_path = self.file_path.with_suffix(self.file_path.suffix + ".tmp")
+        self.file_format = file_format
+        self.schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        # pyarrow is only needed for these formats
+        import pyarrow as pa
+
+        if self.schema is None:
+            self.schema = pa.Schema.from_pandas(df, preserve_index=False)
+            if self.file_format == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(str(self.tmp_path), self.schema)
+            else:
+                import pyarrow.ipc
+                self._writer = pa.ipc.new_file(str(self.tmp_path), self.schema)
+        table = pa.Table.from_pandas(df.reindex(columns=self.schema.names), schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            # nothing was written, there is no schema for an empty file
+            return
+        self._writer.close()
+        os.replace(self.tmp_path, self.file_path)
+
+
+def open_export_writer(file_path: str | Path, file_format: str):
+    if file_format == 'csv':
+        return CsvExportWriter(file_path)
+    if file_format in EXPORT_FORMATS:
+        return ArrowExportWriter(file_path, file_format)
+    raise ValueError(f"Unknown export format: {file_format}, expected one of {list(EXPORT_FORMATS)}")
+
+
+def export_recording(file_path: str | Path, output_path: str | Path, file_format: str | None = None,
+                     sensors: List[str] | None = None, start_time: float | None = None, end_time: float | None = None,
+                     resample: str | None = None, how: str = 'mean', chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> int:
+    """
+    Stream a recording into a CSV, Parquet or Arrow file.
+
+    Parameters:
+    - `file_path` (str | Path): The recording, see `iter_recording`.
+    - `output_path` (str | Path): The file to write, replaced once the export is complete.
+    - `file_format` (str | None): 'csv', 'parquet' or 'arrow', None to tell from the suffix of `output_path`.
+    - `sensors` (List[str] | None): Only export the columns of these sensors, keys of `databot_sensors`.
+    - `start_time`, `end_time` (float | None): Only export the rows in this range, in epoch seconds.
+    - `resample` (str | None): Resample into buckets of this pandas offset, like '1s'.
+    - `how` (str): How the values of a bucket are combined, one of RESAMPLE_AGGREGATIONS.
+    - `chunk_bytes` (int): About how many bytes of JSON are converted at a time.
+
+    Returns:
+    - The number of rows written.
+    """
+    file_format = file_format or export_format_of(output_path)
+    if file_format is None:
+        raise ValueError(f"Cannot tell the export format of {output_path}, use one of {list(EXPORT_FORMATS.values())}")
+    resampler = ChunkResampler(resample, how) if resample else None
+    writer = open_export_writer(output_path, file_format)
+    rows = 0
+    try:
+        for df in iter_recording(file_path, sensor_columns(sensors), start_time, end_time, chunk_bytes):
+            if resampler is not None:
+                df = resampler.feed(df)
+            if df is not None and df.shape[0]:
+                writer.write(df)
+                rows += df.shape[0]
+        df = resampler.finish() if resampler is not None else None
+        if df is not None:
+            writer.write(df)
+            rows += df.shape[0]
+    finally:
+        writer.close()
+    logging.debug(f"exported {rows} rows of {file_path} to {output_path}")
+    return rows
+
+
+def export_file_name(file_path: str | Path, file_format: str) -> str:
+    """
+    Returns the name of the export of a recording, its name with the suffix of `file_format`.
+    """
+    name = Path(file_path).name
+    for suffix in ['.gz', '.zst', '.json', '.jsonl']:
+        name = name.removesuffix(suffix)
+    return name + EXPORT_FORMATS[file_format]
+
+
+def export_recordings(file_paths: List[str | Path], output_dir: str | Path, file_format: str, jobs: int | None = None,
+                      **options) -> dict:
+    """
+    Export several recordings into `output_dir`, in parallel processes.
+
+    Parameters:
+    - `file_paths` (List[str | Path]): The recordings, each one is exported to a file of its own.
+    - `output_dir` (str | Path): Where the exports are written, see `export_file_name`.
+    - `file_format` (str): 'csv', 'parquet' or 'arrow'.
+    - `jobs` (int | None): The number of processes, None for one per core.
+    - `options`: The other arguments of `export_recording`.
+
+    Returns:
+    - The number of rows written for every recording.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [output_dir / export_file_name(file_path, file_format) for file_path in file_paths]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("Several recordings would be exported to the same file, export them into different directories")
+    jobs = min(jobs or os.cpu_count() or 1, len(file_paths))
+    if jobs <= 1:
+        return {str(file_path): export_recording(file_path, output, file_format, **options)
+                for file_path, output in zip(file_paths, outputs)}
+    # every recording is parsed in its own process, the parsing is what takes the time
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {str(file_path): executor.submit(export_recording, file_path, output, file_format, **options)
+                   for file_path, output in zip(file_paths, outputs)}
+        return {file_path: future.result() for file_path, future in futures.items()}
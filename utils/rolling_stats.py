@@ -0,0 +1,241 @@
+import math
+from collections import deque
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .sensor_constants import databot_sensors_by_friendly_name
+
+ROLLING_STATISTICS = ['mean', 'std', 'min', 'max']
+DEFAULT_ROLLING_WINDOW = 50
+
+
+def _acceleration_magnitude(x, y, z):
+    return np.sqrt(x * x + y * y + z * z)
+
+
+def _tilt_degrees(x, y, z):
+    # angle between the databot's z axis and gravity, 0 when lying flat
+    return np.degrees(np.arctan2(np.sqrt(x * x + y * y), z))
+
+
+def _heading_degrees(x, y, z):
+    # compass heading from the horizontal magnetometer axes, 0 to 360, assumes the databot is level
+    return np.mod(np.degrees(np.arctan2(y, x)), 360.0)
+
+
+# column: (friendly name, input columns, function of the input columns)
+DERIVED_SIGNALS = {
+    'acceleration_magnitude': ('Acceleration magnitude', ['acceleration_x', 'acceleration_y', 'acceleration_z'],
+                               _acceleration_magnitude),
+    'tilt_deg': ('Tilt in degrees', ['acceleration_x', 'acceleration_y', 'acceleration_z'], _tilt_degrees),
+    'heading_deg': ('Heading in degrees', ['mag_x', 'mag_y', 'mag_z'], _heading_degrees),
+}
+
+
+class RollingWindowStats:
+    """
+    Mean, standard deviation, minimum and maximum of the last `window` values, updated in O(1)
+    per value.
+
+    Mean and variance use Welford's method, with the value that leaves the window removed again.
+    Minimum and maximum use monotonic deques, so every value is pushed and popped at most once.
+    NaN values take up a place in the window but are left out of the statistics.
+    """
+
+    def __init__(self, window: int = DEFAULT_ROLLING_WINDOW, track_min_max: bool = True):
+        self.window = max(1, window)
+        self.track_min_max = track_min_max
+        self.reset()
+
+    def reset(self):
+        self._values = deque()
+        self._index = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        # (index, value) pairs with increasing values for the minimum, decreasing for the maximum
+        self._min = deque()
+        self._max = deque()
+
+    def push(self, value: float) -> tuple:
+        """
+        Add the next value.
+
+        Returns:
+        - (mean, std, min, max) of the window, NaN while the window has no numbers.
+        """
+        return tuple(self.update([value])[0])
+
+    def update(self, values) -> np.ndarray:
+        """
+        Add the values in order, with the same O(1) update per value as `push`.
+
+        Returns:
+        - An array with one (mean, std, min, max) row per value.
+        """
+        # the state is kept in locals while looping, attribute lookups cost more than the math
+        window = self.window
+        track_min_max = self.track_min_max
+        window_values = self._values
+        minimums = self._min
+        maximums = self._max
+        index = self._index
+        count = self._count
+        mean = self._mean
+        m2 = self._m2
+        nan = math.nan
+        sqrt = math.sqrt
+        results = []
+        for value in values:
+            window_values.append(value)
+            if value == value:
+                count += 1
+                delta = value - mean
+                mean += delta / count
+                m2 += delta * (value - mean)
+            if len(window_values) > window:
+                old = window_values.popleft()
+                if old == old:
+                    count -= 1
+                    if count == 0:
+                        mean = 0.0
+                        m2 = 0.0
+                    else:
+                        delta = old - mean
+                        mean -= delta / count
+                        m2 -= delta * (old - mean)
+
+            if track_min_max:
+                if value == value:
+                    while minimums and minimums[-1][1] >= value:
+                        minimums.pop()
+                    minimums.append((index, value))
+                    while maximums and maximums[-1][1] <= value:
+                        maximums.pop()
+                    maximums.append((index, value))
+                oldest = index - window
+                while minimums and minimums[0][0] <= oldest:
+                    minimums.popleft()
+                while maximums and maximums[0][0] <= oldest:
+                    maximums.popleft()
+            index += 1
+
+            if count == 0:
+                results.append((nan, nan, nan, nan))
+            else:
+                std = sqrt(m2 / (count - 1)) if count > 1 and m2 > 0.0 else 0.0
+                results.append((mean, std, minimums[0][1] if minimums else nan,
+                                maximums[0][1] if maximums else nan))
+
+        self._index = index
+        self._count = count
+        self._mean = mean
+        self._m2 = m2
+        return np.array(results, dtype=np.float64).reshape(-1, 4)
+
+
+class SignalEngine:
+    """
+    Add derived signals and rolling statistics to each batch of new samples, incrementally.
+
+    The derived signals in DERIVED_SIGNALS are computed per sample from the same row.  For every
+    column in `columns`, and every derived signal, one RollingWindowStats is kept, so the cost per
+    new sample does not depend on how much data has been read.  The results are new columns,
+    `<column>_<statistic>` for the statistics and the DERIVED_SIGNALS keys for the signals, which
+    `chart_fields` turns into extra charts.
+
+    Parameters:
+    - `columns` (List[str]): The sensor data columns to compute rolling statistics for.
+    - `statistics` (List[str]): Some of ROLLING_STATISTICS.
+    - `derived_signals` (List[str]): Some of the DERIVED_SIGNALS keys.
+    - `window` (int): The rolling window in samples.
+    """
+
+    def __init__(self, columns: List[str], statistics: List[str], derived_signals: List[str],
+                 window: int = DEFAULT_ROLLING_WINDOW):
+        self.columns = list(columns)
+        self.statistics = [statistic for statistic in ROLLING_STATISTICS if statistic in statistics]
+        self.derived_signals = [signal for signal in DERIVED_SIGNALS if signal in derived_signals]
+        self.window = window
+        track_min_max = 'min' in self.statistics or 'max' in self.statistics
+        self._stats = {column: RollingWindowStats(window, track_min_max)
+                       for column in [*self.columns, *self.derived_signals]} if self.statistics else {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.statistics or self.derived_signals)
+
+    @property
+    def input_columns(self) -> List[str]:
+        columns = list(self.columns)
+        for signal in self.derived_signals:
+            columns.extend(column for column in DERIVED_SIGNALS[signal][1] if column not in columns)
+        return columns
+
+    def reset(self):
+        for stats in self._stats.values():
+            stats.reset()
+
+    def process(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Returns `df` with the derived signal and rolling statistic columns added.
+        """
+        if not self.enabled or df.shape[0] == 0:
+            return df
+        new_columns = {}
+        numeric = {}
+
+        def values_of(column):
+            if column not in numeric:
+                if column in new_columns:
+                    numeric[column] = new_columns[column]
+                elif column in df.columns:
+                    numeric[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+                else:
+                    numeric[column] = None
+            return numeric[column]
+
+        for signal in self.derived_signals:
+            _, inputs, function = DERIVED_SIGNALS[signal]
+            input_values = [values_of(column) for column in inputs]
+            if all(values is not None for values in input_values):
+                new_columns[signal] = function(*input_values)
+
+        positions = [ROLLING_STATISTICS.index(statistic) for statistic in self.statistics]
+        for column, stats in self._stats.items():
+            values = values_of(column)
+            if values is None:
+                continue
+            results = stats.update(values.tolist())
+            for statistic, position in zip(self.statistics, positions):
+                new_columns[f"{column}_{statistic}"] = results[:, position]
+
+        if not new_columns:
+            return df
+        return pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1)
+
+    def chart_fields(self, available_columns: List[str]) -> List[dict]:
+        """
+        Returns a chart field, like the sensor table records, for each derived signal and for each
+        rolling statistic of each sensor, that has data in `available_columns`.
+        """
+        fields = []
+        for signal in self.derived_signals:
+            if signal in available_columns:
+                fields.append({'sensor_name': signal, 'friendly_name': DERIVED_SIGNALS[signal][0],
+                               'data_columns': [signal]})
+        sensors = [{'sensor_name': signal, 'friendly_name': DERIVED_SIGNALS[signal][0], 'data_columns': [signal]}
+                   for signal in self.derived_signals]
+        sensors += databot_sensors_by_friendly_name
+        for sensor in sensors:
+            columns = [column for column in sensor['data_columns'] if column in self._stats]
+            for statistic in self.statistics:
+                data_columns = [f"{column}_{statistic}" for column in columns
+                                if f"{column}_{statistic}" in available_columns]
+                if data_columns:
+                    fields.append({'sensor_name': f"{sensor['sensor_name']}_{statistic}",
+                                   'friendly_name': f"{sensor['friendly_name']} rolling {statistic}",
+                                   'data_columns': data_columns})
+        return fields
@@ -0,0 +1,140 @@
+"""
+The declared types of the databot sample columns, derived from `databot_sensors`.
+
+Samples arrive as JSON with every value a string or a number, and pandas would infer a type
+for every column of every chunk it parses, float64 or object.  With the schema the columns are
+parsed straight into their declared types:
+
+- `timestamp`: the collector's epoch time, datetime64[ns].
+- `time`: the databot's epoch time in seconds with two decimals, float64.
+- the data columns of every sensor: float32, or the `dtype` a sensor declares in `databot_sensors`.
+  The databot reports its values with far fewer significant digits than float32 holds.
+
+The schema also defines a packed binary record layout, which the shared memory ring uses, with
+the timestamp as a float64 in epoch seconds and every other column in its declared type.
+Missing values are NaN, or MISSING_INTEGER in a column a sensor declares as an integer.
+"""
+import io
+import struct
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .sensor_constants import databot_sensors
+
+DEFAULT_SENSOR_DTYPE = 'float32'
+# the value an integer column holds for a missing value, which it cannot hold as NaN
+MISSING_INTEGER = 0
+
+
+def _sample_dtypes() -> dict:
+    dtypes = {'time': np.dtype(np.float64), 'timestamp': np.dtype('datetime64[ns]')}
+    for sensor in databot_sensors.values():
+        for data_column in sensor['data_columns']:
+            dtypes.setdefault(data_column, np.dtype(sensor.get('dtype', DEFAULT_SENSOR_DTYPE)))
+    return dtypes
+
+
+# column name -> numpy dtype of every column the databot sends
+SAMPLE_DTYPES = _sample_dtypes()
+# the same for pd.read_json, the timestamp is converted by its date parsing
+_JSON_DTYPES = {column: dtype for column, dtype in SAMPLE_DTYPES.items() if dtype.kind != 'M'}
+
+
+def sample_dtype(column: str) -> np.dtype | None:
+    """
+    Returns the declared dtype of `column`, None for a column that is not in the schema.
+    """
+    return SAMPLE_DTYPES.get(column)
+
+
+def to_sample_dtype(values: pd.Series, dtype: np.dtype) -> np.ndarray:
+    """
+    Convert the values of one column to `dtype`.  Values that are not numbers become NaN, or
+    MISSING_INTEGER for an integer column.
+    """
+    if dtype.kind == 'M':
+        if values.dtype.kind != 'M':
+            values = pd.to_datetime(pd.to_numeric(values, errors='coerce'), unit='s')
+        return values.to_numpy(dtype=dtype)
+    if values.dtype.kind not in 'fiub':
+        values = pd.to_numeric(values, errors='coerce')
+    if dtype.kind in 'iu' and values.dtype.kind == 'f':
+        values = values.fillna(MISSING_INTEGER)
+    return values.to_numpy(dtype=dtype)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns `df` with every column of the schema converted to its declared dtype.  Columns that
+    are not in the schema, like `device_id`, are left as they are.
+    """
+    converted = {}
+    for column in df.columns:
+        dtype = SAMPLE_DTYPES.get(column)
+        if dtype is not None and df[column].dtype != dtype:
+            converted[column] = to_sample_dtype(df[column], dtype)
+    return df.assign(**converted) if converted else df
+
+
+def read_json_lines(data: bytes) -> pd.DataFrame:
+    """
+    Parse JSON lines samples into a DataFrame with the declared dtypes.
+    """
+    # the declared columns are converted directly instead of having their type inferred
+    df = pd.read_json(io.BytesIO(data), lines=True, dtype=_JSON_DTYPES)
+    return apply_schema(df)
+
+
+def _struct_code(dtype: np.dtype) -> str:
+    # numpy's type characters are platform sizes, the struct codes of the standard sizes are
+    if dtype.kind == 'f':
+        return {4: 'f', 8: 'd'}[dtype.itemsize]
+    code = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}[dtype.itemsize]
+    return code.upper() if dtype.kind == 'u' else code
+
+
+class PackedRecordLayout:
+    """
+    A fixed size binary layout for one sample, little endian and without padding.
+
+    `timestamp` is stored as float64 epoch seconds, every other column in its declared dtype, and
+    columns that are not in the schema as float64.  `struct` packs a single record, and `dtype` is
+    the numpy structured dtype that views any number of packed records without parsing them.
+
+    Parameters:
+    - `columns` (List[str]): The columns of the record, in order.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.dtype = np.dtype([(column, self._field_dtype(column)) for column in self.columns])
+        self.struct = struct.Struct("<" + "".join(_struct_code(self.dtype[column]) for column in self.columns))
+        self.record_size = self.struct.size
+        self._empty_values = [MISSING_INTEGER if self.dtype[column].kind in 'iu' else np.nan
+                              for column in self.columns]
+        self._integer_positions = {position for position, column in enumerate(self.columns)
+                                   if self.dtype[column].kind in 'iu'}
+
+    @staticmethod
+    def _field_dtype(column: str) -> np.dtype:
+        dtype = SAMPLE_DTYPES.get(column, np.dtype(np.float64))
+        if dtype.kind == 'M':
+            return np.dtype('<f8')
+        return dtype.newbyteorder('<')
+
+    def values(self, record: dict, positions: dict) -> list:
+        """
+        Returns the values of `record` in record order, for `struct.pack`.  `positions` maps every
+        column to its position.  Values that are not numbers are left out.
+        """
+        values = list(self._empty_values)
+        for key, value in record.items():
+            position = positions.get(key)
+            if position is not None:
+                try:
+                    values[position] = int(float(value)) if position in self._integer_positions else float(value)
+                except (TypeError, ValueError):
+                    pass
+        return values
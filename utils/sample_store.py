@@ -0,0 +1,154 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .sample_schema import MISSING_INTEGER, sample_dtype, to_sample_dtype
+from .sensor_constants import databot_sensors, DEFAULT_SAMPLE_STORE_CAPACITY
+
+
+def get_all_data_columns() -> List[str]:
+    """
+    Return the `time` and `timestamp` columns followed by every data column declared in `databot_sensors`.
+    """
+    columns = ['time', 'timestamp']
+    for sensor in databot_sensors.values():
+        for data_column in sensor['data_columns']:
+            if data_column not in columns:
+                columns.append(data_column)
+    return columns
+
+
+def _buffer_dtype(column: str, values: pd.Series):
+    declared = sample_dtype(column)
+    if declared is not None:
+        return declared
+    if values.dtype.kind == 'M':
+        return np.dtype('datetime64[ns]')
+    if values.dtype.kind in 'fiub':
+        return np.dtype(np.float64)
+    return np.dtype(object)
+
+
+def _empty_buffer(size: int, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'M':
+        return np.full(size, np.datetime64('NaT'), dtype=dtype)
+    if dtype.kind == 'f':
+        return np.full(size, np.nan, dtype=dtype)
+    if dtype.kind in 'iu':
+        return np.full(size, MISSING_INTEGER, dtype=dtype)
+    return np.full(size, None, dtype=object)
+
+
+class SampleStore:
+    """
+    Bounded in-memory store for the most recent databot samples.
+
+    Every column is kept in its own preallocated NumPy ring buffer.  Each buffer is twice the
+    capacity and every sample is written to both halves, so the last `n` samples of a column are
+    always contiguous and can be returned as a zero-copy view without sorting or concatenating.
+
+    Parameters:
+    - `capacity` (int): The maximum number of samples to keep.  Older samples are overwritten.
+    - `columns` (List[str] | None): The columns to preallocate, defaults to `get_all_data_columns()`.
+      Columns that show up in the data later are added on the fly.  The columns of the sample
+      schema get their declared dtype, float32 for the sensor values, other columns float64 or object.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_SAMPLE_STORE_CAPACITY, columns: List[str] | None = None):
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than zero")
+        self.capacity = capacity
+        self.total_count = 0
+        # changes every time the contents change, so callers can tell when cached results are stale
+        self.version = 0
+        self._buffers = {}
+        self._columns_with_data = []
+        for column in columns if columns is not None else get_all_data_columns():
+            dtype = sample_dtype(column)
+            self._add_column(column, np.float64 if dtype is None else dtype)
+
+    def _add_column(self, column: str, dtype):
+        self._buffers[column] = _empty_buffer(2 * self.capacity, dtype)
+
+    def __len__(self):
+        return min(self.total_count, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        # the memory of the preallocated buffers, which does not change as samples arrive
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    @property
+    def columns(self) -> List[str]:
+        # only the columns that have received data, in the order they first showed up
+        return list(self._columns_with_data)
+
+    def clear(self):
+        self.total_count = 0
+        self.version += 1
+        self._columns_with_data = []
+        for column, buffer in self._buffers.items():
+            self._buffers[column] = _empty_buffer(buffer.shape[0], buffer.dtype)
+
+    def append(self, df: pd.DataFrame):
+        """
+        Append the rows of `df` to the store.  Columns missing from `df` are filled with NaN.
+        """
+        number_of_rows = df.shape[0]
+        if number_of_rows == 0:
+            return
+        # if more rows arrive than we can hold, only the newest ones matter
+        skip = max(0, number_of_rows - self.capacity)
+        positions = (self.total_count + skip + np.arange(number_of_rows - skip)) % self.capacity
+
+        for column in df.columns:
+            if column not in self._buffers:
+                self._add_column(column, _buffer_dtype(column, df[column]))
+            if column not in self._columns_with_data:
+                self._columns_with_data.append(column)
+
+        for column, buffer in self._buffers.items():
+            if column in df.columns:
+                values = df[column].iloc[skip:]
+                if buffer.dtype.kind == 'O':
+                    values = values.to_numpy(dtype=object)
+                else:
+                    values = to_sample_dtype(values, buffer.dtype)
+            else:
+                values = _empty_buffer(1, buffer.dtype)[0]
+            buffer[positions] = values
+            buffer[positions + self.capacity] = values
+
+        self.total_count += number_of_rows
+        self.version += 1
+
+    def view(self, column: str, number_of_samples: int = 0) -> np.ndarray:
+        """
+        Return a read-only, zero-copy view of the last `number_of_samples` values of `column`,
+        oldest first.  Zero means every sample in the store.
+        """
+        size = len(self)
+        if number_of_samples <= 0 or number_of_samples > size:
+            number_of_samples = size
+        end = self.total_count % self.capacity + self.capacity
+        values = self._buffers[column][end - number_of_samples:end]
+        values.flags.writeable = False
+        return values
+
+    def to_dataframe(self, number_of_samples: int = 0, columns: List[str] | None = None,
+                     newest_first: bool = True) -> pd.DataFrame:
+        """
+        Build a DataFrame of the last `number_of_samples` samples for the requested columns.
+
+        Parameters:
+        - `number_of_samples` (int): How many samples to return, zero for every sample in the store.
+        - `columns` (List[str] | None): The columns to include, defaults to every column with data.
+        - `newest_first` (bool): Order the rows from newest to oldest, the way the dashboard shows them.
+        """
+        if columns is None:
+            columns = self.columns
+        step = -1 if newest_first else 1
+        return pd.DataFrame({column: self.view(column, number_of_samples)[::step]
+                             for column in columns if column in self._buffers})
@@ -0,0 +1,314 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from .batched_writer import BatchedLineWriter
+from .data_file_reader import JsonLinesTailReader
+from .sample_schema import read_json_lines
+from .time_index import filter_time_range, first_and_last_time, record_time
+
+SEGMENT_INDEX_FILE = "segments_index.json"
+
+
+@dataclass
+class RotationPolicy:
+    """
+    When to start a new segment and what to do with the old ones.
+
+    - `max_bytes`: start a new segment once the current one is this big, zero for no size limit.
+    - `max_seconds`: start a new segment once the current one is this old, zero for no time limit.
+    - `keep_segments`: delete the oldest closed segments beyond this many, zero keeps everything.
+    - `compress`: gzip closed segments.  The most recent closed segment is left alone so a reader
+      that is still following it can finish.
+    """
+    max_bytes: int = 0
+    max_seconds: float = 0
+    keep_segments: int = 0
+    compress: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.max_seconds > 0
+
+
+def is_rotated_recording(path: str | Path) -> bool:
+    return (Path(path) / SEGMENT_INDEX_FILE).exists()
+
+
+def load_segment_index(directory: str | Path) -> dict:
+    """
+    Return the segment index of a rotated recording, `{'recording_id': str, 'segments': [...]}`.
+    Each segment entry holds its `file` name, `start_time`, `end_time`, `rows` and `active` flag.
+    """
+    try:
+        with (Path(directory) / SEGMENT_INDEX_FILE).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'recording_id': None, 'segments': []}
+
+
+def save_segment_index(directory: str | Path, index: dict):
+    index_path = Path(directory) / SEGMENT_INDEX_FILE
+    tmp_path = index_path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, index_path)
+
+
+def remove_rotated_recording(directory: str | Path):
+    directory = Path(directory)
+    for segment in load_segment_index(directory)['segments']:
+        (directory / segment['file']).unlink(missing_ok=True)
+    (directory / SEGMENT_INDEX_FILE).unlink(missing_ok=True)
+
+
+def select_segments(segments: List[dict], start_time: float | None = None, end_time: float | None = None,
+                    last_rows: int = 0) -> List[dict]:
+    """
+    Pick the segments that overlap a display window.
+
+    Parameters:
+    - `segments` (List[dict]): The entries of the segment index, oldest first.
+    - `start_time`, `end_time` (float | None): Only keep segments whose time range overlaps this range.
+    - `last_rows` (int): Only keep the newest segments needed to supply this many rows, zero for all.
+    """
+    selected = []
+    for segment in segments:
+        # the active segment has no end yet, so it always overlaps
+        if start_time is not None and segment['end_time'] is not None and segment['end_time'] < start_time:
+            continue
+        if end_time is not None and segment['start_time'] is not None and segment['start_time'] > end_time:
+            continue
+        selected.append(segment)
+
+    if last_rows > 0:
+        rows = 0
+        for position in range(len(selected) - 1, -1, -1):
+            rows += selected[position]['rows']
+            if rows >= last_rows:
+                return selected[position:]
+    return selected
+
+
+def _read_segment_bytes(segment_path: Path) -> bytes:
+    opener = gzip.open if segment_path.suffix == '.gz' else open
+    with opener(segment_path, "rb") as f:
+        data = f.read()
+    # leave out a last line that is still being written
+    return data[:data.rfind(b"\n") + 1]
+
+
+def read_rotated_time_range(directory: str | Path, start_time: float | None, end_time: float | None,
+                            columns: List[str] | None = None) -> pd.DataFrame | None:
+    """
+    Read the rows of a rotated recording between `start_time` and `end_time`, in seconds.  Only
+    the segments whose time range in the segment index overlaps the range are read, the active
+    segment is always read because its end is not in the index yet.
+    """
+    directory = Path(directory)
+    segments = select_segments(load_segment_index(directory)['segments'], start_time, end_time)
+    data = b"".join(_read_segment_bytes(directory / segment['file']) for segment in segments)
+    if not data.strip():
+        return None
+    df = filter_time_range(read_json_lines(data), start_time, end_time)
+    if columns is not None:
+        df = df[[column for column in df.columns if column in columns]]
+    return df if df.shape[0] else None
+
+
+def rotated_time_bounds(directory: str | Path) -> tuple[float, float] | None:
+    """
+    Returns the time of the first and the last row of a rotated recording from its segment index.
+    """
+    directory = Path(directory)
+    first = last = None
+    for segment in load_segment_index(directory)['segments']:
+        start_time, end_time = segment['start_time'], segment['end_time']
+        if segment['active']:
+            # the index is only saved when a segment is opened or closed, look in the segment itself
+            bounds = first_and_last_time(directory / segment['file'])
+            if bounds is not None:
+                start_time, end_time = bounds
+        if start_time is None or end_time is None:
+            continue
+        first = start_time if first is None else first
+        last = end_time
+    return None if first is None else (first, last)
+
+
+class RotatingLineWriter:
+    """
+    Write JSON lines into numbered segments, starting a new segment by size or age.
+
+    Every segment is written through a BatchedLineWriter.  A small index file in the directory
+    records each segment's file name, time range, row count and whether it is still being written,
+    so a reader can open only the segments that overlap the window it wants.
+
+    Parameters:
+    - `directory` (str | Path): The directory that holds the segments and the index.
+    - `rotation` (RotationPolicy): When to rotate, and how to compress or prune old segments.
+    - `segment_prefix` (str): The segment file name prefix.
+    - `writer_options`: Passed on to every BatchedLineWriter.
+    """
+
+    def __init__(self, directory: str | Path, rotation: RotationPolicy, segment_prefix: str = 'databot_data',
+                 **writer_options):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.rotation = rotation
+        self.segment_prefix = segment_prefix
+        self.writer_options = writer_options
+        self.index = load_segment_index(self.directory)
+        if self.index['recording_id'] is None:
+            self.index['recording_id'] = f"{time.time_ns():x}"
+        self.segments = self.index['segments']
+        self._writer = None
+        self._segment = None
+        self._opened_at = 0.0
+
+    def _open_segment(self):
+        number = int(self.segments[-1]['file'].split('-')[-1].split('.')[0]) + 1 if self.segments else 0
+        self._segment = {'file': f"{self.segment_prefix}-{number:06d}.jsonl", 'start_time': None,
+                         'end_time': None, 'rows': 0, 'active': True}
+        self.segments.append(self._segment)
+        self._writer = BatchedLineWriter(self.directory / self._segment['file'], **self.writer_options)
+        self._opened_at = time.monotonic()
+        save_segment_index(self.directory, self.index)
+
+    def _close_segment(self):
+        self._writer.close()
+        self._segment['active'] = False
+        self._writer = None
+        self._segment = None
+        self._apply_retention()
+        save_segment_index(self.directory, self.index)
+
+    def _apply_retention(self):
+        closed = [segment for segment in self.segments if not segment['active']]
+        if self.rotation.keep_segments > 0:
+            for segment in closed[:-self.rotation.keep_segments]:
+                (self.directory / segment['file']).unlink(missing_ok=True)
+                self.segments.remove(segment)
+                logging.debug(f"pruned segment {segment['file']}")
+            closed = closed[-self.rotation.keep_segments:]
+        if self.rotation.compress:
+            for segment in closed[:-1]:
+                if segment['file'].endswith('.gz'):
+                    continue
+                segment_path = self.directory / segment['file']
+                with segment_path.open("rb") as src, gzip.open(f"{segment_path}.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                segment['file'] = f"{segment['file']}.gz"
+                segment_path.unlink()
+
+    def _should_rotate(self) -> bool:
+        if self.rotation.max_bytes > 0 and self._writer.bytes_written >= self.rotation.max_bytes:
+            return True
+        if self.rotation.max_seconds > 0 and time.monotonic() - self._opened_at >= self.rotation.max_seconds:
+            return True
+        return False
+
+    def write_record(self, record: dict):
+        if self._writer is None:
+            self._open_segment()
+        elif self._should_rotate():
+            self._close_segment()
+            self._open_segment()
+
+        sample_time = record_time(record)
+        if sample_time is not None:
+            if self._segment['start_time'] is None:
+                self._segment['start_time'] = sample_time
+            self._segment['end_time'] = sample_time
+        self._segment['rows'] += 1
+        self._writer.write_record(record)
+
+    def flush_if_due(self):
+        if self._writer is not None:
+            self._writer.flush_if_due()
+
+    def close(self):
+        if self._writer is not None:
+            self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RotatedSegmentsReader:
+    """
+    Follow a rotated recording, starting from the segments that overlap the display window.
+
+    Has the same `read_new_records` interface as `JsonLinesTailReader`.  Closed segments are read
+    once, the active segment is tailed, and when a new recording is started in the same directory
+    the reader starts over and bumps `file_generation`.
+
+    Parameters:
+    - `file_path` (str | Path): The directory holding the segments and the index.
+    - `last_rows` (int): Skip the older segments that are not needed to supply this many rows, zero for all.
+    """
+
+    def __init__(self, file_path: str | Path, last_rows: int = 0):
+        self.file_path = Path(file_path)
+        self.last_rows = last_rows
+        self.file_generation = 0
+        self.bytes_read = 0
+        self._recording_id = None
+        self._finished = set()
+        self._tail_reader = None
+
+    def _read_rest_of_segment(self, segment_name: str) -> bytes:
+        # the segment may have been compressed after we started tailing it
+        if self._tail_reader is not None and self._tail_reader.file_path.name == segment_name:
+            return self._tail_reader.read_new_bytes()
+        offset = 0
+        if self._tail_reader is not None and f"{self._tail_reader.file_path.name}.gz" == segment_name:
+            offset = self._tail_reader.offset
+        segment_path = self.file_path / segment_name
+        opener = gzip.open if segment_path.suffix == '.gz' else open
+        with opener(segment_path, "rb") as f:
+            f.seek(offset)
+            return f.read()
+
+    def read_new_records(self) -> pd.DataFrame | None:
+        index = load_segment_index(self.file_path)
+        if index['recording_id'] != self._recording_id:
+            if self._recording_id is not None:
+                self.file_generation += 1
+            self._recording_id = index['recording_id']
+            self._tail_reader = None
+            # start with the newest segments that are needed to fill the display window
+            segments = index['segments']
+            wanted = select_segments(segments, last_rows=self.last_rows)
+            self._finished = {segment['file'].removesuffix('.gz') for segment in segments[:len(segments) - len(wanted)]}
+
+        chunks = []
+        for segment in index['segments']:
+            name = segment['file'].removesuffix('.gz')
+            if name in self._finished:
+                continue
+            if segment['active']:
+                if self._tail_reader is None or self._tail_reader.file_path.name != segment['file']:
+                    self._tail_reader = JsonLinesTailReader(self.file_path / segment['file'])
+                chunks.append(self._tail_reader.read_new_bytes())
+                break
+            chunks.append(self._read_rest_of_segment(segment['file']))
+            self._finished.add(name)
+            self._tail_reader = None
+
+        data = b"".join(chunks)
+        self.bytes_read += len(data)
+        if not data.strip():
+            return None
+        return read_json_lines(data)
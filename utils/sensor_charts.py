@@ -0,0 +1,206 @@
+import copy
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, List
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import altair as alt
+
+# altair is imported inside the functions, it is the slowest import of the dashboard and nothing
+# is charted before the first samples are read.  The sensor charts do not need it at all, their
+# Vega-Lite specs are plain dicts that are built once per sensor.
+
+LONG_FORM_NAME_COLUMN = 'sensor_name'
+LONG_FORM_VALUE_COLUMN = 'sensor_value'
+
+
+def _melt_arrays(df: pd.DataFrame, data_columns: List[str], id_columns: List[str]) -> dict:
+    # the long form as arrays, the data column of every row is in the sensor_name codes
+    number_of_rows = df.shape[0]
+    arrays = {column: np.repeat(df[column].to_numpy(), len(data_columns)) for column in id_columns}
+    values = np.empty((number_of_rows, len(data_columns)), dtype=np.float64)
+    for position, column in enumerate(data_columns):
+        values[:, position] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+    arrays[LONG_FORM_NAME_COLUMN] = np.tile(np.arange(len(data_columns), dtype=np.int8), number_of_rows)
+    arrays[LONG_FORM_VALUE_COLUMN] = values.ravel()
+    return arrays
+
+
+def _long_form_frame(arrays: dict, data_columns: List[str]) -> pd.DataFrame:
+    columns = dict(arrays)
+    columns[LONG_FORM_NAME_COLUMN] = pd.Categorical.from_codes(arrays[LONG_FORM_NAME_COLUMN], categories=data_columns)
+    return pd.DataFrame(columns, copy=False)
+
+
+def melt_long_form(df: pd.DataFrame, data_columns: List[str], id_columns: List[str]) -> pd.DataFrame:
+    """
+    Returns `df` in long form, one row per row of `df` and data column, with the `id_columns`
+    repeated and the data column's name and value in `sensor_name` and `sensor_value`.
+    """
+    return _long_form_frame(_melt_arrays(df, data_columns, id_columns), data_columns)
+
+
+class LongFormCache:
+    """
+    The long form of one multi column sensor's chart window, kept up to date incrementally.
+
+    Vega-Lite can only draw one line per column from long form data.  Instead of folding the
+    whole window in the browser on every refresh, `update` melts only the rows that are newer
+    than the newest row it has seen, and drops the melted rows that have left the window.  The
+    rows are told apart by `x_column`, which has to grow with every new sample, and the window
+    has to be ordered newest first, the way the dashboard shows it.
+
+    Parameters:
+    - `data_columns` (List[str]): The sensor's data columns.
+    - `x_column` (str): The column the chart's x axis uses, 'time' or 'timestamp'.
+    - `id_columns` (List[str]): Columns besides `x_column` to keep on every long form row.
+    """
+
+    def __init__(self, data_columns: List[str], x_column: str, id_columns: List[str] | None = None):
+        self.data_columns = list(data_columns)
+        self.x_column = x_column
+        self.id_columns = [x_column] + [column for column in id_columns or [] if column != x_column]
+        self.rows_melted = 0
+        self._reset_key = None
+        self._arrays = None
+        # the x of every row of the window, newest first
+        self._x = None
+
+    def update(self, df: pd.DataFrame, reset_key=None) -> pd.DataFrame:
+        """
+        Returns the long form of `df`, the current window, newest rows first.
+
+        Parameters:
+        - `df` (pd.DataFrame): The window, with `x_column`, the id columns and the data columns.
+        - `reset_key`: Anything that changes when the window stops being a continuation of the
+          previous one, for example a new sample store or a new filter.
+        """
+        x = _x_values(df[self.x_column])
+        number_of_columns = len(self.data_columns)
+        if self._arrays is None or reset_key != self._reset_key or x.shape[0] == 0 or \
+                self._x.shape[0] == 0 or x[0] < self._x[0] or np.any(np.diff(x) > 0):
+            # a new window, the samples started over, or a window that is not newest first
+            self._reset_key = reset_key
+            self._arrays = _melt_arrays(df, self.data_columns, self.id_columns)
+            self._x = x
+            self.rows_melted += x.shape[0]
+            return _long_form_frame(self._arrays, self.data_columns)
+
+        # the new rows are at the front of the window, and the rows that left it at the back
+        number_of_new_rows = int(np.searchsorted(-x, -self._x[0], side='left'))
+        number_of_kept_rows = int(np.searchsorted(-self._x, -x[-1], side='right'))
+        new_arrays = _melt_arrays(df.iloc[:number_of_new_rows], self.data_columns, self.id_columns)
+        self._arrays = {column: np.concatenate([new_arrays[column],
+                                                values[:number_of_kept_rows * number_of_columns]])
+                        for column, values in self._arrays.items()}
+        self._x = np.concatenate([x[:number_of_new_rows], self._x[:number_of_kept_rows]])
+        self.rows_melted += number_of_new_rows
+        return _long_form_frame(self._arrays, self.data_columns)
+
+
+def _x_values(values: pd.Series) -> np.ndarray:
+    if values.dtype.kind == 'M':
+        return values.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+@lru_cache(maxsize=None)
+def _sensor_chart_spec(data_columns: tuple, x_column: str, x_type: str, series_column: str | None) -> dict:
+    if len(data_columns) == 1:
+        encoding = {'x': {'field': x_column, 'type': x_type},
+                    'y': {'field': data_columns[0], 'type': 'quantitative'}}
+        if series_column is not None:
+            encoding['color'] = {'field': series_column, 'type': 'nominal'}
+    else:
+        encoding = {'x': {'field': x_column, 'type': x_type},
+                    'y': {'field': LONG_FORM_VALUE_COLUMN, 'type': 'quantitative'},
+                    'color': {'field': LONG_FORM_NAME_COLUMN, 'type': 'nominal', 'sort': list(data_columns)}}
+        if series_column is not None:
+            # the color tells the columns apart and the dash pattern the databots
+            encoding['strokeDash'] = {'field': series_column, 'type': 'nominal'}
+            encoding['detail'] = {'field': series_column, 'type': 'nominal'}
+    return {'mark': {'type': 'line'}, 'encoding': encoding}
+
+
+def sensor_chart_spec(data_columns: List[str], x_column: str = 'time', x_type: str = 'quantitative',
+                      series_column: str | None = None) -> dict:
+    """
+    Returns the Vega-Lite spec of a sensor's line chart, without data.  The spec of a sensor is
+    built once and then copied, streamlit adds the data to the copy.
+    """
+    return copy.deepcopy(_sensor_chart_spec(tuple(data_columns), x_column, x_type, series_column))
+
+
+def sensor_chart_data(df: pd.DataFrame, data_columns: List[str],
+                      downsample: Callable[[pd.DataFrame, List[str], List[str]], pd.DataFrame] | None = None,
+                      series_column: str | None = None,
+                      long_form_caches: dict | None = None,
+                      reset_key=None) -> tuple[pd.DataFrame, dict]:
+    """
+    Build the data and the Vega-Lite spec of the line chart for one sensor, for `st.vega_lite_chart`.
+
+    A sensor with one data column is charted from the wide rows.  A sensor with more columns is
+    charted from its long form, one line per column, which is melted here on the server instead of
+    with a fold transform in the browser.
+
+    Parameters:
+    - `df` (pd.DataFrame): The samples, with a `time` column and the sensor's data columns.
+    - `data_columns` (List[str]): The sensor's data columns.
+    - `downsample`: Called with the chart data, the value columns and the columns that split the
+      data into lines, returns the rows to chart.
+    - `series_column` (str | None): A column like `device_id` that splits the samples into one line
+      per value.  The x axis is then the collector's `timestamp`, because every databot's `time`
+      counts from its own start.
+    - `long_form_caches` (dict | None): Where the LongFormCache of every multi column sensor is kept
+      between calls, so only the new rows are melted.
+    - `reset_key`: Passed to `LongFormCache.update`.
+
+    Returns:
+    - The rows to chart and the spec.
+
+    Raises a KeyError if `df` does not hold the sensor's columns.
+    """
+    series = series_column is not None and series_column in df.columns and df[series_column].nunique() > 1
+    x_column = 'timestamp' if series else 'time'
+    # without a series the multi column charts have always shown the databot's time in seconds as a date
+    x_type = 'temporal' if series or len(data_columns) > 1 else 'quantitative'
+    key_columns = [x_column, series_column] if series else [x_column]
+    spec = sensor_chart_spec(data_columns, x_column, x_type, series_column if series else None)
+    if len(data_columns) == 1:
+        chart_df = df[[*key_columns, data_columns[0]]]
+        if downsample is not None:
+            chart_df = downsample(chart_df, data_columns, key_columns[1:])
+        return chart_df, spec
+
+    chart_df = df[[*key_columns, *data_columns]]
+    long_form_caches = {} if long_form_caches is None else long_form_caches
+    cache_key = (tuple(data_columns), tuple(key_columns))
+    if cache_key not in long_form_caches:
+        long_form_caches[cache_key] = LongFormCache(data_columns, x_column, key_columns)
+    long_df = long_form_caches[cache_key].update(chart_df, reset_key)
+    if downsample is not None:
+        long_df = downsample(long_df, [LONG_FORM_VALUE_COLUMN], [*key_columns[1:], LONG_FORM_NAME_COLUMN])
+    return long_df, spec
+
+
+def build_psd_chart(psd_df: pd.DataFrame) -> 'alt.Chart':
+    """
+    Line chart of the power spectral density of one sensor, one line per data column.
+    """
+    import altair as alt
+    return alt.Chart(psd_df).mark_line().encode(x=alt.X('frequency:Q', title='Frequency (Hz)'),
+                                                y=alt.Y('psd_db:Q', title='PSD (dB/Hz)'),
+                                                color='sensor_name:N')
+
+
+def build_spectrogram_chart(spectrogram_df: pd.DataFrame) -> 'alt.Chart':
+    """
+    Heatmap of the power of each frequency over the recent frames of one data column.
+    """
+    import altair as alt
+    return alt.Chart(spectrogram_df).mark_rect().encode(
+        x=alt.X('seconds_ago:O', title='Seconds ago', sort='descending', axis=alt.Axis(format='.1f')),
+        y=alt.Y('frequency:O', title='Frequency (Hz)', sort='descending', axis=alt.Axis(format='.1f')),
+        color=alt.Color('power_db:Q', title='dB', scale=alt.Scale(scheme='viridis')))
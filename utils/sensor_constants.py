@@ -1,9 +1,19 @@
 from pathlib import Path
 
 DATABOT_DATA_FILE = Path("./data/databot_data.json").absolute()
+DATABOT_SEGMENTS_DIR = Path("./data/databot_segments").absolute()
+DATABOT_ROTATED_DIR = Path("./data/databot_rotated").absolute()
+DATABOT_DEVICES_DIR = Path("./data/databot_devices").absolute()
+# the alerts the collector's rules fired, one JSON line each
+DATABOT_ALERTS_FILE = Path("./data/databot_alerts.json").absolute()
+# /dev/shm is memory on linux, so the shared sample ring never touches the SD card
+DATABOT_RING_FILE = (Path("/dev/shm") if Path("/dev/shm").is_dir() else Path("./data").absolute()) / "databot_data.ring"
 DATABOT_IMAGE_PATH = Path("./hotspots/databot.png").absolute()
 DATABOT_HOTSPOTS_DATA = Path("./hotspots/databot-hotspots.csv").absolute()
 
+# number of samples kept in memory by the dashboard for a live session
+DEFAULT_SAMPLE_STORE_CAPACITY = 100_000
+
 magneto_description = """The "magneto" is shorthand term for a "magnetometer," which is one of the sensors on the Databot2.0 device. A magnetometer is an instrument used to measure the strength and direction of magnetic fields. It can detect the presence of nearby magnetic objects or magnetic fields and is commonly used in various applications, such as navigation, geophysics, robotics, and consumer electronics.
 
 In the context of Databot2.0, the magnetometer may be used to gather data on magnetic fields in the surrounding environment, which could be valuable for various purposes like detecting the Earth's magnetic field, orienting the device with respect to magnetic north, or identifying magnetic objects in the vicinity. The data from the magnetometer can be integrated with other sensor data to provide a comprehensive understanding of the device's surroundings and its orientation."""
@@ -163,3 +173,10 @@ databot_sensors = {
     # },
 
 }
+
+# databot_sensors in the order of the sidebar sensor table, sorted once instead of on every script run
+databot_sensors_by_friendly_name = sorted(databot_sensors.values(), key=lambda sensor: sensor['friendly_name'])
+SENSOR_TABLE_COLUMNS = ['sensor_name', 'friendly_name', 'save', 'display', 'data_columns']
+# the sensor table column by column, a DataFrame is built from this without looking at every record
+databot_sensor_table = {column: [sensor[column] for sensor in databot_sensors_by_friendly_name]
+                        for column in SENSOR_TABLE_COLUMNS}
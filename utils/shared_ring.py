@@ -0,0 +1,231 @@
+import json
+import logging
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .sample_schema import PackedRecordLayout
+from .sample_store import get_all_data_columns
+from .sensor_constants import DATABOT_RING_FILE
+
+RING_SUFFIX = '.ring'
+RING_MAGIC = b"DBRING02"
+# rows in the ring, at the default columns about 3 MB, minutes of samples even at a high rate
+DEFAULT_RING_CAPACITY = 16_384
+# the header holds the layout and the sequence counter, the rows start after it
+RING_HEADER_SIZE = 4096
+_COLUMNS_OFFSET = 40
+# positions of the uint64 header fields, the magic takes the first eight bytes
+_GENERATION, _CAPACITY, _NUMBER_OF_COLUMNS, _SEQUENCE = 1, 2, 3, 4
+
+
+def is_shared_ring(path: str | Path) -> bool:
+    return Path(path).suffix == RING_SUFFIX
+
+
+class SharedRingWriter:
+    """
+    Publish samples into a memory mapped ring file, for a dashboard in another process.
+
+    Every sample is one packed record of the sample schema, a float64 timestamp followed by the
+    other columns in their declared types, written in place in the ring, after which the sequence
+    counter in the header is increased.  The header holds the name and type of every field.  Readers copy the rows up
+    to the counter, so no sample is encoded as JSON, written to storage or parsed again.  Values
+    that are not numbers, and keys that are not one of the ring's columns, are left out.
+
+    A new ring file replaces the old one, so readers can tell that a new recording started.  There
+    must only be one writer per ring.
+
+    Parameters:
+    - `file_path` (str | Path): The ring file.  On Linux, DATABOT_RING_FILE is in /dev/shm, which is memory.
+    - `columns` (List[str] | None): The columns of every row, defaults to `get_all_data_columns()`.
+    - `capacity` (int): The number of rows in the ring.  A reader that falls further behind skips samples.
+    """
+
+    def __init__(self, file_path: str | Path = DATABOT_RING_FILE, columns: List[str] | None = None,
+                 capacity: int = DEFAULT_RING_CAPACITY):
+        self.file_path = Path(file_path)
+        self.columns = list(columns) if columns is not None else get_all_data_columns()
+        self.capacity = max(1, capacity)
+        self.sequence = 0
+        self.layout = PackedRecordLayout(self.columns)
+        fields = json.dumps(self.layout.dtype.descr).encode("utf-8")
+        if _COLUMNS_OFFSET + len(fields) > RING_HEADER_SIZE:
+            raise ValueError(f"Too many columns for the ring header: {len(self.columns)}")
+
+        size = RING_HEADER_SIZE + self.capacity * self.layout.record_size
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.file_path.with_suffix(".tmp")
+        with tmp_path.open("wb") as f:
+            f.truncate(size)
+            f.write(RING_MAGIC)
+            f.write(np.array([time.time_ns(), self.capacity, len(self.columns), 0], dtype='<u8').tobytes())
+            f.write(fields)
+        os.replace(tmp_path, self.file_path)
+
+        self._file = self.file_path.open("r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._header = np.ndarray((5,), dtype='<u8', buffer=self._mmap)
+        self._positions = {column: position for position, column in enumerate(self.columns)}
+
+    def write_record(self, record: dict):
+        offset = RING_HEADER_SIZE + (self.sequence % self.capacity) * self.layout.record_size
+        self.layout.struct.pack_into(self._mmap, offset, *self.layout.values(record, self._positions))
+        self.sequence += 1
+        # publish the row only once it is complete
+        self._header[_SEQUENCE] = self.sequence
+
+    def flush_if_due(self):
+        # every sample is visible to readers as soon as it is written
+        pass
+
+    def close(self):
+        if self._mmap.closed:
+            return
+        # the numpy views have to go before the mapping can be closed
+        del self._header
+        self._mmap.close()
+        self._file.close()
+        logging.debug(f"closed {self.file_path} after {self.sequence} samples")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SharedRingReader:
+    """
+    Read the samples a SharedRingWriter publishes, from any number of other processes.
+
+    Has the same `read_new_records` interface as `JsonLinesTailReader`.  A reader that opens a
+    ring starts with the oldest sample still in it.  When the ring is replaced by a new recording,
+    the reader starts over and bumps `file_generation`.
+
+    Parameters:
+    - `file_path` (str | Path): The ring file.
+    """
+
+    def __init__(self, file_path: str | Path = DATABOT_RING_FILE):
+        self.file_path = Path(file_path)
+        self.file_generation = 0
+        self.bytes_read = 0
+        self.samples_skipped = 0
+        self._file_id = None
+        self._mmap = None
+        self._sequence = 0
+
+    def _close(self):
+        if self._mmap is not None:
+            del self._header, self._rows
+            self._mmap.close()
+            self._mmap = None
+        self._file_id = None
+        self._sequence = 0
+
+    def _open(self, stat_result: os.stat_result) -> bool:
+        with self.file_path.open("rb") as f:
+            if f.read(len(RING_MAGIC)) != RING_MAGIC:
+                logging.debug(f"not a databot ring file: {self.file_path}")
+                return False
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._header = np.ndarray((5,), dtype='<u8', buffer=self._mmap)
+        capacity = int(self._header[_CAPACITY])
+        fields = json.loads(bytes(self._mmap[_COLUMNS_OFFSET:RING_HEADER_SIZE]).rstrip(b"\0"))
+        record_dtype = np.dtype([tuple(field) for field in fields])
+        self.columns = list(record_dtype.names)
+        self.capacity = capacity
+        # a structured view of the packed records, the fields are read without parsing anything
+        self._rows = np.ndarray((capacity,), dtype=record_dtype, buffer=self._mmap, offset=RING_HEADER_SIZE)
+        self._file_id = (stat_result.st_dev, stat_result.st_ino)
+        return True
+
+    def read_new_records(self, columns: List[str] | None = None) -> pd.DataFrame | None:
+        """
+        Copy the samples published since the previous call out of the ring.
+
+        Parameters:
+        - `columns` (List[str] | None): Only return these columns, None for all of them.
+
+        Returns:
+        - A DataFrame with the new samples, without the columns that have no values, or None.
+        """
+        try:
+            stat_result = self.file_path.stat()
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._close()
+                self.file_generation += 1
+            return None
+        if self._file_id != (stat_result.st_dev, stat_result.st_ino):
+            # a new recording replaced the ring
+            if self._file_id is not None:
+                self._close()
+                self.file_generation += 1
+            if not self._open(stat_result):
+                return None
+
+        sequence = int(self._header[_SEQUENCE])
+        # the writer fills the slot of row `sequence`, which is also the slot of row `sequence - capacity`,
+        # before it publishes it, so that oldest row may be half written and is never read
+        readable = self.capacity - 1
+        first = max(self._sequence, sequence - readable)
+        if first > self._sequence:
+            self.samples_skipped += first - self._sequence
+            logging.debug(f"fell behind the ring, skipped {first - self._sequence} samples")
+        if sequence <= first:
+            return None
+
+        names = self.columns if columns is None else [column for column in self.columns if column in columns]
+        rows = np.arange(first, sequence) % self.capacity
+        data = self._rows[rows]
+        # the writer may have gone round the ring while we copied, drop the rows it overwrote or
+        # was overwriting, the ones past what we copied are skipped by the next call
+        overwritten = min(int(self._header[_SEQUENCE]) - readable - first, data.shape[0])
+        if overwritten > 0:
+            data = data[overwritten:]
+            self.samples_skipped += overwritten
+        self._sequence = sequence
+        self.bytes_read += data.nbytes
+
+        df = pd.DataFrame({name: data[name] for name in names})
+        # like the JSON lines files, only the sensors that were recorded are columns
+        df = df.loc[:, df.notna().any(axis=0)]
+        if 'timestamp' in df.columns:
+            # pandas reads the epoch timestamp of a JSON lines file as a date too
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+        return df if df.shape[0] else None
+
+
+class TeeWriter:
+    """
+    Hand every sample to several writers, for example a SharedRingWriter for the live dashboard
+    and a BatchedLineWriter that archives the recording.
+    """
+
+    def __init__(self, writers: list):
+        self.writers = writers
+
+    def write_record(self, record: dict):
+        for writer in self.writers:
+            writer.write_record(record)
+
+    def flush_if_due(self):
+        for writer in self.writers:
+            writer.flush_if_due()
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
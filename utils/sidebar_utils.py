@@ -4,7 +4,14 @@ from typing import List
 import pandas as pd
 import streamlit as st
 
-from .sensor_constants import databot_sensors
+from .batched_writer import DURABILITY_POLICIES
+from .compressed_recording import COMPRESSIONS
+from .data_hub import recording_time_bounds
+from .downsample import DOWNSAMPLE_MODES, DEFAULT_CHART_POINTS
+from .rolling_stats import DERIVED_SIGNALS, ROLLING_STATISTICS, DEFAULT_ROLLING_WINDOW
+from .spectral import SPECTRUM_MODES, FFT_SIZES, DEFAULT_FFT_SIZE, DEFAULT_FFT_OVERLAP, DEFAULT_AVERAGE_FRAMES
+from .sensor_constants import databot_sensor_table, DEFAULT_SAMPLE_STORE_CAPACITY
+from .time_buckets import BUCKET_STATISTICS, DEFAULT_BUCKET_LEVELS
 
 
 def get_display_fields_from_sensor_table() -> List[dict]:
@@ -25,10 +32,10 @@ def get_save_fields_from_sensor_table() -> List[dict]:
     # return json_records
 
 
-@st.cache_data
+@st.cache_resource
 def get_databot_sensor_table():
-    df = pd.DataFrame(data=databot_sensors.values()).sort_values(by="friendly_name")
-    return df
+    # built once per server process and shared, st.data_editor returns the edited copy
+    return pd.DataFrame(databot_sensor_table)
 
 
 def display_databot_sensors_from_df(tab_container, include_save_to_file: bool = True):
@@ -63,6 +70,128 @@ def display_databot_sensors_from_df(tab_container, include_save_to_file: bool =
         st.session_state.updated_sensor_df = updated_sensor_df
 
 
+def _databot_devices_input():
+    st.header("Databots")
+    st.write("Add a row for every databot to collect from at the same time.  Each one runs its own collector.")
+    devices_df = pd.DataFrame({'device_id': ['databot-1'], 'address': [''], 'sensors': [''],
+                               'refresh_ms': pd.Series([None], dtype='Int64')})
+    column_config = {
+        "device_id": st.column_config.TextColumn(label="Device id", required=True),
+        "address": st.column_config.TextColumn(label="Bluetooth address",
+                                               help="Leave empty to connect to the first databot found"),
+        "sensors": st.column_config.TextColumn(label="Sensors",
+                                               help="Comma separated sensor names, leave empty for the sensors selected in the Databot Sensors tab"),
+        "refresh_ms": st.column_config.NumberColumn(label="Refresh rate in ms", min_value=100,
+                                                    help="Leave empty for the refresh rate above"),
+    }
+    st.session_state.updated_devices_df = st.data_editor(devices_df, column_config=column_config, key="device_table",
+                                                         num_rows="dynamic", hide_index=True,
+                                                         use_container_width=True)
+
+
+def _sample_store_capacity_input():
+    st.header("Number of samples kept in memory")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("Older samples are dropped from the dashboard once this many have been read")
+    with col2:
+        st.number_input(label="Samples kept in memory", min_value=1000, max_value=10_000_000,
+                        value=DEFAULT_SAMPLE_STORE_CAPACITY, step=1000, key="sample_store_capacity")
+
+
+def _chart_downsampling_inputs():
+    st.header("Chart downsampling")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.selectbox(label="Downsampling mode", options=DOWNSAMPLE_MODES, key="downsample_mode",
+                     help="lttb keeps the visual shape of each line, minmax keeps the min/max envelope so spikes are never lost, none charts every sample.")
+    with col2:
+        st.number_input(label="Points per chart line", min_value=100, max_value=10_000, value=DEFAULT_CHART_POINTS,
+                        step=100, key="chart_points",
+                        help="About the width of the chart in pixels.  More points than this cannot be seen anyway.")
+
+
+# seconds of the time bucket window, zero for every bucket that is kept
+BUCKET_WINDOWS = {0: 'Everything', 60: 'Last minute', 600: 'Last 10 minutes', 3600: 'Last hour', 86400: 'Last 24 hours'}
+
+
+def _time_bucket_inputs():
+    st.header("Time buckets")
+    st.selectbox(label="Bucket size", options=['off', 'auto', *DEFAULT_BUCKET_LEVELS], key="time_bucket",
+                 help="Show one value per fixed time bucket instead of every sample.  auto picks the smallest "
+                      "bucket that fits the window into the points per chart line.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.selectbox(label="Bucket value", options=BUCKET_STATISTICS, key="bucket_statistic")
+    with col2:
+        st.selectbox(label="Window", options=list(BUCKET_WINDOWS), format_func=BUCKET_WINDOWS.get, key="bucket_window",
+                     help="The buckets reach back further than the samples kept in memory.")
+
+
+def _derived_series_inputs():
+    st.header("Derived chart series")
+    st.multiselect(label="Derived signals", options=list(DERIVED_SIGNALS.keys()), key="derived_signals",
+                   format_func=lambda signal: DERIVED_SIGNALS[signal][0],
+                   help="Computed from the acceleration and magneto sensors, which are read even if they are not displayed.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.multiselect(label="Rolling statistics", options=ROLLING_STATISTICS, key="rolling_statistics",
+                       help="Charted for every displayed sensor and every derived signal.")
+    with col2:
+        st.number_input(label="Rolling window in samples", min_value=2, max_value=100_000,
+                        value=DEFAULT_ROLLING_WINDOW, step=10, key="rolling_window")
+
+
+def _spectrum_inputs():
+    st.header("Vibration spectra")
+    st.checkbox(label="Show the Spectrum tab", key="show_spectrum",
+                help="Power spectra of the displayed Acceleration, Linear Acceleration, Gyroscope and Magneto sensors.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.radio(label="Spectrum mode", options=SPECTRUM_MODES, key="spectrum_mode", horizontal=True)
+        st.selectbox(label="FFT size in samples", options=FFT_SIZES, index=FFT_SIZES.index(DEFAULT_FFT_SIZE),
+                     key="fft_size")
+    with col2:
+        st.slider(label="Window overlap", min_value=0.0, max_value=0.9, value=DEFAULT_FFT_OVERLAP, step=0.05,
+                  key="fft_overlap")
+        st.number_input(label="Windows averaged in the PSD", min_value=1, max_value=256,
+                        value=DEFAULT_AVERAGE_FRAMES, step=1, key="psd_average_frames")
+
+
+@st.cache_data(ttl=5)
+def get_recording_time_bounds(datafile_path: str) -> tuple[float, float] | None:
+    # a file that is still being written grows, so the bounds are only cached for a few seconds
+    try:
+        return recording_time_bounds(datafile_path)
+    except (OSError, ValueError):
+        return None
+
+
+def _time_range_inputs(datafile_path: str):
+    st.header("Time range")
+    bounds = get_recording_time_bounds(str(datafile_path)) if datafile_path else None
+    if bounds is None:
+        st.write("The data file does not have any timestamped samples yet")
+        st.session_state.use_time_range = False
+        return
+    duration = max(round(bounds[1] - bounds[0], 1), 0.1)
+    st.session_state.time_range_origin = bounds[0]
+    # keep the selected range inside the recording, the slider refuses a value outside of it
+    time_range = st.session_state.get('time_range', default=None)
+    if time_range is None or time_range[1] > duration:
+        st.session_state.time_range = (min(time_range[0], duration) if time_range else 0.0, duration)
+    use_time_range = st.checkbox(label="Only read a time range", key="use_time_range",
+                                 help="Reads only the samples in the range, using the time index of a JSON lines file or the segments that overlap the range.")
+    st.slider(label="Seconds from the start of the recording", min_value=0.0, max_value=duration, step=0.1,
+              key="time_range", disabled=not use_time_range)
+
+
+def _diagnostics_input():
+    st.header("Diagnostics")
+    st.checkbox(label="Show the Diagnostics tab", key="show_diagnostics",
+                help="Timing, rows and bytes per refresh, collector ticks and memory use of the dashboard.")
+
+
 def setup_input_selection_sidebar():
     with st.sidebar:
         st.title("Data Collection Config")
@@ -97,6 +226,53 @@ def setup_input_selection_sidebar():
                                     key="databot_data_refresh_rate")
                 st.divider()
 
+                st.header("Simulated databot")
+                col10, col11 = st.columns(2)
+                with col10:
+                    st.checkbox(label="Use a simulated databot", key="simulate_databot",
+                                help="Collect deterministic synthetic data instead of connecting to a databot over bluetooth.")
+                with col11:
+                    st.number_input(label="Simulated samples per second", min_value=1, max_value=5000, value=10,
+                                    step=10, key="simulate_rate")
+                st.divider()
+
+                _databot_devices_input()
+                st.divider()
+
+                st.header("Recording format")
+                st.radio(label="Recording format", options=['jsonl', 'arrow', 'parquet'],
+                         captions=['One JSON line per sample', 'Rolling Arrow IPC segments', 'Rolling Parquet segments'],
+                         help='The columnar formats are much smaller on disk and reload quickly, but new samples only show up when a segment is written.',
+                         key="recording_format", horizontal=True)
+                st.selectbox(label="Compression", options=COMPRESSIONS, key="recording_compression",
+                             help="jsonl without rotation only.  Every batch of samples is written as a compressed frame, about a tenth of the size on disk.  zstd needs the zstandard package.")
+                st.selectbox(label="Write durability", options=DURABILITY_POLICIES, index=1, key="write_durability",
+                             help="jsonl only.  none never forces data onto the disk, flush forces it every half minute, fsync every few batches, and both when collection stops.  Fewer forced writes are easier on SD cards.")
+                st.divider()
+
+                st.header("Live transport")
+                col12, col13 = st.columns(2)
+                with col12:
+                    shared_ring = st.checkbox(label="Stream live samples through shared memory", key="shared_ring",
+                                              help="The collector publishes every sample into a memory mapped ring the dashboard reads directly, instead of the dashboard parsing the data file.")
+                with col13:
+                    st.checkbox(label="Also save the samples to the data file", value=True, key="ring_archive",
+                                disabled=not shared_ring)
+                st.divider()
+
+                st.header("Data file rotation")
+                col8, col9 = st.columns(2)
+                with col8:
+                    st.number_input(label="Rotate after this many MB", min_value=0, max_value=10_000, value=0, step=10,
+                                    key="rotate_mb", help="jsonl only.  Set both rotation limits to zero to write one file.")
+                    st.number_input(label="Keep this many old segments", min_value=0, max_value=10_000, value=0, step=1,
+                                    key="keep_segments", help="Set to zero to keep every segment")
+                with col9:
+                    st.number_input(label="Rotate after this many minutes", min_value=0, max_value=10_000, value=0,
+                                    step=10, key="rotate_minutes")
+                    st.checkbox(label="Compress old segments", key="compress_segments")
+                st.divider()
+
                 st.header("Display the last 'n' number of data samples.")
                 col4, col5 = st.columns(2)
                 with col4:
@@ -106,6 +282,22 @@ def setup_input_selection_sidebar():
                     st.number_input(label="Number of samples to display", min_value=0, max_value=300, value=0, step=1,
                                     key="number_of_samples_to_display")
 
+                st.divider()
+                _sample_store_capacity_input()
+
+                st.divider()
+                _chart_downsampling_inputs()
+
+                st.divider()
+                _time_bucket_inputs()
+
+                st.divider()
+                _derived_series_inputs()
+                st.divider()
+                _spectrum_inputs()
+                st.divider()
+                _diagnostics_input()
+
                 st.divider()
                 st.header("Total number of samples to collect")
                 col6, col7 = st.columns(2)
@@ -113,7 +305,15 @@ def setup_input_selection_sidebar():
                     st.write("Set to zero for unlimited datapoints")
                 with col7:
                     st.number_input(label="Number of samples to collect", min_value=0, max_value=5000, value=0, step=1,
-                                    key="number_of_samples_to_collect")
+                                    key="number_of_samples_to_collect",
+                                    help="Counted by the collector, which stops by itself even if no dashboard is open.  Every databot of several collects this many.")
+
+                st.divider()
+                st.header("Alert rules")
+                st.text_input(label="Alert rules file", key="alert_rules_path",
+                              placeholder="JSON file of threshold, rate and z-score rules",
+                              help="Checked by the collector on every sample, see utils/alert_rules.py.  The alerts are "
+                                   "saved to data/databot_alerts.json and shown on the dashboard.")
 
         else:
             tab1, tab2 = st.tabs(['Databot Sensors', 'Data File Config'])
@@ -126,9 +326,13 @@ def setup_input_selection_sidebar():
                 st.divider()
                 read_datafile_path = st.session_state.get('datafile_path', default="")
                 last_datafile_path = st.text_input(label='JSON Data File', value=read_datafile_path, placeholder="Full path to the Databot JSON data file",
+                              help="A JSON lines data file, or a directory of Arrow/Parquet segments",
                               key="read_datafile_path")
                 st.session_state['datafile_path'] = last_datafile_path
 
+                st.divider()
+                _time_range_inputs(last_datafile_path)
+
                 st.divider()
 
                 st.header("Display the last 'n' number of data samples.")
@@ -139,3 +343,19 @@ def setup_input_selection_sidebar():
                 with col5:
                     st.number_input(label="Number of samples to display", min_value=0, max_value=300, value=0, step=1,
                                     key="number_of_samples_to_display")
+
+                st.divider()
+                _sample_store_capacity_input()
+
+                st.divider()
+                _chart_downsampling_inputs()
+
+                st.divider()
+                _time_bucket_inputs()
+
+                st.divider()
+                _derived_series_inputs()
+                st.divider()
+                _spectrum_inputs()
+                st.divider()
+                _diagnostics_input()
@@ -0,0 +1,164 @@
+import math
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .sample_store import SampleStore
+
+# the sensors in databot_sensors that vibration spectra make sense for
+IMU_SENSORS = ['accl', 'Laccl', 'gyro', 'magneto']
+SPECTRUM_MODES = ['PSD', 'Spectrogram']
+FFT_SIZES = [64, 128, 256, 512, 1024, 2048]
+DEFAULT_FFT_SIZE = 256
+DEFAULT_FFT_OVERLAP = 0.5
+DEFAULT_AVERAGE_FRAMES = 8
+DEFAULT_SPECTROGRAM_FRAMES = 48
+# spectrogram charts average neighbouring bins down to this many, a vega heatmap gets slow beyond that
+MAX_SPECTROGRAM_BINS = 64
+
+
+class StreamingSpectrum:
+    """
+    Overlapping-window FFTs over the most recent samples in a SampleStore.
+
+    Frames start at multiples of the hop size counted from the first sample ever appended to the
+    store, so a frame covers the same samples on every refresh.  The power spectrum of each frame
+    is computed once, when the frame is complete, and reused until the frame falls out of the
+    store.  A refresh therefore only pays for the frames that completed since the last one.
+
+    Call `reset` when the store is cleared.
+
+    Parameters:
+    - `fft_size` (int): Samples per frame.
+    - `overlap` (float): Fraction of a frame shared with the next one, 0 to 0.9.
+    """
+
+    def __init__(self, fft_size: int = DEFAULT_FFT_SIZE, overlap: float = DEFAULT_FFT_OVERLAP):
+        self.fft_size = fft_size
+        self.overlap = min(max(overlap, 0.0), 0.9)
+        self.hop = max(1, int(round(fft_size * (1 - self.overlap))))
+        self._window = np.hanning(fft_size)
+        self._window_power = float(np.sum(self._window ** 2))
+        # column: {frame start: one-sided power spectrum, not yet divided by the sample rate}
+        self._frames = {}
+        self.frames_computed = 0
+
+    def reset(self):
+        self._frames = {}
+
+    def _frame_starts(self, store: SampleStore, number_of_frames: int) -> np.ndarray:
+        first_sample = store.total_count - len(store)
+        last_start = store.total_count - self.fft_size
+        first_start = -(-first_sample // self.hop) * self.hop
+        if last_start < first_start:
+            return np.zeros(0, dtype=np.int64)
+        last_start = last_start // self.hop * self.hop
+        first_start = max(first_start, last_start - (number_of_frames - 1) * self.hop)
+        return np.arange(first_start, last_start + 1, self.hop, dtype=np.int64)
+
+    def _power(self, frames: np.ndarray) -> np.ndarray:
+        # remove the offset of each frame, gravity would otherwise swamp the low bins
+        frames = frames - np.nanmean(frames, axis=1, keepdims=True)
+        frames = np.nan_to_num(frames, nan=0.0) * self._window
+        power = np.abs(np.fft.rfft(frames, axis=1)) ** 2 / self._window_power
+        # one-sided spectrum, every bin but DC and Nyquist stands for two
+        power[:, 1:(self.fft_size + 1) // 2] *= 2
+        return power
+
+    def frames(self, store: SampleStore, column: str, number_of_frames: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+        - The absolute sample index each of the newest `number_of_frames` complete frames starts at.
+        - Their power spectra, one row per frame, not divided by the sample rate.
+        """
+        starts = self._frame_starts(store, number_of_frames)
+        cache = self._frames.setdefault(column, {})
+        if starts.shape[0] == 0:
+            return starts, np.zeros((0, self.fft_size // 2 + 1))
+        missing = np.array([start for start in starts.tolist() if start not in cache], dtype=np.int64)
+        if missing.shape[0]:
+            values = store.view(column)
+            first_sample = store.total_count - len(store)
+            positions = (missing - first_sample)[:, None] + np.arange(self.fft_size)
+            for start, power in zip(missing.tolist(), self._power(values[positions])):
+                cache[start] = power
+            self.frames_computed += missing.shape[0]
+        # forget the frames that are older than the ones asked for
+        for start in [start for start in cache if start < starts[0]]:
+            del cache[start]
+        return starts, np.vstack([cache[start] for start in starts.tolist()])
+
+    def sample_rate(self, store: SampleStore) -> float:
+        """
+        Estimate the sample rate in Hz from the databot's `time` column, in seconds, or from the
+        collector's `timestamp` column if `time` has no values.  Returns NaN if neither is usable.
+        """
+        number_of_samples = min(len(store), self.fft_size * 4)
+        if number_of_samples < 2:
+            return math.nan
+        for column in ['time', 'timestamp']:
+            if column not in store.columns:
+                continue
+            values = store.view(column, number_of_samples)
+            if values.dtype.kind == 'M':
+                steps = np.diff(values).astype('timedelta64[ns]').astype(np.float64) / 1e9
+            else:
+                steps = np.diff(values.astype(np.float64))
+            steps = steps[np.isfinite(steps) & (steps > 0)]
+            if steps.shape[0]:
+                return 1.0 / float(np.median(steps))
+        return math.nan
+
+    def frequencies(self, sample_rate: float) -> np.ndarray:
+        return np.fft.rfftfreq(self.fft_size, d=1.0 / sample_rate)
+
+    def psd(self, store: SampleStore, columns: List[str],
+            average_frames: int = DEFAULT_AVERAGE_FRAMES) -> pd.DataFrame | None:
+        """
+        Welch power spectral density of each column, averaged over the newest `average_frames` frames.
+
+        Returns:
+        - A long-form DataFrame with `frequency`, `sensor_name` and `psd_db` columns, or None if
+          there is not a complete frame yet.
+        """
+        sample_rate = self.sample_rate(store)
+        if not math.isfinite(sample_rate):
+            return None
+        frequencies = self.frequencies(sample_rate)
+        parts = []
+        for column in columns:
+            _, power = self.frames(store, column, average_frames)
+            if power.shape[0] == 0:
+                continue
+            psd = power.mean(axis=0) / sample_rate
+            parts.append(pd.DataFrame({'frequency': frequencies, 'sensor_name': column,
+                                       'psd_db': 10 * np.log10(psd + 1e-20)}))
+        return pd.concat(parts, ignore_index=True) if parts else None
+
+    def spectrogram(self, store: SampleStore, column: str,
+                    number_of_frames: int = DEFAULT_SPECTROGRAM_FRAMES) -> pd.DataFrame | None:
+        """
+        Power of each of the newest `number_of_frames` frames of `column`, with the bins averaged
+        down to at most MAX_SPECTROGRAM_BINS.
+
+        Returns:
+        - A long-form DataFrame with `seconds_ago`, `frequency` and `power_db` columns, or None if
+          there is not a complete frame yet.
+        """
+        sample_rate = self.sample_rate(store)
+        if not math.isfinite(sample_rate):
+            return None
+        starts, power = self.frames(store, column, number_of_frames)
+        if power.shape[0] == 0:
+            return None
+        frequencies = self.frequencies(sample_rate)
+        group = -(-frequencies.shape[0] // MAX_SPECTROGRAM_BINS)
+        number_of_bins = frequencies.shape[0] // group
+        power = power[:, :number_of_bins * group].reshape(power.shape[0], number_of_bins, group).mean(axis=2)
+        frequencies = frequencies[:number_of_bins * group].reshape(number_of_bins, group).mean(axis=1)
+        # the end of each frame, in seconds before the newest sample
+        seconds_ago = (store.total_count - (starts + self.fft_size)) / sample_rate
+        return pd.DataFrame({'seconds_ago': np.repeat(seconds_ago, number_of_bins),
+                             'frequency': np.tile(frequencies, power.shape[0]),
+                             'power_db': 10 * np.log10(power.ravel() / sample_rate + 1e-20)})
@@ -0,0 +1,321 @@
+"""
+Fixed time buckets over samples that arrive at uneven intervals.
+
+A TimeBucketAggregator keeps the count, sum, minimum, maximum and last value of every data column
+for every bucket of several bucket sizes, 100 ms up to 10 minutes by default.  New samples are
+aggregated into the smallest buckets, and those partial buckets into the next larger size, so every
+level is updated with only the new rows and a chart of the last day reads a few hundred of the
+largest buckets instead of millions of samples.
+"""
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .downsample import DEFAULT_CHART_POINTS
+from .time_index import frame_times
+
+BUCKET_STATISTICS = ['mean', 'min', 'max', 'last']
+DEFAULT_BUCKET_LEVELS = ['100ms', '1s', '10s', '1min', '10min']
+# buckets kept per level and databot, a level holds between this many and twice as many
+DEFAULT_MAX_BUCKETS = 50_000
+# the fields of every bucket of a column
+_COUNT, _SUM, _MIN, _MAX, _LAST = range(5)
+_NUMBER_OF_FIELDS = 5
+
+
+def bucket_width_ns(frequency: str) -> int:
+    """
+    Returns the width of a bucket given as a pandas offset, like '100ms' or '1min', in nanoseconds.
+    """
+    return int(pd.Timedelta(pd.tseries.frequencies.to_offset(frequency)).value)
+
+
+def _empty_fields(size: int) -> np.ndarray:
+    fields = np.full((size, _NUMBER_OF_FIELDS), np.nan)
+    fields[:, _COUNT] = 0
+    fields[:, _SUM] = 0
+    return fields
+
+
+def _row_fields(values: np.ndarray) -> np.ndarray:
+    # every sample as a bucket of its own
+    valid = ~np.isnan(values)
+    fields = np.empty((values.shape[0], _NUMBER_OF_FIELDS))
+    fields[:, _COUNT] = valid
+    fields[:, _SUM] = np.where(valid, values, 0)
+    fields[:, _MIN] = values
+    fields[:, _MAX] = values
+    fields[:, _LAST] = values
+    return fields
+
+
+def _reduce(keys: np.ndarray, fields: dict) -> tuple[np.ndarray, dict]:
+    """
+    Combine the rows with the same bucket key, `keys` is sorted.  Returns the unique keys and the
+    combined fields of every column.
+    """
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    reduced = {}
+    for column, column_fields in fields.items():
+        combined = np.empty((starts.shape[0], _NUMBER_OF_FIELDS))
+        combined[:, _COUNT] = np.add.reduceat(column_fields[:, _COUNT], starts)
+        combined[:, _SUM] = np.add.reduceat(column_fields[:, _SUM], starts)
+        # fmin and fmax skip NaN, a bucket without numbers stays NaN
+        combined[:, _MIN] = np.fmin.reduceat(column_fields[:, _MIN], starts)
+        combined[:, _MAX] = np.fmax.reduceat(column_fields[:, _MAX], starts)
+        # the last value that is a number
+        last = column_fields[:, _LAST]
+        positions = np.maximum.reduceat(np.where(np.isnan(last), -1, np.arange(last.shape[0])), starts)
+        combined[:, _LAST] = np.where(positions >= 0, last[positions], np.nan)
+        reduced[column] = combined
+    return keys[starts], reduced
+
+
+def _combine(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    # merge the fields of the same buckets, `new` holds the later samples
+    combined = np.empty_like(old)
+    combined[:, _COUNT] = old[:, _COUNT] + new[:, _COUNT]
+    combined[:, _SUM] = old[:, _SUM] + new[:, _SUM]
+    combined[:, _MIN] = np.fmin(old[:, _MIN], new[:, _MIN])
+    combined[:, _MAX] = np.fmax(old[:, _MAX], new[:, _MAX])
+    combined[:, _LAST] = np.where(np.isnan(new[:, _LAST]), old[:, _LAST], new[:, _LAST])
+    return combined
+
+
+class _BucketLevel:
+    # the buckets of one width, oldest first, in arrays that grow by doubling
+    def __init__(self, width_ns: int, max_buckets: int):
+        self.width_ns = width_ns
+        self.max_buckets = max_buckets
+        self.size = 0
+        self.keys = np.empty(64, dtype=np.int64)
+        self.fields = {}
+        # once buckets have been dropped, the level no longer reaches back to the first sample
+        self.trimmed = False
+        self.late_samples = 0
+
+    def _reserve(self, size: int):
+        capacity = self.keys.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self.keys = np.resize(self.keys, capacity)
+        for column, fields in self.fields.items():
+            grown = _empty_fields(capacity)
+            grown[:self.size] = fields[:self.size]
+            self.fields[column] = grown
+
+    def merge(self, keys: np.ndarray, fields: dict):
+        """
+        Add partial buckets, with unique sorted `keys`.  A bucket older than the newest one is
+        combined into the bucket that is already there, or dropped if that bucket is gone.
+        """
+        for column in fields:
+            if column not in self.fields:
+                self.fields[column] = _empty_fields(self.keys.shape[0])
+
+        first_new = 0
+        if self.size:
+            existing = self.keys[:self.size]
+            first_new = int(np.searchsorted(keys, existing[-1], side='right'))
+            positions = np.searchsorted(existing, keys[:first_new])
+            found = positions < self.size
+            found[found] = existing[positions[found]] == keys[:first_new][found]
+            if not found.all() and fields:
+                counts = np.max([column_fields[:first_new][~found, _COUNT] for column_fields in fields.values()], axis=0)
+                self.late_samples += int(counts.sum())
+            for column, column_fields in fields.items():
+                own = self.fields[column]
+                own[positions[found]] = _combine(own[positions[found]], column_fields[:first_new][found])
+
+        number_of_new = keys.shape[0] - first_new
+        if number_of_new:
+            self._reserve(self.size + number_of_new)
+            self.keys[self.size:self.size + number_of_new] = keys[first_new:]
+            for column, own in self.fields.items():
+                column_fields = fields.get(column)
+                own[self.size:self.size + number_of_new] = _empty_fields(number_of_new) if column_fields is None \
+                    else column_fields[first_new:]
+            self.size += number_of_new
+        if self.size >= 2 * self.max_buckets:
+            self._trim()
+
+    def _trim(self):
+        drop = self.size - self.max_buckets
+        self.keys[:self.max_buckets] = self.keys[drop:self.size]
+        for fields in self.fields.values():
+            fields[:self.max_buckets] = fields[drop:self.size]
+            fields[self.max_buckets:] = _empty_fields(fields.shape[0] - self.max_buckets)
+        self.size = self.max_buckets
+        self.trimmed = True
+
+    def first_start_ns(self) -> int | None:
+        return int(self.keys[0]) * self.width_ns if self.size else None
+
+    def last_end_ns(self) -> int | None:
+        return (int(self.keys[self.size - 1]) + 1) * self.width_ns if self.size else None
+
+
+class TimeBucketAggregator:
+    """
+    Aggregate samples into fixed time buckets of several sizes, as they arrive.
+
+    Every level keeps the count, sum, minimum, maximum and last value of every numeric column per
+    bucket.  Samples are put into buckets by the collector's `timestamp`, or by the databot's
+    `time` when there is none, so the jitter of their arrival disappears inside the buckets.  The
+    samples of a chunk are aggregated into the smallest buckets first, and those into the next
+    size, so an update costs about the new rows plus a handful of buckets per level.
+
+    Samples of several databots are kept apart by `series_column`.
+
+    Parameters:
+    - `levels` (List[str]): The bucket sizes as pandas offsets, smallest first, every size a
+      multiple of the one before.
+    - `max_buckets` (int): Buckets kept per level and series, older ones are dropped.
+    - `series_column` (str | None): A column like `device_id` whose values get buckets of their own.
+    """
+
+    def __init__(self, levels: List[str] | None = None, max_buckets: int = DEFAULT_MAX_BUCKETS,
+                 series_column: str | None = None):
+        self.levels = list(levels or DEFAULT_BUCKET_LEVELS)
+        self.widths_ns = [bucket_width_ns(level) for level in self.levels]
+        for smaller, larger in zip(self.widths_ns, self.widths_ns[1:]):
+            if larger <= smaller or larger % smaller:
+                raise ValueError(f"Every bucket size must be a multiple of the one before: {self.levels}")
+        self.max_buckets = max(1, max_buckets)
+        self.series_column = series_column
+        self.reset()
+
+    def reset(self):
+        # series value -> the levels of that series, smallest buckets first
+        self._series = {}
+        # changes every time the buckets change, so callers can tell when cached results are stale
+        self.version = 0
+
+    @property
+    def late_samples(self) -> int:
+        # samples that arrived after their smallest bucket had been dropped
+        return sum(levels[0].late_samples for levels in self._series.values())
+
+    def _levels_of(self, series) -> List[_BucketLevel]:
+        if series not in self._series:
+            self._series[series] = [_BucketLevel(width_ns, self.max_buckets) for width_ns in self.widths_ns]
+        return self._series[series]
+
+    def append(self, df: pd.DataFrame):
+        """
+        Aggregate the new samples in `df` into every level.
+        """
+        if df.shape[0] == 0:
+            return
+        if self.series_column is not None and self.series_column in df.columns:
+            for series, series_df in df.groupby(self.series_column, sort=False, observed=True):
+                self._append(self._levels_of(series), series_df)
+        else:
+            self._append(self._levels_of(None), df)
+        self.version += 1
+
+    def _append(self, levels: List[_BucketLevel], df: pd.DataFrame):
+        if 'timestamp' in df.columns and df['timestamp'].dtype.kind == 'M':
+            times_ns = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            valid = ~df['timestamp'].isna().to_numpy()
+        else:
+            times = frame_times(df)
+            if times is None:
+                return
+            valid = ~np.isnan(times)
+            times_ns = (np.nan_to_num(times) * 1e9).astype(np.int64)
+        rows = np.flatnonzero(valid)
+        # the rows of a chunk are almost always in order already, jitter can swap neighbours
+        order = np.argsort(times_ns[rows], kind='stable')
+        rows = rows[order]
+        columns = [column for column in df.columns if column not in ('timestamp', self.series_column)
+                   and df[column].dtype.kind in 'fiub']
+        fields = {column: _row_fields(df[column].to_numpy(dtype=np.float64)[rows]) for column in columns}
+        # floor division, so a time before 1970 still lands in the bucket that starts before it
+        keys = times_ns[rows] // levels[0].width_ns
+        for position, level in enumerate(levels):
+            if position:
+                keys = keys * levels[position - 1].width_ns // level.width_ns
+            keys, fields = _reduce(keys, fields)
+            level.merge(keys, fields)
+
+    def level_for(self, start_ns: int | None, end_ns: int, max_points: int = DEFAULT_CHART_POINTS) -> int:
+        """
+        Returns the position of the smallest bucket size with at most `max_points` buckets between
+        `start_ns` and `end_ns`, whose buckets still reach back to `start_ns`.  None for the start
+        means the first sample.
+        """
+        for position, width_ns in enumerate(self.widths_ns):
+            levels = [series_levels[position] for series_levels in self._series.values()]
+            first = min((level.first_start_ns() for level in levels if level.size), default=None)
+            if first is None:
+                continue
+            if start_ns is None:
+                if any(level.trimmed for level in levels):
+                    continue
+                start = first
+            else:
+                start = start_ns
+                if any(level.trimmed and level.first_start_ns() > start_ns for level in levels):
+                    continue
+            if (end_ns - start) / width_ns <= max_points:
+                return position
+        return len(self.widths_ns) - 1
+
+    def end_ns(self) -> int | None:
+        # the end of the newest bucket of any series
+        return max((levels[0].last_end_ns() for levels in self._series.values() if levels[0].size), default=None)
+
+    def to_dataframe(self, window_seconds: float | None = None, statistic: str = 'mean',
+                     level: str | None = None, max_points: int = DEFAULT_CHART_POINTS,
+                     newest_first: bool = True) -> pd.DataFrame | None:
+        """
+        Build a DataFrame with one row per bucket, and per series.
+
+        Parameters:
+        - `window_seconds` (float | None): Only the buckets of this many seconds before the newest
+          bucket, None for everything that is kept.
+        - `statistic` (str): Which value of a bucket every data column gets, one of BUCKET_STATISTICS.
+        - `level` (str | None): The bucket size, one of `levels`, None to pick the smallest one
+          with at most `max_points` buckets in the window.
+        - `max_points` (int): See `level`.
+        - `newest_first` (bool): Order the rows from newest to oldest, the way the dashboard shows them.
+
+        Returns:
+        - The `timestamp` of the start of every bucket, the `time` of its first sample, and the
+          data columns.  None when there are no samples yet.
+        """
+        if statistic not in BUCKET_STATISTICS:
+            raise ValueError(f"Unknown statistic: {statistic}, expected one of {BUCKET_STATISTICS}")
+        end_ns = self.end_ns()
+        if end_ns is None:
+            return None
+        start_ns = None if window_seconds is None else end_ns - int(window_seconds * 1e9)
+        position = self.levels.index(level) if level is not None else self.level_for(start_ns, end_ns, max_points)
+
+        frames = []
+        for series, series_levels in self._series.items():
+            bucket_level = series_levels[position]
+            keys = bucket_level.keys[:bucket_level.size]
+            first = 0 if start_ns is None else int(np.searchsorted(keys, start_ns // bucket_level.width_ns))
+            data = {'timestamp': pd.to_datetime(keys[first:] * bucket_level.width_ns, unit='ns')}
+            for column, fields in bucket_level.fields.items():
+                fields = fields[first:bucket_level.size]
+                if column == 'time':
+                    # the databot's time of the first sample in the bucket, in seconds
+                    data[column] = np.where(fields[:, _COUNT] > 0, fields[:, _MIN], np.nan)
+                elif statistic == 'mean':
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        data[column] = np.where(fields[:, _COUNT] > 0, fields[:, _SUM] / fields[:, _COUNT], np.nan)
+                else:
+                    data[column] = fields[:, {'min': _MIN, 'max': _MAX, 'last': _LAST}[statistic]]
+            frame = pd.DataFrame(data)
+            if series is not None:
+                frame[self.series_column] = series
+            frames.append(frame)
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable')
+        df = df.iloc[::-1] if newest_first else df
+        return df.reset_index(drop=True)
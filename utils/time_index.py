@@ -0,0 +1,350 @@
+"""
+Sidecar time index for JSON lines recordings.
+
+The index is a small text file next to the recording, `<recording>.tidx`, with one
+`<byte offset> <time>` line for about every DEFAULT_INDEX_EVERY_ROWS rows.  The offset is where a
+line of the recording starts and the time is the time of that line in seconds.  Reading a time
+range then only needs the bytes between two index entries instead of the whole file.
+
+For a compressed recording, see `utils.compressed_recording`, the offsets are the starts of the
+compressed frames, so a time range is read by decompressing only the frames that hold it.
+
+BatchedLineWriter writes the index while recording.  For a recording made without one, rebuild it:
+
+    python -m utils.time_index ./data/databot_data.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .compressed_recording import is_compressed_recording, iter_frames, read_frames_between
+from .sample_schema import read_json_lines
+
+TIME_INDEX_SUFFIX = '.tidx'
+DEFAULT_INDEX_EVERY_ROWS = 256
+# read existing recordings in pieces of about this size when rebuilding the index
+INDEX_CHUNK_BYTES = 16 * 1024 * 1024
+# how far back from the end of a recording to look for its last complete line
+LAST_LINE_SEARCH_BYTES = 64 * 1024
+
+
+def time_index_path(file_path: str | Path) -> Path:
+    return Path(str(file_path) + TIME_INDEX_SUFFIX)
+
+
+def record_time(record: dict) -> float | None:
+    """
+    Returns the time of a record in seconds, from the collector's epoch `timestamp`, or else from
+    the databot's `time`, which is in seconds too.  None if the record has neither.
+    """
+    try:
+        return float(record['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        pass
+    try:
+        return float(record['time'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def frame_times(df: pd.DataFrame) -> np.ndarray | None:
+    """
+    Returns the time of every row of `df` in seconds, like `record_time` does for one record.
+    """
+    if 'timestamp' in df.columns:
+        timestamps = df['timestamp']
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            # pandas reads a column named timestamp as dates
+            return timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+        return pd.to_numeric(timestamps, errors='coerce').to_numpy(dtype=np.float64)
+    if 'time' in df.columns:
+        return pd.to_numeric(df['time'], errors='coerce').to_numpy(dtype=np.float64)
+    return None
+
+
+def filter_time_range(df: pd.DataFrame, start_time: float | None, end_time: float | None) -> pd.DataFrame:
+    times = frame_times(df)
+    if times is None:
+        return df
+    keep = np.ones(times.shape[0], dtype=bool)
+    if start_time is not None:
+        keep &= times >= start_time
+    if end_time is not None:
+        keep &= times <= end_time
+    return df if keep.all() else df[keep].reset_index(drop=True)
+
+
+def _line_time(line: bytes) -> float | None:
+    try:
+        return record_time(json.loads(line))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class TimeIndexWriter:
+    """
+    Append entries to the time index of a recording while it is being written.
+
+    A recording that is empty when the writer is opened gets a new index, any index left from an
+    earlier recording with the same name is thrown away.
+
+    Parameters:
+    - `file_path` (str | Path): The JSON lines recording, not the index.
+    - `every_rows` (int): Minimum number of rows between index entries.
+    """
+
+    def __init__(self, file_path: str | Path, every_rows: int = DEFAULT_INDEX_EVERY_ROWS):
+        self.index_path = time_index_path(file_path)
+        self.every_rows = max(1, every_rows)
+        try:
+            recording_size = Path(file_path).stat().st_size
+        except FileNotFoundError:
+            recording_size = 0
+        # line buffered, so readers see every entry as soon as its batch is in the recording
+        self._file = self.index_path.open("w" if recording_size == 0 else "a", encoding="utf-8", buffering=1)
+        self._rows_since_entry = self.every_rows
+
+    def add(self, offset: int, first_time: float | None, rows: int):
+        """
+        Record a batch of `rows` lines that starts at byte `offset` with a line at `first_time`.
+        """
+        if first_time is not None and self._rows_since_entry >= self.every_rows:
+            self._file.write(f"{offset} {first_time!r}\n")
+            self._rows_since_entry = 0
+        self._rows_since_entry += rows
+
+    def close(self):
+        self._file.close()
+
+
+class TimeIndex:
+    """
+    The entries of a time index, for finding the bytes of a recording that hold a time range.
+
+    Parameters:
+    - `offsets` (np.ndarray): Byte offsets of indexed lines, increasing.
+    - `times` (np.ndarray): The time of each indexed line in seconds.
+    """
+
+    def __init__(self, offsets: np.ndarray, times: np.ndarray):
+        self.offsets = offsets
+        self.times = times
+        # a clock that jumped backwards makes the index useless for searching
+        self.is_monotonic = bool(np.all(np.diff(times) >= 0))
+
+    def __len__(self):
+        return self.offsets.shape[0]
+
+    @classmethod
+    def load(cls, file_path: str | Path) -> 'TimeIndex | None':
+        """
+        Load the index of the recording at `file_path`, None if it has no index.
+        """
+        try:
+            data = time_index_path(file_path).read_bytes()
+        except FileNotFoundError:
+            return None
+        # ignore a last entry that is still being written
+        data = data[:data.rfind(b"\n") + 1]
+        try:
+            entries = np.array(data.split(), dtype=np.float64).reshape(-1, 2)
+        except ValueError:
+            logging.debug(f"could not parse the time index of {file_path}")
+            return None
+        return cls(entries[:, 0].astype(np.int64), entries[:, 1])
+
+    def byte_range(self, start_time: float | None, end_time: float | None, file_size: int) -> tuple[int, int]:
+        """
+        Returns the start and end byte offsets of the part of the recording that holds every line
+        between `start_time` and `end_time`.  The lines at the edges still need to be filtered.
+        """
+        if len(self) == 0 or not self.is_monotonic:
+            return 0, file_size
+        begin = 0
+        if start_time is not None:
+            # the last entry before the start, every line in front of it is older than the start
+            position = int(np.searchsorted(self.times, start_time, side='left')) - 1
+            begin = int(self.offsets[position]) if position >= 0 else 0
+        stop = file_size
+        if end_time is not None:
+            # the first entry after the end, every line from there on is newer than the end
+            position = int(np.searchsorted(self.times, end_time, side='right'))
+            stop = int(self.offsets[position]) if position < len(self) else file_size
+        return begin, max(begin, min(stop, file_size))
+
+
+def _scan_plain_lines(file_path: Path, every_rows: int) -> tuple[list, list]:
+    offsets = []
+    times = []
+    offset = 0
+    rows_since_entry = every_rows
+    with file_path.open("rb") as f:
+        remainder = b""
+        while True:
+            data = f.read(INDEX_CHUNK_BYTES)
+            if not data:
+                break
+            data = remainder + data
+            lines = data.split(b"\n")
+            # the last piece is not a complete line yet
+            remainder = lines.pop()
+            for line in lines:
+                if rows_since_entry >= every_rows and line.strip():
+                    line_time = _line_time(line)
+                    if line_time is not None:
+                        offsets.append(offset)
+                        times.append(line_time)
+                        rows_since_entry = 0
+                rows_since_entry += 1
+                offset += len(line) + 1
+    return offsets, times
+
+
+def _scan_compressed_frames(file_path: Path, every_rows: int) -> tuple[list, list]:
+    # only a frame start can be an entry, decompression cannot start anywhere else
+    offsets = []
+    times = []
+    rows_since_entry = every_rows
+    for frame_offset, frame in iter_frames(file_path):
+        if rows_since_entry >= every_rows:
+            line_time = _line_time(frame[:frame.find(b"\n")])
+            if line_time is not None:
+                offsets.append(frame_offset)
+                times.append(line_time)
+                rows_since_entry = 0
+        rows_since_entry += frame.count(b"\n")
+    return offsets, times
+
+
+def build_time_index(file_path: str | Path, every_rows: int = DEFAULT_INDEX_EVERY_ROWS) -> TimeIndex:
+    """
+    Scan an existing recording and write its time index.  Only one line in `every_rows` is parsed.
+    """
+    file_path = Path(file_path)
+    every_rows = max(1, every_rows)
+    if is_compressed_recording(file_path):
+        offsets, times = _scan_compressed_frames(file_path, every_rows)
+    else:
+        offsets, times = _scan_plain_lines(file_path, every_rows)
+
+    index_path = time_index_path(file_path)
+    tmp_path = index_path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        f.writelines(f"{entry_offset} {entry_time!r}\n" for entry_offset, entry_time in zip(offsets, times))
+    os.replace(tmp_path, index_path)
+    return TimeIndex(np.array(offsets, dtype=np.int64), np.array(times, dtype=np.float64))
+
+
+def load_time_index(file_path: str | Path, rebuild: bool = True) -> TimeIndex | None:
+    """
+    Load the index of a recording, and rebuild it when it is missing or does not match the
+    recording, for example because the recording was replaced.
+    """
+    index = TimeIndex.load(file_path)
+    try:
+        file_size = Path(file_path).stat().st_size
+    except FileNotFoundError:
+        return None
+    stale = index is None or (len(index) > 0 and int(index.offsets[-1]) >= file_size)
+    if stale and rebuild:
+        logging.debug(f"rebuild the time index of {file_path}")
+        index = build_time_index(file_path)
+    return None if stale and not rebuild else index
+
+
+def read_time_range(file_path: str | Path, start_time: float | None, end_time: float | None,
+                    columns: List[str] | None = None) -> pd.DataFrame | None:
+    """
+    Read the rows of a JSON lines recording between `start_time` and `end_time`, in seconds.
+
+    Only the bytes between the two index entries around the range are read and parsed, so the
+    time it takes grows with the size of the range rather than the size of the recording.
+
+    Parameters:
+    - `file_path` (str | Path): The JSON lines recording.
+    - `start_time`, `end_time` (float | None): The time range, None for an open end.
+    - `columns` (List[str] | None): Only return these columns, the ones the recording has.
+
+    Returns:
+    - A DataFrame with the rows in the range, or None if there are none.
+    """
+    file_path = Path(file_path)
+    index = load_time_index(file_path)
+    if index is None:
+        return None
+    if is_compressed_recording(file_path):
+        begin, stop = index.byte_range(start_time, end_time, file_path.stat().st_size)
+        data = read_frames_between(file_path, begin, stop)
+    else:
+        with file_path.open("rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            begin, stop = index.byte_range(start_time, end_time, file_size)
+            f.seek(begin)
+            data = f.read(stop - begin)
+        # leave out a last line that is still being written
+        data = data[:data.rfind(b"\n") + 1]
+    if not data.strip():
+        return None
+    df = filter_time_range(read_json_lines(data), start_time, end_time)
+    if columns is not None:
+        df = df[[column for column in df.columns if column in columns]]
+    return df if df.shape[0] else None
+
+
+def first_and_last_time(file_path: str | Path) -> tuple[float, float] | None:
+    """
+    Returns the time of the first and the last complete line of a JSON lines recording, without
+    reading the lines in between.  None if the recording has no line with a time.
+    """
+    if is_compressed_recording(file_path):
+        return _compressed_first_and_last_time(file_path)
+    try:
+        with Path(file_path).open("rb") as f:
+            first_line = f.readline()
+            file_size = os.fstat(f.fileno()).st_size
+            f.seek(max(0, file_size - LAST_LINE_SEARCH_BYTES))
+            tail = f.read()
+    except FileNotFoundError:
+        return None
+    first = _line_time(first_line) if first_line.endswith(b"\n") else None
+    lines = tail[:tail.rfind(b"\n")].split(b"\n")
+    last = _line_time(lines[-1]) if lines else None
+    if first is None or last is None:
+        return None
+    return first, last
+
+
+def _compressed_first_and_last_time(file_path: str | Path) -> tuple[float, float] | None:
+    # the first index entry is the first line, the frames from the last entry on hold the last line
+    index = load_time_index(file_path)
+    if index is None or len(index) == 0:
+        return None
+    data = read_frames_between(file_path, int(index.offsets[-1]))
+    lines = data[:data.rfind(b"\n")].split(b"\n")
+    last = _line_time(lines[-1]) if lines else None
+    if last is None:
+        return None
+    return float(index.times[0]), last
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the time index of JSON lines databot recordings")
+    parser.add_argument("files", nargs="+", help="JSON lines recordings, plain or compressed")
+    parser.add_argument("--every-rows", type=int, default=DEFAULT_INDEX_EVERY_ROWS,
+                        help="rows between index entries")
+    args = parser.parse_args()
+    for file_name in args.files:
+        index = build_time_index(file_name, args.every_rows)
+        print(f"{time_index_path(file_name)}: {len(index)} entries", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from pathlib import Path
+
+from .alert_rules import AlertEngine
+from .batched_writer import BatchedLineWriter, DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, DEFAULT_FSYNC_EVERY, \
+    DEFAULT_FSYNC_INTERVAL
+from .columnar_recording import ColumnarSegmentWriter
+from .instrumentation import HotPathMetrics
+from .segment_rotation import RotatingLineWriter, RotationPolicy
+from .shared_ring import SharedRingWriter, TeeWriter
+
+DATABOT_WEBSERVER_URL = "http://localhost:8321"
+
+
+class WebserverPollingCollector:
+    """
+    Poll the databot webserver on a fixed schedule and save every sample.
+
+    A single `requests.Session` is reused for every request so the connection is kept alive,
+    and JSON lines are written through a BatchedLineWriter that keeps the file open for the life
+    of the collector and writes a time index next to it.  Ticks are scheduled against a monotonic deadline, so the time spent on the
+    request does not stretch the sample period.
+    A tick that finishes after its deadline is counted as late, and any whole periods that were
+    skipped because of it are counted as dropped.  The time each tick spends on the request and
+    the write is recorded in `metrics`.
+
+    Parameters:
+    - `datafile_path` (str | Path): The JSON lines file, or the segment directory for columnar formats.
+    - `refresh_rate` (int): The sample period in milliseconds.
+    - `recording_format` (str): 'jsonl', 'arrow' or 'parquet'.
+    - `url` (str): The databot webserver to poll.
+    - `batch_size`, `flush_interval`, `durability`, `fsync_every`, `fsync_interval`: Passed to the
+      BatchedLineWriter for 'jsonl'.
+    - `rotation` (RotationPolicy | None): When enabled, 'jsonl' is written as rotated segments into the
+      `datafile_path` directory.
+    - `shared_ring_path` (str | Path | None): Also publish every sample into this shared memory ring.
+    - `archive` (bool): Save the samples to `datafile_path`.  Only publishing to the ring needs this off.
+    - `compression` (str): 'none', 'gzip' or 'zstd' for a 'jsonl' file that is not rotated.
+    - `alert_engine` (AlertEngine | None): Check every sample against alert rules, the collector
+      stops by itself when the engine has a `stop_reason`, for example after a number of samples.
+    """
+
+    def __init__(self, datafile_path: str | Path, refresh_rate: int, recording_format: str = 'jsonl',
+                 url: str = DATABOT_WEBSERVER_URL, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, durability: str = 'flush',
+                 fsync_every: int = DEFAULT_FSYNC_EVERY, fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+                 rotation: RotationPolicy | None = None,
+                 shared_ring_path: str | Path | None = None, archive: bool = True, compression: str = 'none',
+                 alert_engine: AlertEngine | None = None):
+        self.datafile_path = Path(datafile_path)
+        self.shared_ring_path = shared_ring_path
+        self.archive = archive
+        self.period = refresh_rate / 1000
+        self.recording_format = recording_format
+        self.url = url
+        self.writer_options = dict(batch_size=batch_size, flush_interval=flush_interval,
+                                   durability=durability, fsync_every=fsync_every, fsync_interval=fsync_interval)
+        self.rotation = rotation
+        self.compression = compression
+        self.alert_engine = alert_engine
+        self.stop_reason = None
+        self.ticks = 0
+        self.late_ticks = 0
+        self.dropped_ticks = 0
+        self.samples_written = 0
+        self.metrics = HotPathMetrics()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _open_writer(self):
+        if self.shared_ring_path is None:
+            return self._open_file_writer()
+        ring_writer = SharedRingWriter(self.shared_ring_path)
+        return TeeWriter([ring_writer, self._open_file_writer()]) if self.archive else ring_writer
+
+    def _open_file_writer(self):
+        if self.recording_format == 'jsonl':
+            if self.rotation is not None and self.rotation.enabled:
+                return RotatingLineWriter(self.datafile_path, self.rotation, **self.writer_options)
+            return BatchedLineWriter(self.datafile_path, time_index=True, compression=self.compression,
+                                     **self.writer_options)
+        return ColumnarSegmentWriter(self.datafile_path, file_format=self.recording_format)
+
+    def _write(self, writer, data_record: dict):
+        writer.write_record(data_record)
+        self.samples_written += 1
+
+    def _wait_for_next_tick(self, deadline: float) -> float:
+        now = time.monotonic()
+        if now > deadline:
+            self.late_ticks += 1
+            missed = int((now - deadline) // self.period)
+            if missed:
+                self.dropped_ticks += missed
+                logging.debug(f"collector is behind, dropped {missed} ticks")
+                deadline += missed * self.period
+        self._stop_event.wait(max(0.0, deadline - now))
+        return deadline + self.period
+
+    def run(self):
+        logging.debug(f"start web server thread: {self.datafile_path}, {self.period}")
+        deadline = time.monotonic() + self.period
+        # imported here so the dashboard does not pay for requests until a collector runs
+        import requests
+        with requests.Session() as session, self._open_writer() as writer:
+            while not self._stop_event.is_set():
+                deadline = self._wait_for_next_tick(deadline)
+                if self._stop_event.is_set():
+                    break
+                self.ticks += 1
+                try:
+                    with self.metrics.timer('collector_tick'):
+                        data_record = session.get(url=self.url, timeout=max(self.period, 1.0)).json()
+                        self._write(writer, data_record)
+                        if self.alert_engine is not None:
+                            self.alert_engine.evaluate(data_record)
+                    if self.alert_engine is not None and self.alert_engine.stop_reason is not None:
+                        self.stop_reason = self.alert_engine.stop_reason
+                        logging.debug(f"collector stops by itself, {self.stop_reason}")
+                        break
+
+                except requests.ConnectionError as conn_error:
+                    # webserver must have gone away so we can exit this thread
+                    break
+
+                except Exception as exc:
+                    logging.debug(exc)
+                    self._stop_event.wait(1)
+                    deadline = time.monotonic() + self.period
+
+                # do not let a partial batch sit in memory if samples stop coming
+                writer.flush_if_due()
+                self.metrics.set_gauge('collector_late_ticks', self.late_ticks)
+                self.metrics.set_gauge('collector_dropped_ticks', self.dropped_ticks)
+
+        if self.alert_engine is not None:
+            self.alert_engine.close()
+        logging.debug("**** EXIT webserver thread")